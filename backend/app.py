@@ -1,175 +1,552 @@
 """
 Production Backend for Tomato Leaf Disease Detection
 Using HuggingFace ResNet50 Model - 10 Disease Classes
+
+TensorFlow is imported when the model loads, and transformers (with torch)
+only on the HuggingFace fallback path, so serving an export_serving.py
+SavedModel needs just requirements-serving.txt.
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
 from flask_cors import CORS
-from transformers import TFResNetForImageClassification, AutoImageProcessor
-import tensorflow as tf
-import numpy as np
 from PIL import Image
-import io
+import numpy as np
+import atexit
+import hashlib
 import os
-import json
+import threading
+import time
+import zipfile
+import zlib
+from contextlib import ExitStack, contextmanager
+
+from inference import (load_model, format_prediction, decode_image, resize_and_crop, latest_serving_model,
+                       model_fingerprint, ServingModel, SERVING_MODEL_DIR)
+from prediction_store import PredictionStore, DB_PATH
+from rate_limit import RateLimiter, parse_limits, retry_after_header
+import leaf_gate
+import jobs
+from shadow import ShadowEvaluator, SHADOW_LOG_PATH
+from drift import DriftMonitor, BASELINE_PATH as DRIFT_BASELINE_PATH
+from tracing import RequestTrace, SlowRequestLog, NULL_TRACE, SLOW_LOG_PATH
+import tta
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=['Server-Timing', 'X-Request-ID'])
 
 # Configuration
-MODEL_PATH = './hf_model'
+MODEL_PATH = os.environ.get('MODEL_PATH', './hf_model')  # hf_model, an exported SavedModel or a serving export
+SERVING_MODEL_DIR = os.environ.get('SERVING_MODEL_DIR', SERVING_MODEL_DIR)
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB
 
-# Load the model
-try:
-    print(f"Loading model from {MODEL_PATH}...")
-    model = TFResNetForImageClassification.from_pretrained(MODEL_PATH, from_pt=True)
-    processor = AutoImageProcessor.from_pretrained(MODEL_PATH)
-    
-    # Load class labels from config
-    with open(os.path.join(MODEL_PATH, 'config.json'), 'r') as f:
-        config = json.load(f)
-        id2label = config['id2label']
-    
-    print(f"✓ Model loaded successfully!")
-    print(f"✓ Model supports {len(id2label)} classes")
-except Exception as e:
-    print(f"✗ Error loading model: {str(e)}")
-    model = None
-    processor = None
-    id2label = {}
-
-# Disease information with treatments
-DISEASE_TREATMENTS = {
-    "A healthy tomato leaf": {
-        "short_name": "Healthy",
-        "description": "Your tomato leaf is healthy! No disease detected.",
-        "treatment": "Continue regular care: adequate watering, proper fertilization, and monitoring for pests."
-    },
-    "A tomato leaf with Bacterial Spot": {
-        "short_name": "Bacterial Spot",
-        "description": "Bacterial spot causes dark, greasy-looking spots on leaves and fruit.",
-        "treatment": "Remove infected leaves, avoid overhead watering, apply copper-based bactericides, and use disease-resistant varieties."
-    },
-    "A tomato leaf with Early Blight": {
-        "short_name": "Early Blight",
-        "description": "Early blight creates concentric rings (target spots) on lower leaves first.",
-        "treatment": "Remove infected leaves, improve air circulation, mulch to prevent soil splash, and apply fungicides containing chlorothalonil or copper."
-    },
-    "A tomato leaf with Late Blight": {
-        "short_name": "Late Blight",
-        "description": "Late blight causes water-soaked spots that quickly turn brown and can destroy entire plants.",
-        "treatment": "Remove and destroy infected plants immediately, apply fungicides preventively in wet weather, and ensure proper spacing for air circulation."
-    },
-    "A tomato leaf with Leaf Mold": {
-        "short_name": "Leaf Mold",
-        "description": "Leaf mold appears as yellow spots on upper leaf surfaces with olive-green mold on undersides.",
-        "treatment": "Improve greenhouse ventilation, reduce humidity below 85%, remove infected leaves, and apply fungicides if necessary."
-    },
-    "A tomato leaf with Septoria Leaf Spot": {
-        "short_name": "Septoria Leaf Spot",
-        "description": "Septoria leaf spot shows circular spots with dark borders and gray centers containing tiny black dots.",
-        "treatment": "Remove infected leaves, avoid overhead watering, mulch around plants, rotate crops, and apply fungicides containing copper or chlorothalonil."
-    },
-    "A tomato leaf with Spider Mites Two-spotted Spider Mite": {
-        "short_name": "Spider Mites",
-        "description": "Spider mites cause stippling and yellowing of leaves, with fine webbing in severe cases.",
-        "treatment": "Spray plants with strong water jets, introduce predatory mites, apply insecticidal soap or neem oil, and maintain adequate humidity."
-    },
-    "A tomato leaf with Target Spot": {
-        "short_name": "Target Spot",
-        "description": "Target spot creates concentric rings similar to early blight but with distinct tan-colored centers.",
-        "treatment": "Remove infected leaves, improve air circulation, avoid overhead irrigation, and apply fungicides containing azoxystrobin or chlorothalonil."
-    },
-    "A tomato leaf with Tomato Mosaic Virus": {
-        "short_name": "Tomato Mosaic Virus",
-        "description": "Mosaic virus causes mottled light and dark green patterns on leaves and stunted growth.",
-        "treatment": "No cure available. Remove and destroy infected plants, disinfect tools, wash hands before handling plants, and use virus-resistant varieties."
-    },
-    "A tomato leaf with Tomato Yellow Leaf Curl Virus": {
-        "short_name": "Yellow Leaf Curl Virus",
-        "description": "This virus causes severe leaf curling, yellowing, and stunted plant growth.",
-        "treatment": "No cure available. Remove infected plants, control whitefly populations (the virus vector), use reflective mulches, and plant resistant varieties."
-    }
+# Raw upload fast path: the client sends the 224x224 RGB crop itself as the
+# request body (no multipart, no JPEG), which is used without decoding
+RAW_CONTENT_TYPE = 'application/x-rgb224'
+RAW_IMAGE_SIZE = 224
+RAW_IMAGE_BYTES = RAW_IMAGE_SIZE * RAW_IMAGE_SIZE * 3
+
+# Test-time augmentation: on request (tta=1), or automatically when the plain
+# top-1 confidence is below the threshold (0 disables). Pick both with
+# `python evaluate.py --tta`.
+TTA_VIEWS = tta.parse_views(os.environ.get('TTA_VIEWS', ','.join(tta.VIEWS)))
+TTA_CONFIDENCE_THRESHOLD = float(os.environ.get('TTA_CONFIDENCE_THRESHOLD', 0))
+TTA_EXTRA_VIEWS = [view for view in TTA_VIEWS if view != 'identity']
+
+# Uploads with too few plant-coloured pixels are answered with 422 before the
+# model runs. Off (0) by default; set it to the threshold `python leaf_gate.py`
+# recommends from the val split.
+LEAF_GATE_THRESHOLD = float(os.environ.get('LEAF_GATE_THRESHOLD', leaf_gate.DEFAULT_THRESHOLD))
+
+# Tracing: request ID + Server-Timing header on every response, and a sampled
+# log of requests slower than SLOW_REQUEST_MS. TRACING=0 turns it all off.
+TRACING = os.environ.get('TRACING', '1') != '0'
+slow_request_log = SlowRequestLog(
+    os.environ.get('SLOW_REQUEST_LOG', SLOW_LOG_PATH),
+    threshold_ms=float(os.environ.get('SLOW_REQUEST_MS', 1000)),
+    sample_rate=float(os.environ.get('SLOW_REQUEST_SAMPLE_RATE', 1.0)),
+) if TRACING else None
+
+# Max concurrent forward passes (0 = unlimited); time spent waiting for a slot
+# shows up as the 'queue' stage
+INFERENCE_CONCURRENCY = int(os.environ.get('INFERENCE_CONCURRENCY', 0))
+inference_slots = threading.BoundedSemaphore(INFERENCE_CONCURRENCY) if INFERENCE_CONCURRENCY > 0 else None
+
+# Per-client token buckets on the model endpoints, keyed by the client IP
+# (first X-Forwarded-For hop with TRUST_PROXY=1), or by X-API-Key for keys
+# listed in RATE_LIMIT_CLIENTS. Limits are per worker process.
+# RATE_LIMIT_RPS=0 disables; RATE_LIMIT_CLIENTS overrides single clients as
+# 'key:<api key>=rate:burst' or '<ip>=rate:burst', comma separated.
+RATE_LIMIT_RPS = float(os.environ.get('RATE_LIMIT_RPS', 5))
+TRUST_PROXY = os.environ.get('TRUST_PROXY', '0') == '1'
+RATE_LIMITED_ENDPOINTS = {'predict', 'create_job'}
+rate_limiter = RateLimiter(
+    RATE_LIMIT_RPS,
+    float(os.environ.get('RATE_LIMIT_BURST', 10)),
+    limits=parse_limits(os.environ.get('RATE_LIMIT_CLIENTS', '')),
+) if RATE_LIMIT_RPS > 0 else None
+
+# Every prediction is appended to a SQLite log for analytics by a background
+# writer (PREDICTION_DB= disables). Query with `python prediction_store.py`.
+PREDICTION_DB = os.environ.get('PREDICTION_DB', DB_PATH)
+prediction_store = PredictionStore(
+    PREDICTION_DB,
+    max_queue=int(os.environ.get('PREDICTION_QUEUE_SIZE', 10000)),
+) if PREDICTION_DB else None
+if prediction_store:
+    atexit.register(prediction_store.close)
+
+# Asynchronous jobs (POST /jobs): images are queued durably in SQLite and
+# scored in batches by a background worker that only runs while no /predict
+# request is in flight. JOBS=0 disables.
+JOBS = os.environ.get('JOBS', '1') != '0'
+JOB_BATCH_SIZE = int(os.environ.get('JOB_BATCH_SIZE', 8))
+JOB_MAX_UPLOAD_BYTES = int(os.environ.get('JOB_MAX_UPLOAD_MB', 200)) * 1024 * 1024
+job_store = jobs.JobStore(
+    os.environ.get('JOB_DB', jobs.DB_PATH),
+    os.environ.get('JOB_UPLOAD_DIR', jobs.UPLOAD_DIR),
+    ttl=float(os.environ.get('JOB_TTL_HOURS', 24)) * 3600,
+) if JOBS else None
+interactive_requests = jobs.InteractiveTracker()
+
+# Shadow evaluation: SHADOW_MODEL=<candidate .h5> mirrors a sample of
+# /predict inputs to that model on a background thread and records agreement
+# (GET /shadow, `python shadow.py`). Off by default.
+SHADOW_MODEL = os.environ.get('SHADOW_MODEL')
+SHADOW_SAMPLE_RATE = float(os.environ.get('SHADOW_SAMPLE_RATE', 0.1))
+shadow = None
+
+# Drift monitoring: streaming confidence / class / embedding sketches of live
+# predictions, compared with `python drift.py`'s val baseline on GET /drift.
+# DRIFT=0 disables.
+DRIFT = os.environ.get('DRIFT', '1') != '0'
+drift_monitor = None
+
+# Model state. The model is loaded and warmed up in a background thread so
+# the port is bound immediately; /readyz (and /predict) wait for it.
+model = None
+processor = None
+serving = None
+id2label = {}
+model_state = {
+    'status': 'loading',    # loading -> ready | failed
+    'error': None,
+    'model_path': None,
+    'model_version': None,
+    'load_seconds': None,
+    'warmup_seconds': None,
 }
+load_finished = threading.Event()
+process_start = time.time()
+
+def load_and_warm_up():
+    """
+    Load the newest export_serving.py export (fast path: preprocessing and
+    softmax run in-graph), or MODEL_PATH when it is set or nothing is
+    exported: a serving export, or the AutoImageProcessor + model path for
+    hf_model and plain SavedModels. Then run dummy predictions so
+    the first real request does not pay for lazy initialization.
+    """
+    global model, processor, serving, id2label, shadow, drift_monitor
+    try:
+        start = time.perf_counter()
+        serving_path = None if 'MODEL_PATH' in os.environ else latest_serving_model(SERVING_MODEL_DIR)
+        if serving_path:
+            print(f"Loading serving model from {serving_path}...")
+            loaded_serving = ServingModel(serving_path)
+            loaded = (loaded_serving, None, loaded_serving.id2label)
+        else:
+            # A serving export as MODEL_PATH also comes back as a ServingModel
+            print(f"Loading model from {MODEL_PATH}...")
+            loaded = load_model(MODEL_PATH)
+        load_seconds = time.perf_counter() - start
+        
+        model, processor, id2label = loaded
+        serving = model if isinstance(model, ServingModel) else None
+        
+        start = time.perf_counter()
+        warmup_image = Image.new('RGB', (640, 480), (70, 140, 60))
+        run_model([warmup_image])
+        if TTA_EXTRA_VIEWS:
+            run_model(tta.make_views(warmup_image, TTA_VIEWS))
+        warmup_seconds = time.perf_counter() - start
+        
+        model_state.update(
+            model_path=serving_path or MODEL_PATH,
+            model_version=serving.version if serving is not None else model_fingerprint(MODEL_PATH),
+            load_seconds=round(load_seconds, 3),
+            warmup_seconds=round(warmup_seconds, 3),
+        )
+        if DRIFT:
+            drift_monitor = DriftMonitor(
+                len(id2label),
+                os.environ.get('DRIFT_BASELINE', DRIFT_BASELINE_PATH),
+                half_life=float(os.environ.get('DRIFT_HALF_LIFE', 5000)),
+            )
+        model_state['status'] = 'ready'
+        if SHADOW_MODEL:
+            shadow = ShadowEvaluator(
+                SHADOW_MODEL, id2label, interactive_requests,
+                sample_rate=SHADOW_SAMPLE_RATE,
+                log_path=os.environ.get('SHADOW_LOG', SHADOW_LOG_PATH),
+            ).start()
+        print(f"✓ Model loaded in {load_seconds:.1f}s, warmed up in {warmup_seconds:.1f}s")
+        print(f"✓ Model supports {len(id2label)} classes")
+    except Exception as e:
+        print(f"✗ Error loading model: {str(e)}")
+        model, processor, serving, id2label = None, None, None, {}
+        model_state.update(status='failed', error=str(e))
+    finally:
+        load_finished.set()
+
+def wait_until_ready(timeout=None):
+    """Block until the background load finished; True if the model is ready"""
+    load_finished.wait(timeout)
+    return model_state['status'] == 'ready'
+
+@app.before_request
+def start_trace():
+    g.trace = RequestTrace(request.headers.get('X-Request-ID')) if TRACING else NULL_TRACE
+
+@app.after_request
+def finish_trace(response):
+    trace = g.get('trace', NULL_TRACE)
+    if trace.enabled:
+        response.headers['X-Request-ID'] = trace.request_id
+        response.headers['Server-Timing'] = trace.server_timing()
+        slow_request_log.maybe_log(trace, request.path, response.status_code)
+    return response
+
+@app.before_request
+def track_interactive():
+    if request.endpoint == 'predict':
+        interactive_requests.enter()
+    elif request.endpoint == 'create_job':
+        # Job uploads may be much larger than a single /predict image
+        request.max_content_length = JOB_MAX_UPLOAD_BYTES
+
+@app.teardown_request
+def untrack_interactive(exc):
+    if request.endpoint == 'predict':
+        interactive_requests.exit()
+
+def client_id():
+    """
+    The client's API key if it is one configured in RATE_LIMIT_CLIENTS,
+    otherwise its IP. Unknown keys are ignored: a fresh made-up key per
+    request would otherwise get a fresh bucket (and evict real clients').
+    """
+    api_key = request.headers.get('X-API-Key')
+    if api_key and f'key:{api_key}' in rate_limiter.limits:
+        return f'key:{api_key}'
+    if TRUST_PROXY and request.headers.get('X-Forwarded-For'):
+        return request.headers['X-Forwarded-For'].split(',')[0].strip()
+    return request.remote_addr
+
+@app.before_request
+def check_rate_limit():
+    if rate_limiter is None or request.endpoint not in RATE_LIMITED_ENDPOINTS:
+        return None
+    wait = rate_limiter.check(client_id())
+    if wait:
+        return (jsonify({'error': 'Too many requests, slow down', 'retry_after_seconds': round(wait, 2)}),
+                429, {'Retry-After': retry_after_header(wait)})
+    return None
+
+@app.route('/livez', methods=['GET'])
+def livez():
+    """Liveness: the process is up and serving HTTP"""
+    return jsonify({'status': 'alive'})
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness: model loaded and warmed up, safe to route traffic here"""
+    body = {**model_state, 'uptime_seconds': round(time.time() - process_start, 3)}
+    if model_state['status'] == 'ready':
+        body['num_classes'] = len(id2label)
+        if prediction_store:
+            body['prediction_store'] = prediction_store.stats()
+        if rate_limiter:
+            body['rate_limit'] = rate_limiter.stats()
+        return jsonify(body)
+    return jsonify(body), 503
 
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint"""
+    ready = model_state['status'] == 'ready'
     return jsonify({
-        'status': 'healthy',
-        'model_loaded': model is not None,
-        'num_classes': len(id2label) if id2label else 0
-    })
+        'status': 'healthy' if ready else model_state['status'],
+        'model_loaded': ready,
+        'num_classes': len(id2label) if ready else 0
+    }), 200 if ready else 503
+
+@contextmanager
+def inference_slot(trace):
+    """Wait for a free inference slot ('queue'), then time the forward pass ('infer')"""
+    if inference_slots is None:
+        with trace.stage('infer'):
+            yield
+        return
+    with trace.stage('queue'):
+        inference_slots.acquire()
+    try:
+        with trace.stage('infer'):
+            yield
+    finally:
+        inference_slots.release()
+
+def run_model(images, trace=NULL_TRACE, monitor=False):
+    """
+    One batched forward pass over same-size PIL images, or over a uint8
+    (N, 224, 224, 3) array that is already resized (raw uploads).
+    Returns (probabilities, top_indices), top_indices being None unless the
+    serving model computed them in-graph. With monitor=True the outputs also
+    update the drift sketches (plain passes over real uploads only, not TTA
+    views or warmup).
+    """
+    resized = isinstance(images, np.ndarray)
+    if serving is not None:
+        # Decoded pixels go straight into the graph
+        with trace.stage('preprocess'):
+            pixels = images if resized else np.stack([np.asarray(img) for img in images])
+        with inference_slot(trace):
+            outputs = serving.predict_resized(pixels) if resized else serving.predict(pixels)
+        if monitor:
+            update_drift(outputs['probabilities'], outputs.get('embedding'), trace)
+        return outputs['probabilities'], outputs['top_k_indices']
+    
+    import tensorflow as tf
+    with trace.stage('preprocess'):
+        inputs = processor(images=list(images), do_resize=not resized, return_tensors="tf")
+    with inference_slot(trace):
+        logits = model(**inputs).logits
+        probabilities = tf.nn.softmax(logits, axis=-1).numpy()
+    if monitor:
+        # The HuggingFace model does not expose its pooled features here
+        update_drift(probabilities, None, trace)
+    return probabilities, None
+
+def update_drift(probabilities, embeddings, trace=NULL_TRACE):
+    if drift_monitor is not None:
+        with trace.stage('drift'):
+            drift_monitor.update(model_state['model_version'], probabilities, embeddings)
+
+def classify_image(image, tta_requested, trace=NULL_TRACE):
+    """
+    Class probabilities for one decoded upload, with test-time augmentation
+    when requested or when the plain prediction is borderline.
+    Returns (probabilities, top_indices, tta_info).
+    """
+    if tta_requested:
+        # All views in a single batch, probabilities averaged
+        with trace.stage('preprocess'):
+            views = tta.make_views(image, TTA_VIEWS)
+        probabilities, _ = run_model(views, trace)
+        return probabilities.mean(axis=0), None, {'views': len(TTA_VIEWS), 'trigger': 'request'}
+    
+    probabilities, top_indices = run_model([image], trace, monitor=True)
+    probabilities = probabilities[0]
+    top_indices = top_indices[0] if top_indices is not None else None
+    
+    if TTA_EXTRA_VIEWS and probabilities.max() < TTA_CONFIDENCE_THRESHOLD:
+        # Borderline: one more batched call over the remaining views
+        with trace.stage('preprocess'):
+            views = tta.make_views(image, TTA_EXTRA_VIEWS)
+        extra, _ = run_model(views, trace)
+        probabilities = (probabilities + extra.sum(axis=0)) / (len(TTA_EXTRA_VIEWS) + 1)
+        return probabilities, None, {'views': len(TTA_EXTRA_VIEWS) + 1, 'trigger': 'threshold'}
+    
+    return probabilities, top_indices, None
+
+def check_leaf(image, trace=NULL_TRACE):
+    """422 response if the image does not look like a leaf, otherwise None"""
+    if LEAF_GATE_THRESHOLD <= 0:
+        return None
+    with trace.stage('gate'):
+        passed, fraction = leaf_gate.is_leaf(image, LEAF_GATE_THRESHOLD)
+    if passed:
+        return None
+    if trace.enabled:
+        trace.meta['plant_fraction'] = round(fraction, 3)
+    return jsonify({
+        'error': 'No tomato leaf detected. Take a close-up photo of a single leaf.',
+        'plant_fraction': round(fraction, 3)
+    }), 422
 
 @app.route('/predict', methods=['POST'])
 def predict():
     """Predict disease from uploaded image"""
+    if model_state['status'] == 'loading':
+        return jsonify({'error': 'Model is loading, retry shortly'}), 503, {'Retry-After': '5'}
     if model is None:
         return jsonify({'error': 'Model not loaded'}), 500
     
-    # Check if image is present
-    if 'image' not in request.files:
-        return jsonify({'error': 'No image file provided'}), 400
+    trace = g.trace
+    started = time.perf_counter()
+    raw = request.mimetype == RAW_CONTENT_TYPE
     
-    file = request.files['image']
-    if file.filename == '':
-        return jsonify({'error': 'No selected file'}), 400
+    # Read the upload (for multipart, parsing the form reads it)
+    with trace.stage('receive'):
+        if raw:
+            img_bytes = request.get_data(cache=False)
+            if len(img_bytes) != RAW_IMAGE_BYTES:
+                return jsonify({'error': f'{RAW_CONTENT_TYPE} body must be exactly {RAW_IMAGE_BYTES} bytes '
+                                         f'({RAW_IMAGE_SIZE}x{RAW_IMAGE_SIZE}x3 uint8 RGB)'}), 400
+        else:
+            # Check if image is present
+            if 'image' not in request.files:
+                return jsonify({'error': 'No image file provided'}), 400
+            
+            file = request.files['image']
+            if file.filename == '':
+                return jsonify({'error': 'No selected file'}), 400
+            img_bytes = file.read()
     
     try:
-        # Read and process image
-        img_bytes = file.read()
-        image = Image.open(io.BytesIO(img_bytes)).convert('RGB')
-        
-        # Preprocess with the processor
-        inputs = processor(images=image, return_tensors="tf")
-        
-        # Make prediction
-        outputs = model(**inputs)
-        logits = outputs.logits
+        if raw:
+            if serving is not None and serving.serve_resized is None:
+                return jsonify({'error': 'Raw uploads need a newer serving export (python export_serving.py)'}), 415
+            # Zero-copy view of the request body as a batch of one
+            pixels = np.frombuffer(img_bytes, dtype=np.uint8).reshape(1, RAW_IMAGE_SIZE, RAW_IMAGE_SIZE, 3)
+            if trace.enabled:
+                trace.meta.update(bytes=len(img_bytes), width=RAW_IMAGE_SIZE, height=RAW_IMAGE_SIZE, raw=True)
+            rejected = check_leaf(pixels[0], trace)
+            if rejected:
+                return rejected
+            probabilities, top_indices = run_model(pixels, trace, monitor=True)
+            probabilities = probabilities[0]
+            top_indices = top_indices[0] if top_indices is not None else None
+            tta_info = None
+        else:
+            # Read and process image
+            with trace.stage('decode'):
+                image = decode_image(img_bytes)
+            tta_requested = request.values.get('tta', '').lower() in ('1', 'true', 'yes')
+            if trace.enabled:
+                trace.meta.update(bytes=len(img_bytes), width=image.width, height=image.height, tta=tta_requested)
+            rejected = check_leaf(image, trace)
+            if rejected:
+                return rejected
+            probabilities, top_indices, tta_info = classify_image(image, tta_requested, trace)
         
-        # Get probabilities
-        probabilities = tf.nn.softmax(logits, axis=-1).numpy()[0]
+        with trace.stage('postprocess'):
+            prediction = format_prediction(probabilities, id2label, top_indices=top_indices)
+            response = {'success': True, **prediction}
+            if tta_info:
+                response['tta'] = tta_info
+            response = jsonify(response)
         
-        # Get top prediction
-        predicted_class_idx = int(np.argmax(probabilities))
-        confidence = float(probabilities[predicted_class_idx])
-        
-        # Get label
-        predicted_label = id2label[str(predicted_class_idx)]
-        
-        # Get disease info
-        disease_info = DISEASE_TREATMENTS.get(predicted_label, {
-            "short_name": "Unknown",
-            "description": predicted_label,
-            "treatment": "Unable to provide treatment information."
-        })
-        
-        # Get top 3 predictions
-        top_3_indices = np.argsort(probabilities)[-3:][::-1]
-        top_3_predictions = [
-            {
-                'disease': DISEASE_TREATMENTS.get(id2label[str(idx)], {}).get('short_name', id2label[str(idx)]),
-                'confidence': float(probabilities[idx]),
-                'full_label': id2label[str(idx)]
-            }
-            for idx in top_3_indices
-        ]
-        
-        return jsonify({
-            'success': True,
-            'disease': disease_info['short_name'],
-            'confidence': confidence,
-            'description': disease_info['description'],
-            'treatment': disease_info['treatment'],
-            'full_label': predicted_label,
-            'top_predictions': top_3_predictions
-        })
+        if prediction_store:
+            # Only enqueues; the disk write happens on the store's thread
+            with trace.stage('log'):
+                prediction_store.record(
+                    label=prediction['full_label'],
+                    confidence=prediction['confidence'],
+                    top_k=[[p['full_label'], round(p['confidence'], 5)] for p in prediction['top_predictions']],
+                    request_id=trace.request_id,
+                    image_sha1=hashlib.sha1(img_bytes).hexdigest(),
+                    latency_ms=round((time.perf_counter() - started) * 1000, 2),
+                    model_version=model_state['model_version'],
+                )
+        # Only plain single-crop predictions are compared; the crop is only built for sampled requests
+        if shadow and tta_info is None and shadow.sample():
+            with trace.stage('shadow'):
+                crop = pixels[0] if raw else np.asarray(resize_and_crop(image))
+            shadow.submit(crop, int(np.argmax(probabilities)), prediction['confidence'], trace.request_id)
+        return response
         
     except Exception as e:
         print(f"Error processing image: {str(e)}")
         return jsonify({'error': f'Error processing image: {str(e)}'}), 500
 
+def classify_job_batch(paths):
+    """
+    Job worker callback: score the images at `paths` in one batched forward
+    pass. Returns [(result, ok)] in the same order.
+    """
+    outcomes = [None] * len(paths)
+    images = {}
+    for i, path in enumerate(paths):
+        try:
+            image = decode_image(path)
+        except Exception as e:
+            outcomes[i] = ({'error': f'Could not read image: {str(e)}'}, False)
+            continue
+        passed, fraction = leaf_gate.is_leaf(image, LEAF_GATE_THRESHOLD) if LEAF_GATE_THRESHOLD > 0 else (True, None)
+        if passed:
+            images[i] = image
+        else:
+            outcomes[i] = ({'error': 'No tomato leaf detected', 'plant_fraction': round(fraction, 3)}, False)
+    
+    if images:
+        if serving is not None and serving.serve_resized is None:
+            # Older export: mixed sizes cannot share a batch
+            scored = [run_model([image], monitor=True) for image in images.values()]
+            probabilities = [p[0] for p, _ in scored]
+            top_indices = [t[0] for _, t in scored]
+        else:
+            pixels = np.stack([np.asarray(resize_and_crop(image)) for image in images.values()])
+            probabilities, top_indices = run_model(pixels, monitor=True)
+            if top_indices is None:
+                top_indices = [None] * len(pixels)
+        for i, probs, top in zip(images, probabilities, top_indices):
+            outcomes[i] = (format_prediction(probs, id2label, top_indices=top), True)
+    return outcomes
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Queue many images (multipart 'images' files and/or a zip 'archive'); returns a job ID at once"""
+    if job_store is None:
+        return jsonify({'error': 'Jobs are disabled on this server'}), 404
+    
+    images = [(f.filename, f.read()) for f in request.files.getlist('images') if f.filename]
+    archive = request.files.get('archive')
+    with ExitStack() as stack:
+        if archive and archive.filename:
+            try:
+                # Members are streamed to the job folder by create(), never held in memory
+                zip_file = stack.enter_context(zipfile.ZipFile(archive.stream))
+                images.extend(jobs.archive_images(zip_file, jobs.MAX_JOB_IMAGES))
+            except Exception as e:
+                return jsonify({'error': f'Could not read archive: {str(e)}'}), 400
+        if not images:
+            return jsonify({'error': "No images provided (use 'images' files or a zip 'archive')"}), 400
+        if len(images) > jobs.MAX_JOB_IMAGES:
+            return jsonify({'error': f'At most {jobs.MAX_JOB_IMAGES} images per job'}), 400
+        
+        try:
+            job_id = job_store.create(images)
+        except (zipfile.BadZipFile, zlib.error) as e:
+            return jsonify({'error': f'Could not read archive: {str(e)}'}), 400
+    
+    status_url = f'/jobs/{job_id}'
+    return jsonify({'job_id': job_id, 'status': 'queued', 'total': len(images), 'status_url': status_url}), \
+        202, {'Location': status_url}
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Job progress and the results scored so far"""
+    job = job_store.get(job_id) if job_store else None
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+    return jsonify(job)
+
+@app.route('/shadow', methods=['GET'])
+def shadow_stats():
+    """Agreement of the shadow candidate with the served model so far"""
+    if shadow is None:
+        return jsonify({'error': 'No shadow model (set SHADOW_MODEL)'}), 404
+    return jsonify(shadow.stats())
+
+@app.route('/drift', methods=['GET'])
+def drift():
+    """Drift scores of recent predictions against the val baseline"""
+    if drift_monitor is None:
+        if model_state['status'] == 'loading':
+            return jsonify({'error': 'Model is loading, retry shortly'}), 503, {'Retry-After': '5'}
+        return jsonify({'error': 'Drift monitoring is disabled'}), 404
+    return jsonify(drift_monitor.report(model_state['model_version']))
+
 @app.route('/', methods=['GET'])
 def index():
     """API documentation"""
@@ -180,19 +557,39 @@ def index():
         'classes': list(id2label.values()) if id2label else [],
         'endpoints': {
             '/': 'API documentation (this page)',
-            '/health': 'Health check',
-            '/predict': 'POST image for disease prediction'
+            '/health': 'Health check (503 until the model is ready)',
+            '/livez': 'Liveness probe',
+            '/readyz': 'Readiness probe: model loaded and warmed up',
+            '/predict': 'POST image for disease prediction',
+            '/jobs': "POST many images ('images' files or a zip 'archive'); returns a job ID",
+            '/jobs/<job_id>': 'GET job progress and results (kept for JOB_TTL_HOURS after finishing)',
+            '/shadow': 'Shadow candidate agreement stats (when SHADOW_MODEL is set)',
+            '/drift': 'Input/prediction drift scores against the val baseline'
         },
         'usage': {
             'method': 'POST',
             'endpoint': '/predict',
             'content_type': 'multipart/form-data',
             'parameters': {
-                'image': 'Image file (jpg, jpeg, png)'
+                'image': 'Image file (jpg, jpeg, png)',
+                'tta': 'Optional: 1 to average predictions over flipped/zoomed views'
+            },
+            'raw_upload': {
+                'content_type': RAW_CONTENT_TYPE,
+                'body': f'{RAW_IMAGE_BYTES} bytes: {RAW_IMAGE_SIZE}x{RAW_IMAGE_SIZE}x3 uint8 RGB, '
+                        'already resized (shortest edge 256) and center cropped'
             }
         }
     })
 
+threading.Thread(target=load_and_warm_up, name='model-loader', daemon=True).start()
+if job_store:
+    job_worker = jobs.JobWorker(
+        job_store, classify_job_batch, interactive_requests,
+        ready=lambda: model_state['status'] == 'ready',
+        batch_size=JOB_BATCH_SIZE,
+    ).start()
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5005))
     app.run(host='0.0.0.0', port=port, debug=False)
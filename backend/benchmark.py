@@ -0,0 +1,297 @@
+"""
+Component Micro-Benchmarks
+Times image decode, preprocessing, the model forward pass, /predict
+postprocessing and the full Flask request on small synthetic inputs, and
+compares the results with a stored baseline so a slow change is caught
+before it reaches the VPS.
+
+benchmark_baseline.json is a reference run of the decode group on a 1-core
+Xeon without TensorFlow (see its 'environment'); re-record it on the
+serving machine with the full suite before relying on `compare`.
+
+Usage:
+    python benchmark.py run                          # print results
+    python benchmark.py run --save-baseline          # record benchmark_baseline.json
+    python benchmark.py compare                      # run again, exit 1 on regressions
+    python benchmark.py compare --only decode,forward --tolerance 0.25
+"""
+
+import io
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+import inference
+import leaf_gate
+import tta
+
+BASELINE_PATH = 'benchmark_baseline.json'
+DEFAULT_TOLERANCE = 0.15
+FORWARD_BATCH_SIZES = (1, 8, 32)
+GROUPS = ('decode', 'preprocess', 'forward', 'postprocess', 'request')
+
+
+# ---------------------------------------------------------------------------
+# Synthetic inputs and timing
+# ---------------------------------------------------------------------------
+
+def synthetic_jpeg(width, height, seed=0):
+    """Green gradient with noise, JPEG encoded, so decode cost resembles a photo"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    image = np.stack([40 + 100 * x / width, 140 + 80 * y / height, np.full_like(x, 60)], axis=-1)
+    image += rng.normal(0, 12, image.shape)
+    buffer = io.BytesIO()
+    Image.fromarray(np.clip(image, 0, 255).astype(np.uint8)).save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def time_call(fn, min_time=1.0, min_runs=10, warmup=3):
+    """Run fn repeatedly for at least min_time seconds; per-call stats in ms"""
+    for _ in range(warmup):
+        fn()
+    times = []
+    start = time.perf_counter()
+    while len(times) < min_runs or time.perf_counter() - start < min_time:
+        call_start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - call_start) * 1000)
+    times = np.array(times)
+    return {
+        'median_ms': float(np.median(times)),
+        'p90_ms': float(np.percentile(times, 90)),
+        'min_ms': float(times.min()),
+        'runs': int(len(times)),
+    }
+
+
+def cpu_model():
+    """CPU model name from /proc/cpuinfo on Linux, platform.processor() elsewhere"""
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    return line.split(':', 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def environment():
+    try:
+        import tensorflow as tf
+        tf_version = tf.__version__
+    except ImportError:
+        # decode-only runs work without the ML stack installed
+        tf_version = None
+    return {
+        'python': platform.python_version(),
+        'tensorflow': tf_version,
+        'machine': platform.machine(),
+        'processor': cpu_model(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Benchmarks
+# ---------------------------------------------------------------------------
+
+def iter_benchmarks(model_path, groups):
+    """
+    Yield (name, fn) for the selected groups. Models are only loaded when a
+    group that needs them is selected.
+    """
+    small_jpeg = synthetic_jpeg(640, 480)
+    large_jpeg = synthetic_jpeg(1600, 1200, seed=1)
+    image = Image.open(io.BytesIO(small_jpeg)).convert('RGB')
+
+    if 'decode' in groups:
+        yield 'decode/jpeg_640x480', lambda: Image.open(io.BytesIO(small_jpeg)).convert('RGB')
+        yield 'decode/jpeg_1600x1200', lambda: Image.open(io.BytesIO(large_jpeg)).convert('RGB')
+        yield 'decode/draft_1600x1200', lambda: inference.decode_image(large_jpeg)
+
+    if 'preprocess' in groups:
+        yield 'preprocess/leaf_gate', lambda: leaf_gate.is_leaf(image)
+        from transformers import AutoImageProcessor
+        processor = AutoImageProcessor.from_pretrained(model_path)
+        yield 'preprocess/processor', lambda: processor(images=image, return_tensors='np')
+        yield 'preprocess/tta_views', lambda: tta.make_views(image)
+
+    if 'forward' in groups or 'postprocess' in groups:
+        import tensorflow as tf
+        model, _, id2label = inference.load_model(model_path)
+
+        if 'forward' in groups:
+            for batch_size in FORWARD_BATCH_SIZES:
+                pixel_values = np.random.rand(batch_size, 3, 224, 224).astype(np.float32)
+                yield f'forward/bs{batch_size}', lambda x=pixel_values: model(pixel_values=x).logits.numpy()
+
+            serving_path = inference.latest_serving_model()
+            if serving_path:
+                serving = inference.ServingModel(serving_path)
+                for batch_size in FORWARD_BATCH_SIZES:
+                    pixels = np.asarray(image.resize((256, 256)))[None].repeat(batch_size, axis=0)
+                    yield f'forward/serving_bs{batch_size}', lambda x=pixels: serving.predict(x)
+
+        if 'postprocess' in groups:
+            logits = tf.constant(np.random.randn(1, len(id2label)).astype(np.float32))
+
+            def postprocess():
+                probabilities = tf.nn.softmax(logits, axis=-1).numpy()[0]
+                return json.dumps(inference.format_prediction(probabilities, id2label))
+            yield 'postprocess/softmax_format', postprocess
+
+    if 'request' in groups:
+        # Every test client request comes from 127.0.0.1; the per-IP limit
+        # would answer the timing loop with 429s
+        os.environ.setdefault('RATE_LIMIT_RPS', '0')
+        import app as server
+        if not server.wait_until_ready(timeout=600):
+            raise RuntimeError(f"Model failed to load: {server.model_state['error']}")
+        client = server.app.test_client()
+
+        def post_predict():
+            response = client.post('/predict', data={'image': (io.BytesIO(small_jpeg), 'leaf.jpg')},
+                                   content_type='multipart/form-data')
+            if response.status_code != 200:
+                raise RuntimeError(f"/predict returned {response.status_code}: {response.get_data(as_text=True)}")
+        raw_pixels = np.asarray(image.resize((224, 224))).tobytes()
+
+        def post_predict_raw():
+            response = client.post('/predict', data=raw_pixels, content_type=server.RAW_CONTENT_TYPE)
+            if response.status_code != 200:
+                raise RuntimeError(f"/predict (raw) returned {response.status_code}: {response.get_data(as_text=True)}")
+        yield 'request/health', lambda: client.get('/health')
+        yield 'request/predict', post_predict
+        yield 'request/predict_raw', post_predict_raw
+
+
+def run_suite(model_path, groups, min_time):
+    results = {}
+    for name, fn in iter_benchmarks(model_path, groups):
+        results[name] = time_call(fn, min_time=min_time)
+        stats = results[name]
+        print(f"   {name:<28}{stats['median_ms']:>10.3f} ms  (p90 {stats['p90_ms']:.3f}, {stats['runs']} runs)")
+    return {'environment': environment(), 'results': results}
+
+
+# ---------------------------------------------------------------------------
+# Compare
+# ---------------------------------------------------------------------------
+
+def compare(baseline, current, tolerance):
+    """
+    Compare medians. Returns rows of (name, baseline_ms, current_ms, ratio, status)
+    where status is 'regression', 'improved', 'ok', 'new' or 'missing'.
+    """
+    rows = []
+    names = list(baseline['results']) + [n for n in current['results'] if n not in baseline['results']]
+    for name in names:
+        before = baseline['results'].get(name)
+        after = current['results'].get(name)
+        if before is None:
+            rows.append((name, None, after['median_ms'], None, 'new'))
+        elif after is None:
+            rows.append((name, before['median_ms'], None, None, 'missing'))
+        else:
+            ratio = after['median_ms'] / before['median_ms']
+            status = 'regression' if ratio > 1 + tolerance else 'improved' if ratio < 1 - tolerance else 'ok'
+            rows.append((name, before['median_ms'], after['median_ms'], ratio, status))
+    return rows
+
+
+def print_comparison(rows, tolerance):
+    icons = {'regression': '❌', 'improved': '🚀', 'ok': '✅', 'new': '🆕', 'missing': '➖'}
+    print("\n" + "="*70)
+    print(f"🎯 BENCHMARK COMPARISON (tolerance ±{tolerance*100:.0f}%)")
+    print("="*70)
+    print(f"   {'Benchmark':<28}{'Baseline':>10}{'Current':>10}{'Change':>9}")
+    for name, before, after, ratio, status in rows:
+        before_text = f"{before:.3f}" if before is not None else '-'
+        after_text = f"{after:.3f}" if after is not None else '-'
+        change = f"{(ratio - 1)*100:+.1f}%" if ratio is not None else '-'
+        print(f"{icons[status]} {name:<28}{before_text:>10}{after_text:>10}{change:>9}")
+    print("="*70 + "\n")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Component micro-benchmarks with stored baselines')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Run the benchmarks')
+    run_parser.add_argument('--save-baseline', action='store_true', help='Write the results to --baseline')
+    run_parser.add_argument('--output', type=str, help='Also write the results to this JSON file')
+
+    compare_parser = subparsers.add_parser('compare', help='Compare against the baseline, exit 1 on regressions')
+    compare_parser.add_argument('--results', type=str, help='Compare this results file instead of running the suite')
+    compare_parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                                help=f'Allowed slowdown of the median (default: {DEFAULT_TOLERANCE})')
+
+    for sub in (run_parser, compare_parser):
+        sub.add_argument('--baseline', type=str, default=BASELINE_PATH, help=f'Baseline file (default: {BASELINE_PATH})')
+        sub.add_argument('--only', type=str, help=f"Comma-separated groups (default: {','.join(GROUPS)})")
+        sub.add_argument('--model', type=str, default=inference.MODEL_PATH, help='Model directory (default: ./hf_model)')
+        sub.add_argument('--min-time', type=float, default=1.0, help='Seconds per benchmark (default: 1.0)')
+
+    args = parser.parse_args()
+    groups = tuple(args.only.split(',')) if args.only else GROUPS
+    unknown = set(groups) - set(GROUPS)
+    if unknown:
+        parser.error(f"unknown group(s): {', '.join(sorted(unknown))}")
+
+    print("\n" + "🍅"*30)
+    print("TOMATO DISEASE API - MICRO-BENCHMARKS")
+    print("🍅"*30 + "\n")
+
+    if args.command == 'compare' and args.results:
+        with open(args.results) as f:
+            current = json.load(f)
+    else:
+        print(f"⏱️  Running: {', '.join(groups)}")
+        current = run_suite(args.model, groups, args.min_time)
+
+    if args.command == 'run':
+        for path in filter(None, [args.output, args.baseline if args.save_baseline else None]):
+            with open(path, 'w') as f:
+                json.dump(current, f, indent=2)
+            print(f"\n✅ Results written to {path}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"❌ Baseline not found: {args.baseline}")
+        print("   Run: python benchmark.py run --save-baseline")
+        sys.exit(1)
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    if baseline['environment'] != current['environment']:
+        print("\n⚠️  Baseline was recorded on a different environment:")
+        for key, value in baseline['environment'].items():
+            if current['environment'].get(key) != value:
+                print(f"   {key}: {value} -> {current['environment'].get(key)}")
+
+    # A partial run (--only) is only compared on what it measured
+    if args.only:
+        baseline['results'] = {
+            name: stats for name, stats in baseline['results'].items() if name.split('/')[0] in groups
+        }
+
+    rows = compare(baseline, current, args.tolerance)
+    print_comparison(rows, args.tolerance)
+    regressions = [row[0] for row in rows if row[4] == 'regression']
+    if regressions:
+        print(f"❌ {len(regressions)} regression(s): {', '.join(regressions)}\n")
+        sys.exit(1)
+    print("✅ No regressions\n")
+
+
+if __name__ == '__main__':
+    main()
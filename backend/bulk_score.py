@@ -0,0 +1,273 @@
+"""
+Resumable Bulk Scoring
+Scores whole directories or tar archives of images with the served model and
+the same postprocessing as /predict, writing results incrementally to CSV or
+Parquet. An interrupted run picks up where it stopped.
+
+Usage:
+    python bulk_score.py /data/drone_2024 scout_photos.tar.gz --output scores.csv
+    python bulk_score.py /data/drone_2024 --output scores.parquet --format parquet
+    python bulk_score.py /data/drone_2024 --output scores.csv        # re-run to resume
+"""
+
+import csv
+import json
+import os
+import tarfile
+import time
+
+import numpy as np
+
+import inference
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+# ---------------------------------------------------------------------------
+# Input streaming
+# ---------------------------------------------------------------------------
+
+def iter_sources(inputs, skip=0):
+    """
+    Yield (key, path_or_bytes) for every image in `inputs`, in a stable order.
+    Directories are walked in sorted order; tar archives are read as a stream.
+    The first `skip` images are passed over without being read.
+    """
+    index = 0
+    for source in inputs:
+        if os.path.isdir(source):
+            for root, dirs, files in os.walk(source):
+                dirs.sort()
+                for name in sorted(files):
+                    if not name.lower().endswith(IMAGE_EXTENSIONS):
+                        continue
+                    if index >= skip:
+                        path = os.path.join(root, name)
+                        yield path, path
+                    index += 1
+        elif tarfile.is_tarfile(source):
+            with tarfile.open(source, 'r|*') as tar:
+                for member in tar:
+                    if not (member.isfile() and member.name.lower().endswith(IMAGE_EXTENSIONS)):
+                        continue
+                    if index >= skip:
+                        yield f"{source}::{member.name}", tar.extractfile(member).read()
+                    index += 1
+        else:
+            print(f"⚠️  Skipping {source}: not a directory or tar archive")
+
+
+# ---------------------------------------------------------------------------
+# Output writers
+# ---------------------------------------------------------------------------
+
+class CsvOutput:
+    """Append-only CSV; state is the byte offset of the last committed row"""
+
+    def __init__(self, path, columns, state=None):
+        exists = os.path.exists(path)
+        self.file = open(path, 'a+' if exists else 'w', newline='')
+        if state:
+            # Drop rows written after the last checkpoint
+            self.file.truncate(state['offset'])
+            self.file.seek(state['offset'])
+        elif exists:
+            self.file.truncate(0)
+        self.writer = csv.DictWriter(self.file, fieldnames=columns)
+        if self.file.tell() == 0:
+            self.writer.writeheader()
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def commit(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return {'offset': self.file.tell()}
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetOutput:
+    """Directory of Parquet part files, one per commit; state is the part count"""
+
+    def __init__(self, path, columns, state=None):
+        import pyarrow  # noqa: F401  (fail early if Parquet support is missing)
+        self.path = path
+        self.columns = columns
+        self.parts = state['parts'] if state else 0
+        self.rows = []
+        os.makedirs(path, exist_ok=True)
+        # Remove parts written after the last checkpoint (or all, on a fresh run)
+        for name in os.listdir(path):
+            if name.startswith('part-') and int(name[5:10]) >= self.parts:
+                os.remove(os.path.join(path, name))
+
+    def write(self, rows):
+        self.rows.extend(rows)
+
+    def commit(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        if self.rows:
+            schema = pa.schema([
+                (c, pa.float64() if c.startswith('confidence_') else pa.string()) for c in self.columns
+            ])
+            table = pa.Table.from_pylist(self.rows, schema=schema)
+            pq.write_table(table, os.path.join(self.path, f"part-{self.parts:05d}.parquet"))
+            self.parts += 1
+            self.rows = []
+        return {'parts': self.parts}
+
+    def close(self):
+        pass
+
+
+def output_columns(top_k):
+    columns = ['source', 'model_version', 'disease']
+    for i in range(1, top_k + 1):
+        columns += [f'label_{i}', f'confidence_{i}']
+    return columns + ['error']
+
+
+def result_row(key, probabilities, id2label, top_k, model_version):
+    """Flatten the /predict response for one image into a table row"""
+    prediction = inference.format_prediction(probabilities, id2label, top_k=top_k)
+    row = {'source': key, 'model_version': model_version, 'disease': prediction['disease'], 'error': ''}
+    for i, top in enumerate(prediction['top_predictions'], 1):
+        row[f'label_{i}'] = top['full_label']
+        row[f'confidence_{i}'] = round(top['confidence'], 6)
+    return row
+
+
+# ---------------------------------------------------------------------------
+# Checkpoint
+# ---------------------------------------------------------------------------
+
+def load_checkpoint(path, inputs, model_version):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint['inputs'] != inputs or checkpoint['model_version'] != model_version:
+        print("⚠️  Checkpoint is for different inputs or model version, starting over")
+        return None
+    return checkpoint
+
+
+def save_checkpoint(path, checkpoint):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def main():
+    import argparse
+    import tensorflow as tf
+
+    parser = argparse.ArgumentParser(description='Bulk-score image directories and tar archives')
+    parser.add_argument('inputs', nargs='+', help='Directories and/or tar archives (.tar, .tar.gz, ...)')
+    parser.add_argument('--output', type=str, required=True, help='Output CSV file or Parquet directory')
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv', help='Output format (default: csv)')
+    parser.add_argument('--model', type=str, default=inference.MODEL_PATH, help='HF model, SavedModel or serving export directory (default: ./hf_model)')
+    parser.add_argument('--top-k', type=int, default=3, help='Labels per image (default: 3)')
+    parser.add_argument('--batch-size', type=int, default=32, help='Inference batch size (default: 32)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Decode processes (default: CPU count)')
+    parser.add_argument('--commit-every', type=int, default=8, help='Batches between checkpoints (default: 8)')
+    parser.add_argument('--restart', action='store_true', help='Ignore any existing checkpoint')
+
+    args = parser.parse_args()
+
+    print("\n" + "🍅"*30)
+    print("TOMATO DISEASE BULK SCORING")
+    print("🍅"*30 + "\n")
+
+    inputs = [os.path.abspath(p) for p in args.inputs]
+    model_version = inference.model_fingerprint(args.model)
+    checkpoint_path = args.output.rstrip('/') + '.checkpoint.json'
+    checkpoint = None if args.restart else load_checkpoint(checkpoint_path, inputs, model_version)
+    processed = checkpoint['processed'] if checkpoint else 0
+    if checkpoint:
+        print(f"⏩ Resuming after {processed} images")
+
+    columns = output_columns(args.top_k)
+    output_cls = ParquetOutput if args.format == 'parquet' else CsvOutput
+    output = output_cls(args.output, columns, checkpoint['output'] if checkpoint else None)
+
+    print(f"📥 Loading model from {args.model} (version {model_version})...")
+    model, _, id2label = inference.load_model(args.model)
+    # A serving export gets the uint8 crops the job worker sends it
+    serving = isinstance(model, inference.ServingModel)
+    print(f"✅ Model loaded, decoding with {args.workers} processes\n")
+
+    batch_keys, batch_arrays, pending_rows = [], [], []
+    batches_since_commit = 0
+    scored = errors = 0
+    start = time.perf_counter()
+
+    def run_batch():
+        if serving:
+            probabilities = model.predict_resized(np.stack(batch_arrays))['probabilities']
+        else:
+            probabilities = tf.nn.softmax(model(pixel_values=np.stack(batch_arrays)).logits, axis=-1).numpy()
+        for key, probs in zip(batch_keys, probabilities):
+            pending_rows.append(result_row(key, probs, id2label, args.top_k, model_version))
+        batch_keys.clear()
+        batch_arrays.clear()
+
+    def commit():
+        nonlocal processed, pending_rows
+        output.write(pending_rows)
+        processed += len(pending_rows)
+        pending_rows = []
+        save_checkpoint(checkpoint_path, {
+            'inputs': inputs,
+            'model_version': model_version,
+            'processed': processed,
+            'output': output.commit(),
+        })
+        elapsed = time.perf_counter() - start
+        print(f"\r   {processed} images done ({scored / elapsed:.1f} images/sec this run)", end='', flush=True)
+
+    # Results arrive in input order, so `processed` is always a prefix of
+    # the input stream and resuming can simply skip it
+    sources = iter_sources(inputs, skip=processed)
+    preprocessed = inference.iter_preprocessed(sources, args.model, args.workers, args.batch_size * 4, resized=serving)
+    for key, array, error in preprocessed:
+        if error is not None:
+            if batch_arrays:
+                run_batch()
+            pending_rows.append({'source': key, 'model_version': model_version, 'error': error})
+            errors += 1
+            continue
+        batch_keys.append(key)
+        batch_arrays.append(array)
+        scored += 1
+        if len(batch_arrays) == args.batch_size:
+            run_batch()
+            batches_since_commit += 1
+            if batches_since_commit >= args.commit_every:
+                commit()
+                batches_since_commit = 0
+
+    if batch_arrays:
+        run_batch()
+    commit()
+
+    output.close()
+    elapsed = time.perf_counter() - start
+
+    print("\n\n" + "="*60)
+    print("🎯 BULK SCORING COMPLETE")
+    print("="*60)
+    print(f"Scored this run: {scored} images ({errors} unreadable)")
+    print(f"Total processed: {processed}")
+    print(f"Throughput: {scored / elapsed:.1f} images/sec")
+    print(f"Results: {args.output}")
+    print("="*60 + "\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""
+Resumable Training Checkpoints
+Saves full training state in the background so interrupted runs can resume
+"""
+
+import os
+import pickle
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+
+CHECKPOINT_DIR = 'checkpoints'
+STATE_FILE = 'training_state.pkl'
+
+# Callback attributes that make up their resumable state
+CALLBACK_STATE_ATTRS = ('wait', 'best', 'cooldown_counter', 'best_epoch', 'stopped_epoch')
+
+
+class TrainingCheckpoint(keras.callbacks.Callback):
+    """
+    Write model, optimizer, RNG, callback and data-iterator state every N epochs.
+
+    Variables are written with TensorFlow's async checkpointing, so the training
+    loop only pays for the copy to host memory. The small state file that marks
+    a checkpoint as complete is written from a background thread once the
+    variables are on disk, so a killed run never resumes from a partial save.
+
+    Must come after every callback in `tracked_callbacks` in the callbacks
+    list, so the restored EarlyStopping / ReduceLROnPlateau state is applied
+    after those callbacks reset themselves. Callbacks that are not tracked
+    (e.g. ThroughputMonitor) may come after it.
+    """
+
+    def __init__(self, directory=CHECKPOINT_DIR, data=None, every_n_epochs=1,
+                 max_to_keep=3, tracked_callbacks=()):
+        super().__init__()
+        self.directory = directory
+        self.data = data
+        self.every_n_epochs = max(1, int(every_n_epochs))
+        self.max_to_keep = max_to_keep
+        self.tracked_callbacks = list(tracked_callbacks)
+        self.options = tf.train.CheckpointOptions(enable_async=True)
+        self._checkpoint = None
+        self._manager = None
+        self._pending_state = None
+        self._pending_data_state = None
+        self._writer = ThreadPoolExecutor(max_workers=1)
+        self._last_write = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _ensure_checkpoint(self, model):
+        if self._checkpoint is None:
+            # Create optimizer slots up front so they can be restored eagerly
+            model.optimizer.build(model.trainable_variables)
+            self._checkpoint = tf.train.Checkpoint(model=model, optimizer=model.optimizer)
+            self._manager = tf.train.CheckpointManager(
+                self._checkpoint, self.directory, max_to_keep=self.max_to_keep
+            )
+        return self._checkpoint
+
+    def restore(self, model):
+        """
+        Restore the latest complete checkpoint into `model`.
+        Returns the epoch to pass as `initial_epoch` to `model.fit` (0 if none).
+        """
+        state_path = os.path.join(self.directory, STATE_FILE)
+        if not os.path.exists(state_path):
+            print(f"ℹ️  No checkpoint found in {self.directory}, starting from scratch")
+            return 0
+
+        with open(state_path, 'rb') as f:
+            state = pickle.load(f)
+
+        checkpoint = self._ensure_checkpoint(model)
+        checkpoint.restore(state['checkpoint_path']).expect_partial()
+
+        random.setstate(state['python_rng'])
+        np.random.set_state(state['numpy_rng'])
+        if state.get('index_array') is not None:
+            self._pending_data_state = (state['index_array'], state['total_batches_seen'])
+            if self.data is not None:
+                self.attach_data(self.data)
+
+        # Callback state is applied in on_train_begin, after callbacks reset
+        self._pending_state = state['callbacks']
+
+        print(f"✅ Resumed from {state['checkpoint_path']}")
+        print(f"   Completed epochs: {state['epoch']}")
+        print(f"   Learning rate: {state['learning_rate']:.2e}")
+        return state['epoch']
+
+    def attach_data(self, data):
+        """
+        Track `data` from now on, e.g. the iterator of a new progressive
+        resizing phase; a restored shuffle order is applied to the first one
+        """
+        self.data = data
+        if self._pending_data_state is not None:
+            data.index_array, data.total_batches_seen = self._pending_data_state
+            self._pending_data_state = None
+
+    def on_train_begin(self, logs=None):
+        self._ensure_checkpoint(self.model)
+        if self._pending_state is None:
+            return
+        for callback, attrs in zip(self.tracked_callbacks, self._pending_state):
+            for name, value in attrs.items():
+                setattr(callback, name, value)
+        self._pending_state = None
+
+    def on_epoch_end(self, epoch, logs=None):
+        completed = epoch + 1
+        if completed % self.every_n_epochs != 0:
+            return
+
+        # Snapshot host-side state now; it changes as soon as training continues
+        state = {
+            'epoch': completed,
+            'learning_rate': float(keras.ops.convert_to_numpy(self.model.optimizer.learning_rate)),
+            'python_rng': random.getstate(),
+            'numpy_rng': np.random.get_state(),
+            'callbacks': [
+                {name: getattr(cb, name) for name in CALLBACK_STATE_ATTRS if hasattr(cb, name)}
+                for cb in self.tracked_callbacks
+            ],
+            'index_array': None,
+            'total_batches_seen': 0,
+        }
+        if self.data is not None and getattr(self.data, 'index_array', None) is not None:
+            state['index_array'] = np.array(self.data.index_array, copy=True)
+            state['total_batches_seen'] = self.data.total_batches_seen
+
+        state['checkpoint_path'] = self._manager.save(checkpoint_number=completed, options=self.options)
+        self._last_write = self._writer.submit(self._commit, state)
+
+    def _commit(self, state):
+        """Wait for the async variable write, then atomically publish the state file"""
+        self._checkpoint.sync()
+        state_path = os.path.join(self.directory, STATE_FILE)
+        tmp_path = state_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(state, f)
+        os.replace(tmp_path, state_path)
+
+    def on_train_end(self, logs=None):
+        # Don't let the process exit while a checkpoint is still being written
+        if self._last_write is not None:
+            self._last_write.result()
@@ -0,0 +1,120 @@
+"""
+tf.data Input Pipeline for the Tomato Dataset
+Parallel decode/resize with optional per-worker sharding, and the same
+augmentation recipe as train.py's ImageDataGenerator done with tf ops
+"""
+
+import math
+
+import tensorflow as tf
+
+from prepare_dataset import list_image_files
+
+AUTOTUNE = tf.data.AUTOTUNE
+
+# train.py's ImageDataGenerator settings. shear_range is in degrees there.
+ROTATION_RANGE = 40
+SHIFT_RANGE = 0.2
+SHEAR_RANGE = 0.2
+ZOOM_RANGE = 0.2
+
+
+def load_image(path, image_size):
+    """Read, decode and resize one image to float32 in [0, 1]"""
+    data = tf.io.read_file(path)
+    image = tf.io.decode_image(data, channels=3, expand_animations=False)
+    image = tf.image.resize(image, image_size)
+    return image / 255.0
+
+
+def _matrix(rows):
+    return tf.stack([tf.stack([tf.cast(value, tf.float32) for value in row]) for row in rows])
+
+
+def random_affine(image):
+    """
+    Random rotation, shift, shear and zoom of one HWC image, sampled like
+    ImageDataGenerator: bilinear sampling, fill_mode='nearest'.
+    """
+    shape = tf.cast(tf.shape(image)[:2], tf.float32)
+    height, width = shape[0], shape[1]
+
+    def uniform(limit):
+        return tf.random.uniform([], -limit, limit)
+
+    theta = uniform(ROTATION_RANGE) * math.pi / 180
+    shear = uniform(SHEAR_RANGE) * math.pi / 180
+    tx, ty = uniform(SHIFT_RANGE) * width, uniform(SHIFT_RANGE) * height
+    zx, zy = 1 + uniform(ZOOM_RANGE), 1 + uniform(ZOOM_RANGE)
+    cx, cy = (width - 1) / 2, (height - 1) / 2
+
+    # Maps output (x, y) to the input point it samples, about the image centre
+    transform = (
+        _matrix([[1, 0, cx], [0, 1, cy], [0, 0, 1]])
+        @ _matrix([[tf.cos(theta), -tf.sin(theta), 0], [tf.sin(theta), tf.cos(theta), 0], [0, 0, 1]])
+        @ _matrix([[1, 0, tx], [0, 1, ty], [0, 0, 1]])
+        @ _matrix([[1, -tf.sin(shear), 0], [0, tf.cos(shear), 0], [0, 0, 1]])
+        @ _matrix([[zx, 0, 0], [0, zy, 0], [0, 0, 1]])
+        @ _matrix([[1, 0, -cx], [0, 1, -cy], [0, 0, 1]])
+    )
+    transformed = tf.raw_ops.ImageProjectiveTransformV3(
+        images=image[None],
+        transforms=tf.reshape(transform, [9])[None, :8],
+        output_shape=tf.shape(image)[:2],
+        fill_value=0.0,
+        interpolation='BILINEAR',
+        fill_mode='NEAREST'
+    )[0]
+    transformed.set_shape(image.shape)
+    return transformed
+
+
+def augment(image, label):
+    """train.py's augmentation: rotation, shift, shear, zoom and both flips"""
+    image = random_affine(image)
+    image = tf.image.random_flip_left_right(image)
+    image = tf.image.random_flip_up_down(image)
+    return image, label
+
+
+def make_dataset(directory, image_size=(224, 224), batch_size=32, training=False,
+                 num_shards=1, shard_index=0, repeat=False, seed=42):
+    """
+    Build a batched dataset of (image, one_hot_label).
+
+    Args:
+        directory: Split directory (e.g. data/tomato_dataset/train)
+        image_size: (height, width) to resize to
+        batch_size: Batch size of this pipeline (per worker when sharded)
+        training: Shuffle and augment
+        num_shards / shard_index: Keep only every num_shards-th file, for this worker
+        repeat: Repeat forever and drop the last partial batch (needed when
+            several workers must run the same number of steps)
+
+    Returns:
+        (dataset, num_samples) where num_samples counts the whole split
+    """
+    paths, labels, class_names = list_image_files(directory)
+    num_classes = len(class_names)
+
+    dataset = tf.data.Dataset.from_tensor_slices((paths, labels))
+    if num_shards > 1:
+        dataset = dataset.shard(num_shards, shard_index)
+    if training:
+        dataset = dataset.shuffle(len(paths), seed=seed, reshuffle_each_iteration=True)
+
+    dataset = dataset.map(
+        lambda path, label: (load_image(path, image_size), tf.one_hot(label, num_classes)),
+        num_parallel_calls=AUTOTUNE
+    )
+    if training:
+        dataset = dataset.map(augment, num_parallel_calls=AUTOTUNE)
+    if repeat:
+        dataset = dataset.repeat()
+
+    dataset = dataset.batch(batch_size, drop_remainder=repeat).prefetch(AUTOTUNE)
+
+    # Sharding is done explicitly above; stop tf.distribute from sharding again
+    options = tf.data.Options()
+    options.experimental_distribute.auto_shard_policy = tf.data.experimental.AutoShardPolicy.OFF
+    return dataset.with_options(options), len(paths)
@@ -0,0 +1,278 @@
+"""
+Near-Duplicate Detection
+Perceptual hashes (64-bit pHash and dHash) of every image, computed in a
+process pool, indexed in a multi-index hash table for Hamming-radius queries
+and grouped with union-find. prepare_dataset.py --dedup uses the groups so
+near-identical shots of one leaf never end up on both sides of the split.
+
+Two images are near-duplicates when their pHashes differ in at most
+`radius` bits and their dHashes in at most `dhash_radius` bits.
+
+Usage:
+    python dedup.py                                  # report on data/tomato_dataset
+    python dedup.py --data data/plantvillage_download --radius 4 --output duplicates.json
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from prepare_dataset import IMAGE_EXTENSIONS
+
+DATA_DIR = 'data/tomato_dataset'
+RADIUS = 6
+DHASH_RADIUS = 10
+HASH_BITS = 64
+
+
+# ---------------------------------------------------------------------------
+# Hashes
+# ---------------------------------------------------------------------------
+
+def _dct_matrix(n):
+    """Orthonormal DCT-II basis, so dct(a) = D @ a @ D.T"""
+    k = np.arange(n)[:, None]
+    d = np.cos(np.pi * (2 * np.arange(n)[None, :] + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    d[0] /= np.sqrt(2)
+    return d
+
+
+_DCT_32 = _dct_matrix(32)
+
+
+def _bits_to_int(bits):
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), 'big')
+
+
+def image_hashes(path):
+    """(phash, dhash) of one image as 64-bit ints, or None if it cannot be read"""
+    try:
+        image = Image.open(path)
+        # JPEG DCT scaling: decode at 1/8 size or so, hashes only need 32x32
+        image.draft('L', (64, 64))
+        gray = image.convert('L')
+    except Exception:
+        return None
+    small = np.asarray(gray.resize((32, 32), Image.BILINEAR), dtype=np.float64)
+    low = (_DCT_32 @ small @ _DCT_32.T)[:8, :8].ravel()
+    # The DC term only encodes brightness; leave it out of the median
+    phash = _bits_to_int(low > np.median(low[1:]))
+    tiny = np.asarray(gray.resize((9, 8), Image.BILINEAR), dtype=np.int16)
+    dhash = _bits_to_int(tiny[:, 1:] > tiny[:, :-1])
+    return phash, dhash
+
+
+def hash_images(paths, workers=None):
+    """Hashes of every path, in order, computed in a process pool"""
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(image_hashes, paths, chunksize=64))
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+# ---------------------------------------------------------------------------
+# Index and grouping
+# ---------------------------------------------------------------------------
+
+class MultiIndexHash:
+    """
+    Hamming-radius search over 64-bit hashes. Each hash is cut into radius+1
+    chunks; by pigeonhole, any hash within `radius` bits matches at least one
+    chunk exactly, so only those buckets are checked.
+    """
+
+    def __init__(self, radius):
+        self.radius = radius
+        chunks = radius + 1
+        bounds = np.linspace(0, HASH_BITS, chunks + 1).astype(int)
+        self.chunks = [(int(lo), (1 << int(hi - lo)) - 1) for lo, hi in zip(bounds[:-1], bounds[1:])]
+        self.tables = [{} for _ in self.chunks]
+        self.hashes = []
+
+    def _keys(self, value):
+        return [(value >> shift) & mask for shift, mask in self.chunks]
+
+    def add(self, value):
+        idx = len(self.hashes)
+        self.hashes.append(value)
+        for table, key in zip(self.tables, self._keys(value)):
+            table.setdefault(key, []).append(idx)
+        return idx
+
+    def query(self, value):
+        """Indices of stored hashes within radius of value"""
+        candidates = set()
+        for table, key in zip(self.tables, self._keys(value)):
+            candidates.update(table.get(key, ()))
+        return [idx for idx in candidates if hamming(self.hashes[idx], value) <= self.radius]
+
+
+class UnionFind:
+    def __init__(self, n):
+        self.parent = list(range(n))
+
+    def find(self, x):
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            self.parent[max(a, b)] = min(a, b)
+
+
+def find_groups(paths, radius=RADIUS, dhash_radius=DHASH_RADIUS, workers=None):
+    """
+    Group near-duplicate images.
+
+    Returns:
+        (group_of, unreadable): group id per path (the index of the group's
+        first path) and the paths that could not be decoded, which stay in
+        groups of their own
+    """
+    hashes = hash_images(paths, workers)
+    index = MultiIndexHash(radius)
+    groups = UnionFind(len(paths))
+    slots = {}
+    unreadable = []
+    for i, h in enumerate(hashes):
+        if h is None:
+            unreadable.append(paths[i])
+            continue
+        phash, dhash = h
+        for j in index.query(phash):
+            other = slots[j]
+            if hamming(hashes[other][1], dhash) <= dhash_radius:
+                groups.union(i, other)
+        slots[index.add(phash)] = i
+    return [groups.find(i) for i in range(len(paths))], unreadable
+
+
+def list_images(directory):
+    """All images under directory, recursively, sorted"""
+    return sorted(
+        os.path.join(root, name)
+        for root, _, files in os.walk(directory)
+        for name in files if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+
+# ---------------------------------------------------------------------------
+# Report
+# ---------------------------------------------------------------------------
+
+def redundancy_report(paths, group_of, data_dir):
+    """
+    Redundancy per class and train/val leakage, for a data_dir laid out as
+    <split>/<class>/<image> (or <class>/<image> for a raw download).
+    """
+    members = {}
+    for path, group in zip(paths, group_of):
+        members.setdefault(group, []).append(os.path.relpath(path, data_dir).split(os.sep))
+
+    per_class = {}
+    leaked_groups = leaked_val = cross_class = 0
+    for parts_list in members.values():
+        classes = {parts[-2] for parts in parts_list if len(parts) >= 2}
+        cross_class += len(classes) > 1
+        for class_name in classes:
+            row = per_class.setdefault(class_name, {'images': 0, 'groups': 0, 'droppable': 0})
+            size = sum(1 for parts in parts_list if len(parts) >= 2 and parts[-2] == class_name)
+            row['images'] += size
+            row['groups'] += 1
+            row['droppable'] += size - 1
+        splits = [parts[0] for parts in parts_list if len(parts) >= 3]
+        if 'train' in splits and 'val' in splits:
+            leaked_groups += 1
+            leaked_val += splits.count('val')
+
+    return {
+        'images': len(paths),
+        'groups': len(members),
+        'droppable': len(paths) - len(members),
+        'duplicate_groups': sum(1 for m in members.values() if len(m) > 1),
+        'largest_group': max(len(m) for m in members.values()),
+        'cross_class_groups': cross_class,
+        'leaked_groups': leaked_groups,
+        'leaked_val_images': leaked_val,
+        'val_images': sum(1 for parts_list in members.values() for parts in parts_list if parts[0] == 'val'),
+        'per_class': per_class,
+    }
+
+
+def main():
+    import argparse
+    import json
+    import time
+
+    parser = argparse.ArgumentParser(description='Find near-duplicate images and report dataset redundancy')
+    parser.add_argument('--data', type=str, default=DATA_DIR, help=f'Image directory (default: {DATA_DIR})')
+    parser.add_argument('--radius', type=int, default=RADIUS, help=f'Max pHash Hamming distance (default: {RADIUS})')
+    parser.add_argument('--dhash-radius', type=int, default=DHASH_RADIUS,
+                        help=f'Max dHash Hamming distance (default: {DHASH_RADIUS})')
+    parser.add_argument('--workers', type=int, help='Hashing processes (default: CPU count)')
+    parser.add_argument('--output', type=str, help='Write the duplicate groups to this JSON file')
+
+    args = parser.parse_args()
+
+    print("\n" + "🍅"*30)
+    print("TOMATO DATASET - NEAR-DUPLICATE REPORT")
+    print("🍅"*30 + "\n")
+
+    if not os.path.exists(args.data):
+        print(f"❌ {args.data} not found")
+        print("   Run: python prepare_dataset.py --download")
+        return
+
+    paths = list_images(args.data)
+    print(f"🔍 Hashing {len(paths)} images from {args.data}...")
+    start = time.perf_counter()
+    group_of, unreadable = find_groups(paths, args.radius, args.dhash_radius, args.workers)
+    elapsed = time.perf_counter() - start
+    report = redundancy_report(paths, group_of, args.data)
+
+    print("\n" + "="*70)
+    print(f"🎯 NEAR-DUPLICATES (pHash ≤ {args.radius} bits, dHash ≤ {args.dhash_radius} bits)")
+    print("="*70)
+    print(f"Hashed and grouped in {elapsed:.1f}s ({len(paths) / max(elapsed, 1e-9):.0f} images/s)")
+    if unreadable:
+        print(f"⚠️  {len(unreadable)} unreadable image(s), e.g. {unreadable[0]}")
+    print(f"Images: {report['images']}, unique groups: {report['groups']}")
+    print(f"Redundant (could be dropped): {report['droppable']} ({report['droppable'] / max(report['images'], 1)*100:.1f}%)")
+    print(f"Duplicate groups: {report['duplicate_groups']}, largest: {report['largest_group']} images")
+    if report['cross_class_groups']:
+        print(f"⚠️  {report['cross_class_groups']} group(s) span several classes (label conflicts)")
+    if report['val_images']:
+        print(f"Train/val leakage: {report['leaked_val_images']} of {report['val_images']} val images "
+              f"({report['leaked_val_images'] / report['val_images']*100:.1f}%) have a near-duplicate in train")
+
+    print(f"\n{'Class':<50}{'Images':>8}{'Redundant':>11}")
+    for class_name, row in sorted(report['per_class'].items()):
+        print(f"{class_name:<50}{row['images']:>8}{row['droppable']:>7} ({row['droppable'] / row['images']*100:4.1f}%)")
+    print("="*70 + "\n")
+
+    if args.output:
+        groups = {}
+        for path, group in zip(paths, group_of):
+            groups.setdefault(group, []).append(path)
+        with open(args.output, 'w') as f:
+            json.dump({
+                'radius': args.radius,
+                'dhash_radius': args.dhash_radius,
+                'report': report,
+                'groups': [members for members in groups.values() if len(members) > 1],
+            }, f, indent=2)
+        print(f"✅ Duplicate groups written to {args.output}\n")
+
+    if report['leaked_val_images']:
+        print("💡 Re-split without leakage: python prepare_dataset.py --source <download> --dedup\n")
+
+
+if __name__ == '__main__':
+    main()
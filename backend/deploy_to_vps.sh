@@ -106,9 +106,14 @@ EOF
 echo "✅ Service restarted"
 echo ""
 
-# Test the API
-echo "🧪 Testing API..."
-sleep 5
+# Test the API (the model loads in the background; wait until it is ready)
+echo "🧪 Waiting for the model to load..."
+for i in $(seq 1 60); do
+    if curl -sf "http://$VPS_IP:5005/readyz" > /dev/null; then
+        break
+    fi
+    sleep 5
+done
 HEALTH_RESPONSE=$(curl -s "http://$VPS_IP:5005/health")
 
 if echo "$HEALTH_RESPONSE" | grep -q "healthy"; then
@@ -0,0 +1,247 @@
+"""
+Knowledge Distillation: HuggingFace ResNet50 (teacher) -> MobileNetV2 (student)
+Teacher logits are computed once per split and cached to disk; the student
+trains on a blend of hard-label and temperature-softened teacher loss.
+
+Usage:
+    python distill.py
+    python distill.py --alpha 0.3 --temperature 4 --epochs 30
+"""
+
+import hashlib
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+from PIL import Image
+
+import inference
+import quick_train
+from data_pipeline import list_image_files, load_image, AUTOTUNE
+
+CACHE_DIR = 'distill_cache'
+MODEL_SAVE_PATH = 'tomato_mobilenetv2_distilled.h5'
+TEACHER_BATCH_SIZE = 32
+
+
+# ---------------------------------------------------------------------------
+# Teacher logits cache
+# ---------------------------------------------------------------------------
+
+def cache_key(teacher_path, paths):
+    """Identify a cache by teacher weights and the exact file list"""
+    h = hashlib.sha1()
+    for name in sorted(os.listdir(teacher_path)):
+        stat = os.stat(os.path.join(teacher_path, name))
+        h.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    for path in paths:
+        h.update(path.encode())
+    return h.hexdigest()
+
+
+def compute_teacher_logits(teacher, processor, perm, paths):
+    """Run the teacher over `paths` in batches; columns in dataset folder order"""
+    logits = np.zeros((len(paths), len(perm)), dtype=np.float32)
+    start = time.time()
+    for i in range(0, len(paths), TEACHER_BATCH_SIZE):
+        batch_paths = paths[i:i + TEACHER_BATCH_SIZE]
+        images = [Image.open(p).convert('RGB') for p in batch_paths]
+        pixel_values = inference.preprocess(processor, images)
+        batch_logits = teacher(pixel_values=pixel_values).logits.numpy()
+        logits[i:i + len(batch_paths)] = batch_logits[:, perm]
+        done = i + len(batch_paths)
+        print(f"\r   {done}/{len(paths)} images ({done / (time.time() - start):.1f} img/s)", end='')
+    print()
+    return logits
+
+
+def load_teacher_logits(split_dir, teacher_path, teacher_bundle):
+    """
+    Return (paths, labels, logits) for one split, using the on-disk cache
+    when the teacher and file list are unchanged.
+    """
+    paths, labels, class_names = list_image_files(split_dir)
+    key = cache_key(teacher_path, paths)
+    split = os.path.basename(os.path.normpath(split_dir))
+    cache_path = os.path.join(CACHE_DIR, f"{split}_teacher_logits.npz")
+
+    if os.path.exists(cache_path):
+        cached = np.load(cache_path)
+        if str(cached['key']) == key:
+            print(f"✅ Using cached teacher logits: {cache_path}")
+            return paths, np.array(labels), cached['logits']
+
+    teacher, processor, id2label = teacher_bundle()
+    perm = inference.folder_to_model_index(class_names, id2label)
+    print(f"🧑‍🏫 Computing teacher logits for {split} ({len(paths)} images)...")
+    logits = compute_teacher_logits(teacher, processor, perm, paths)
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    np.savez(cache_path, key=key, logits=logits)
+    print(f"✅ Cached teacher logits: {cache_path}")
+    return paths, np.array(labels), logits
+
+
+# ---------------------------------------------------------------------------
+# Student training
+# ---------------------------------------------------------------------------
+
+def make_dataset(paths, labels, teacher_logits, batch_size, training):
+    """
+    Dataset of (image, [one_hot | teacher_logits]).
+    Only horizontal flips are applied: teacher logits were computed on the
+    un-augmented image, so heavier augmentation would make them stale.
+    """
+    num_classes = teacher_logits.shape[1]
+    targets = np.concatenate(
+        [np.eye(num_classes, dtype=np.float32)[labels], teacher_logits], axis=1
+    )
+    dataset = tf.data.Dataset.from_tensor_slices((paths, targets))
+    if training:
+        dataset = dataset.shuffle(len(paths), reshuffle_each_iteration=True)
+    dataset = dataset.map(
+        lambda path, target: (load_image(path, quick_train.IMG_SIZE), target),
+        num_parallel_calls=AUTOTUNE
+    )
+    if training:
+        dataset = dataset.map(
+            lambda image, target: (tf.image.random_flip_left_right(image), target),
+            num_parallel_calls=AUTOTUNE
+        )
+    return dataset.batch(batch_size).prefetch(AUTOTUNE)
+
+
+def distillation_loss(num_classes, alpha, temperature):
+    """alpha * CE(hard labels) + (1 - alpha) * T^2 * KL(teacher_T || student_T)"""
+    def loss(y_true, y_pred):
+        hard = y_true[:, :num_classes]
+        teacher = y_true[:, num_classes:]
+        hard_loss = keras.losses.categorical_crossentropy(hard, y_pred, from_logits=True)
+        soft_loss = keras.losses.kl_divergence(
+            tf.nn.softmax(teacher / temperature), tf.nn.softmax(y_pred / temperature)
+        ) * temperature ** 2
+        return alpha * hard_loss + (1 - alpha) * soft_loss
+    return loss
+
+
+def hard_label_accuracy(num_classes):
+    def accuracy(y_true, y_pred):
+        return keras.metrics.categorical_accuracy(y_true[:, :num_classes], y_pred)
+    return accuracy
+
+
+# ---------------------------------------------------------------------------
+# Report
+# ---------------------------------------------------------------------------
+
+def measure_latency(fn, runs=30, warmup=5):
+    """Median wall time of fn() in milliseconds"""
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return float(np.median(times))
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Distill the ResNet50 teacher into MobileNetV2')
+    parser.add_argument('--teacher', type=str, default=inference.MODEL_PATH, help='Teacher model directory (default: ./hf_model)')
+    parser.add_argument('--alpha', type=float, default=0.5, help='Weight of the hard-label loss (default: 0.5)')
+    parser.add_argument('--temperature', type=float, default=4.0, help='Softmax temperature (default: 4.0)')
+    parser.add_argument('--epochs', type=int, default=quick_train.EPOCHS, help=f'Training epochs (default: {quick_train.EPOCHS})')
+    parser.add_argument('--output', type=str, default=MODEL_SAVE_PATH, help=f'Student model path (default: {MODEL_SAVE_PATH})')
+
+    args = parser.parse_args()
+
+    print("\n" + "🍅"*30)
+    print("TOMATO DISEASE MODEL - KNOWLEDGE DISTILLATION")
+    print("🍅"*30 + "\n")
+
+    if not os.path.exists(quick_train.TRAIN_DIR):
+        print("❌ Dataset not found!")
+        print("   Run: python prepare_dataset.py --download")
+        return
+
+    # Load the teacher at most once, and only if a cache is stale
+    teacher_cache = {}
+
+    def teacher_bundle():
+        if 'bundle' not in teacher_cache:
+            print(f"📥 Loading teacher from {args.teacher}...")
+            teacher_cache['bundle'] = inference.load_model(args.teacher)
+        return teacher_cache['bundle']
+
+    train_paths, train_labels, train_logits = load_teacher_logits(quick_train.TRAIN_DIR, args.teacher, teacher_bundle)
+    val_paths, val_labels, val_logits = load_teacher_logits(quick_train.VAL_DIR, args.teacher, teacher_bundle)
+    num_classes = train_logits.shape[1]
+
+    train_ds = make_dataset(train_paths, train_labels, train_logits, quick_train.BATCH_SIZE, training=True)
+    val_ds = make_dataset(val_paths, val_labels, val_logits, quick_train.BATCH_SIZE, training=False)
+
+    student = quick_train.build_model(num_classes, activation=None)
+    student.compile(
+        optimizer=keras.optimizers.Adam(learning_rate=quick_train.LEARNING_RATE),
+        loss=distillation_loss(num_classes, args.alpha, args.temperature),
+        metrics=[hard_label_accuracy(num_classes)]
+    )
+    print(f"\n✅ Student compiled (alpha={args.alpha}, T={args.temperature})\n")
+
+    print("🏋️  Distillation training started...")
+    student.fit(
+        train_ds,
+        validation_data=val_ds,
+        epochs=args.epochs,
+        callbacks=[
+            keras.callbacks.EarlyStopping(
+                monitor='val_accuracy',
+                mode='max',
+                patience=5,
+                restore_best_weights=True
+            )
+        ]
+    )
+
+    # Save with a softmax head so it is a drop-in for quick_train.py's model
+    exported = keras.Model(student.input, keras.layers.Softmax()(student.output))
+    exported.save(args.output)
+
+    # Accuracy
+    student_logits = student.predict(val_ds, verbose=0)
+    student_acc = float(np.mean(np.argmax(student_logits, axis=1) == val_labels))
+    teacher_acc = float(np.mean(np.argmax(val_logits, axis=1) == val_labels))
+    agreement = float(np.mean(np.argmax(student_logits, axis=1) == np.argmax(val_logits, axis=1)))
+
+    # Latency (batch size 1, CPU)
+    teacher, _, _ = teacher_bundle()
+    teacher_input = np.random.rand(1, 3, 224, 224).astype(np.float32)
+    student_input = np.random.rand(1, *quick_train.IMG_SIZE, 3).astype(np.float32)
+    teacher_ms = measure_latency(lambda: teacher(pixel_values=teacher_input))
+    student_ms = measure_latency(lambda: exported(student_input, training=False))
+
+    teacher_params = teacher.count_params()
+    student_params = exported.count_params()
+
+    print("\n" + "="*60)
+    print("🎯 DISTILLATION RESULTS (validation set)")
+    print("="*60)
+    print(f"{'':<22}{'Teacher':>12}{'Student':>12}")
+    print(f"{'Model':<22}{'ResNet50':>12}{'MobileNetV2':>12}")
+    print(f"{'Accuracy':<22}{teacher_acc*100:>11.2f}%{student_acc*100:>11.2f}%")
+    print(f"{'Latency (bs=1, ms)':<22}{teacher_ms:>12.1f}{student_ms:>12.1f}")
+    print(f"{'Parameters (M)':<22}{teacher_params/1e6:>12.1f}{student_params/1e6:>12.1f}")
+    print(f"\nStudent/teacher agreement: {agreement*100:.2f}%")
+    print(f"Speedup: {teacher_ms / student_ms:.1f}x")
+    print("="*60)
+    print(f"\n✅ Student saved to: {args.output}")
+    print(f"   Model size: {os.path.getsize(args.output) / (1024*1024):.2f} MB\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+"""
+Multi-Worker CPU Data-Parallel Training
+Runs train.py's ResNet50 model under tf.distribute.MultiWorkerMirroredStrategy
+
+Launch everything from one command:
+    python distributed_train.py --workers 4                   # 4 local processes
+    python distributed_train.py --hosts 10.0.0.1:2222,10.0.0.2:2222
+    python distributed_train.py --workers 4 --baseline        # + scaling efficiency
+"""
+
+import json
+import os
+import shlex
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+METRICS_MARKER = 'DISTRIBUTED_METRICS '
+LOCAL_HOSTS = ('localhost', '127.0.0.1')
+
+
+def free_port():
+    """Ask the OS for an unused TCP port"""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def scale_learning_rate(base_lr, num_workers, rule):
+    """Scale the learning rate with the global batch size"""
+    if rule == 'linear':
+        return base_lr * num_workers
+    if rule == 'sqrt':
+        return base_lr * num_workers ** 0.5
+    return base_lr
+
+
+# ---------------------------------------------------------------------------
+# Worker
+# ---------------------------------------------------------------------------
+
+def run_worker(args):
+    """Train as one member of the cluster described by TF_CONFIG"""
+    import tensorflow as tf
+    from tensorflow import keras
+
+    import train
+    from data_pipeline import list_image_files, make_dataset
+
+    if args.threads:
+        tf.config.threading.set_intra_op_parallelism_threads(args.threads)
+        tf.config.threading.set_inter_op_parallelism_threads(2)
+
+    tf_config = json.loads(os.environ.get('TF_CONFIG', '{}'))
+    num_workers = len(tf_config.get('cluster', {}).get('worker', [])) or 1
+    task_index = tf_config.get('task', {}).get('index', 0)
+    is_chief = task_index == 0
+
+    strategy = tf.distribute.MultiWorkerMirroredStrategy(
+        communication_options=tf.distribute.experimental.CommunicationOptions(
+            implementation=tf.distribute.experimental.CommunicationImplementation.RING
+        )
+    )
+
+    per_worker_batch = args.batch_size
+    global_batch = per_worker_batch * strategy.num_replicas_in_sync
+    learning_rate = scale_learning_rate(train.LEARNING_RATE, num_workers, args.lr_scaling)
+
+    def dataset_fn(directory, training):
+        def fn(input_context):
+            batch = input_context.get_per_replica_batch_size(global_batch)
+            dataset, _ = make_dataset(
+                directory, train.IMG_SIZE, batch,
+                training=training,
+                num_shards=input_context.num_input_pipelines,
+                shard_index=input_context.input_pipeline_id,
+                repeat=True
+            )
+            return dataset
+        return fn
+
+    num_train = len(list_image_files(train.TRAIN_DIR)[0])
+    num_val = len(list_image_files(train.VAL_DIR)[0])
+    steps_per_epoch = args.steps_per_epoch or max(1, num_train // global_batch)
+    validation_steps = max(1, num_val // global_batch)
+
+    train_ds = strategy.distribute_datasets_from_function(dataset_fn(train.TRAIN_DIR, True))
+    val_ds = strategy.distribute_datasets_from_function(dataset_fn(train.VAL_DIR, False))
+
+    if is_chief:
+        print(f"🌐 Workers: {num_workers} | Global batch: {global_batch} | LR: {learning_rate:.2e}")
+        print(f"   Steps per epoch: {steps_per_epoch} | Validation steps: {validation_steps}\n")
+
+    with strategy.scope():
+        model = train.build_model(num_classes=len(train.CLASS_NAMES))
+        model = train.compile_model(model, learning_rate=learning_rate)
+
+    # Every worker must take part in saving; only the chief keeps the file
+    save_path = train.MODEL_SAVE_PATH if is_chief else os.path.join(
+        tempfile.mkdtemp(), os.path.basename(train.MODEL_SAVE_PATH)
+    )
+    callbacks = train.create_callbacks(save_path)
+
+    epoch_times = []
+
+    class EpochTimer(keras.callbacks.Callback):
+        def on_epoch_begin(self, epoch, logs=None):
+            self.start = time.perf_counter()
+
+        def on_epoch_end(self, epoch, logs=None):
+            epoch_times.append(time.perf_counter() - self.start)
+
+    callbacks.append(EpochTimer())
+
+    history = model.fit(
+        train_ds,
+        validation_data=val_ds,
+        epochs=args.epochs,
+        steps_per_epoch=steps_per_epoch,
+        validation_steps=validation_steps,
+        callbacks=callbacks,
+        verbose=1 if is_chief else 0
+    )
+
+    if is_chief:
+        # Skip the first epoch (graph tracing, collective setup) when we can
+        timed = epoch_times[1:] or epoch_times
+        images = steps_per_epoch * global_batch
+        metrics = {
+            'num_workers': num_workers,
+            'global_batch': global_batch,
+            'learning_rate': learning_rate,
+            'steps_per_epoch': steps_per_epoch,
+            'epoch_times': epoch_times,
+            'images_per_sec': images / (sum(timed) / len(timed)),
+            'val_accuracy': history.history.get('val_accuracy', [None])[-1],
+        }
+        print(METRICS_MARKER + json.dumps(metrics), flush=True)
+
+
+# ---------------------------------------------------------------------------
+# Launcher
+# ---------------------------------------------------------------------------
+
+def worker_command(args, script, threads):
+    """Command line that runs this script in worker mode with the same settings"""
+    cmd = [
+        script, '--worker',
+        '--epochs', str(args.epochs),
+        '--batch-size', str(args.batch_size),
+        '--lr-scaling', args.lr_scaling,
+    ]
+    if args.steps_per_epoch:
+        cmd += ['--steps-per-epoch', str(args.steps_per_epoch)]
+    if threads:
+        cmd += ['--threads', str(threads)]
+    return cmd
+
+
+def launch(hosts, args):
+    """
+    Start one worker per entry in `hosts` and wait for all of them.
+    Returns the chief's metrics dict (None if the run failed).
+    """
+    local_count = sum(1 for h in hosts if h.split(':')[0] in LOCAL_HOSTS)
+    threads = max(1, (os.cpu_count() or 1) // max(1, local_count))
+    cluster = {'worker': hosts}
+
+    procs = []
+    for index, host in enumerate(hosts):
+        tf_config = json.dumps({'cluster': cluster, 'task': {'type': 'worker', 'index': index}})
+        hostname = host.split(':')[0]
+        stdout = subprocess.PIPE if index == 0 else None
+
+        if hostname in LOCAL_HOSTS:
+            env = dict(os.environ, TF_CONFIG=tf_config)
+            cmd = [sys.executable] + worker_command(args, os.path.abspath(__file__), threads)
+            procs.append(subprocess.Popen(cmd, env=env, stdout=stdout, text=True))
+        else:
+            remote = ' '.join(shlex.quote(c) for c in worker_command(args, 'distributed_train.py', None))
+            script = (f"cd {shlex.quote(args.remote_dir)} && "
+                      f"TF_CONFIG={shlex.quote(tf_config)} {args.remote_python} {remote}")
+            procs.append(subprocess.Popen(['ssh', hostname, script], stdout=stdout, text=True))
+
+    # Relay the chief's output and pick out its metrics line, on a thread so
+    # every worker can be watched meanwhile
+    metrics = {}
+
+    def relay():
+        for line in procs[0].stdout:
+            if line.startswith(METRICS_MARKER):
+                metrics.update(json.loads(line[len(METRICS_MARKER):]))
+            else:
+                print(line, end='')
+
+    reader = threading.Thread(target=relay, daemon=True)
+    reader.start()
+
+    # If any worker dies the others would block on collectives forever
+    while True:
+        codes = [proc.poll() for proc in procs]
+        if any(codes) or all(code is not None for code in codes):
+            break
+        time.sleep(1)
+    if any(codes):
+        for proc in procs:
+            if proc.poll() is None:
+                proc.terminate()
+    codes = [proc.wait() for proc in procs]
+    reader.join()
+    if any(codes):
+        print(f"❌ Worker(s) failed: {[i for i, c in enumerate(codes) if c]}")
+        return None
+    return metrics or None
+
+
+def local_hosts(count):
+    return [f'localhost:{free_port()}' for _ in range(count)]
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Multi-worker CPU data-parallel training')
+    parser.add_argument('--workers', type=int, default=2, help='Number of local worker processes (default: 2)')
+    parser.add_argument('--hosts', type=str, help='Comma-separated host:port list, one worker each (first is chief)')
+    parser.add_argument('--epochs', type=int, default=50, help='Training epochs (default: 50)')
+    parser.add_argument('--batch-size', type=int, default=32, help='Per-worker batch size (default: 32)')
+    parser.add_argument('--steps-per-epoch', type=int, help='Override steps per epoch (useful for quick scaling tests)')
+    parser.add_argument('--lr-scaling', choices=['linear', 'sqrt', 'none'], default='linear',
+                        help='Learning rate scaling with worker count (default: linear)')
+    parser.add_argument('--baseline', action='store_true', help='Also run a single-process baseline and report scaling efficiency')
+    parser.add_argument('--remote-dir', type=str, default=os.getcwd(), help='Backend directory on remote hosts')
+    parser.add_argument('--remote-python', type=str, default='python3', help='Python executable on remote hosts')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--threads', type=int, help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    print("\n" + "🍅"*30)
+    print("TOMATO DISEASE MODEL - DISTRIBUTED TRAINING")
+    print("🍅"*30 + "\n")
+
+    hosts = args.hosts.split(',') if args.hosts else local_hosts(args.workers)
+    print(f"🚀 Launching {len(hosts)} workers: {', '.join(hosts)}\n")
+
+    metrics = launch(hosts, args)
+    if metrics is None:
+        sys.exit(1)
+
+    baseline = None
+    if args.baseline:
+        print("\n⏱️  Running single-process baseline...\n")
+        baseline = launch(local_hosts(1), args)
+
+    print("\n" + "="*60)
+    print("🎯 DISTRIBUTED TRAINING RESULTS")
+    print("="*60)
+    print(f"Workers: {metrics['num_workers']}")
+    print(f"Global batch: {metrics['global_batch']}")
+    print(f"Learning rate: {metrics['learning_rate']:.2e}")
+    print(f"Throughput: {metrics['images_per_sec']:.1f} images/sec")
+    if metrics['val_accuracy'] is not None:
+        print(f"Validation Accuracy: {metrics['val_accuracy']*100:.2f}%")
+    if baseline:
+        speedup = metrics['images_per_sec'] / baseline['images_per_sec']
+        efficiency = speedup / metrics['num_workers']
+        print(f"Baseline throughput: {baseline['images_per_sec']:.1f} images/sec (1 worker)")
+        print(f"Speedup: {speedup:.2f}x")
+        print(f"Scaling efficiency: {efficiency*100:.1f}%")
+    print("="*60 + "\n")
+
+
+if __name__ == '__main__':
+    main()
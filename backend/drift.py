@@ -0,0 +1,304 @@
+"""
+Streaming Drift Monitor
+Constant-memory sketches of what the served model sees: a histogram of
+top-1 confidence, per-class prediction counts, and the running mean and
+covariance of a fixed random projection of the pooled embedding. Each
+batch updates them with a few vectorized numpy ops; older predictions are
+exponentially down-weighted so the sketch follows recent traffic. /drift
+compares the live sketch with a baseline computed from the val split.
+
+Usage:
+    python drift.py                                 # baseline from val with the newest serving export
+    python drift.py --model tf_model/saved_model/3 --output drift_baseline.json
+"""
+
+import json
+import threading
+
+import numpy as np
+
+BASELINE_PATH = 'drift_baseline.json'
+VAL_DIR = 'data/tomato_dataset/val'
+CONFIDENCE_BINS = 20
+PROJECTION_DIM = 32
+PROJECTION_SEED = 0
+MIN_SAMPLES = 200
+# A 32x32 covariance needs far more samples than a histogram: the embedding
+# score is only reported past this effective sample size
+EMBEDDING_MIN_SAMPLES = 2000
+# Population stability index: < 0.1 stable, 0.1-0.2 moderate, > 0.2 significant
+PSI_THRESHOLD = 0.2
+# Gaussian KL divergence of the projected embedding, in nats per dimension
+EMBEDDING_KL_THRESHOLD = 0.05
+EPSILON = 1e-6
+
+
+def projection_matrix(embedding_dim, dim=PROJECTION_DIM, seed=PROJECTION_SEED):
+    """Fixed Gaussian random projection; the same seed gives the same matrix in the baseline"""
+    rng = np.random.default_rng(seed)
+    return (rng.standard_normal((embedding_dim, dim)) / np.sqrt(dim)).astype(np.float32)
+
+
+class DriftSketch:
+    """
+    Weighted sufficient statistics. With half_life set, every update first
+    scales the existing weight by 0.5 ** (batch / half_life), so a prediction
+    counts half as much `half_life` predictions later.
+    """
+
+    def __init__(self, num_classes, half_life=None, bins=CONFIDENCE_BINS):
+        self.half_life = half_life
+        self.bins = bins
+        self.count = 0
+        self.confidence_hist = np.zeros(bins)
+        self.class_counts = np.zeros(num_classes)
+        self.projection = None
+        self.embedding_weight = 0.0
+        self.embedding_weight_sq = 0.0
+        self.embedding_sum = np.zeros(PROJECTION_DIM)
+        self.embedding_outer = np.zeros((PROJECTION_DIM, PROJECTION_DIM))
+        self._lock = threading.Lock()
+
+    def update(self, probabilities, embeddings=None):
+        """probabilities: (N, classes); embeddings: (N, D) pooled features or None"""
+        n = len(probabilities)
+        confidence = probabilities.max(axis=1)
+        bins = np.minimum((confidence * self.bins).astype(np.int64), self.bins - 1)
+        confidence_hist = np.bincount(bins, minlength=self.bins)
+        class_counts = np.bincount(probabilities.argmax(axis=1), minlength=len(self.class_counts))
+        if embeddings is not None:
+            if self.projection is None:
+                self.projection = projection_matrix(embeddings.shape[-1])
+            projected = embeddings.reshape(n, -1).astype(np.float32) @ self.projection
+            embedding_sum = projected.sum(axis=0)
+            embedding_outer = projected.T @ projected
+
+        with self._lock:
+            if self.half_life:
+                decay = 0.5 ** (n / self.half_life)
+                self.confidence_hist *= decay
+                self.class_counts *= decay
+                self.embedding_weight *= decay
+                self.embedding_weight_sq *= decay ** 2
+                self.embedding_sum *= decay
+                self.embedding_outer *= decay
+            self.count += n
+            self.confidence_hist += confidence_hist
+            self.class_counts += class_counts
+            if embeddings is not None:
+                self.embedding_weight += n
+                self.embedding_weight_sq += n
+                self.embedding_sum += embedding_sum
+                self.embedding_outer += embedding_outer
+
+    def effective_samples(self):
+        """Kish effective sample size of the decayed embedding statistics"""
+        if not self.embedding_weight_sq:
+            return 0.0
+        return self.embedding_weight ** 2 / self.embedding_weight_sq
+
+    def embedding_gaussian(self):
+        """(mean, covariance) of the projected embedding, or None without embeddings"""
+        if self.embedding_weight < 2:
+            return None
+        mean = self.embedding_sum / self.embedding_weight
+        covariance = self.embedding_outer / self.embedding_weight - np.outer(mean, mean)
+        return mean, covariance
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'count': self.count,
+                'confidence_hist': self.confidence_hist.tolist(),
+                'class_counts': self.class_counts.tolist(),
+                'embedding_dim': None if self.projection is None else int(self.projection.shape[0]),
+                'embedding_weight': self.embedding_weight,
+                'embedding_weight_sq': self.embedding_weight_sq,
+                'embedding_sum': self.embedding_sum.tolist(),
+                'embedding_outer': self.embedding_outer.tolist(),
+            }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(len(data['class_counts']), bins=len(data['confidence_hist']))
+        sketch.count = data['count']
+        sketch.confidence_hist = np.array(data['confidence_hist'])
+        sketch.class_counts = np.array(data['class_counts'])
+        if data['embedding_dim']:
+            sketch.projection = projection_matrix(data['embedding_dim'])
+        sketch.embedding_weight = data['embedding_weight']
+        # Baselines written before this field are undecayed: every weight is 1
+        sketch.embedding_weight_sq = data.get('embedding_weight_sq', data['embedding_weight'])
+        sketch.embedding_sum = np.array(data['embedding_sum'])
+        sketch.embedding_outer = np.array(data['embedding_outer'])
+        return sketch
+
+
+# ---------------------------------------------------------------------------
+# Scores
+# ---------------------------------------------------------------------------
+
+def psi(expected, actual):
+    """Population stability index between two histograms of the same bins"""
+    expected = expected / max(expected.sum(), EPSILON) + EPSILON
+    actual = actual / max(actual.sum(), EPSILON) + EPSILON
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def gaussian_kl(current, baseline):
+    """KL(current || baseline) between two Gaussians, per dimension"""
+    (mean_c, cov_c), (mean_b, cov_b) = current, baseline
+    dim = len(mean_b)
+    ridge = EPSILON * np.eye(dim) * max(np.trace(cov_b) / dim, 1.0)
+    cov_b, cov_c = cov_b + ridge, cov_c + ridge
+    inv_b = np.linalg.inv(cov_b)
+    diff = mean_b - mean_c
+    _, logdet_b = np.linalg.slogdet(cov_b)
+    _, logdet_c = np.linalg.slogdet(cov_c)
+    kl = 0.5 * (np.trace(inv_b @ cov_c) + diff @ inv_b @ diff - dim + logdet_b - logdet_c)
+    return float(kl / dim)
+
+
+def kl_bias(dim, samples):
+    """
+    Expected per-dimension Gaussian KL between a fit to `samples` points and
+    the distribution they came from: (dim + 3) / (4 * samples). Same-
+    distribution data scores about this much from sampling noise alone.
+    """
+    return (dim + 3) / (4 * samples) if samples else float('inf')
+
+
+def drift_report(current, baseline):
+    """Scores of the live sketch against the baseline, with a drift flag per signal"""
+    scores = {
+        'confidence_psi': psi(baseline.confidence_hist, current.confidence_hist),
+        'class_psi': psi(baseline.class_counts, current.class_counts),
+    }
+    thresholds = {'confidence_psi': PSI_THRESHOLD, 'class_psi': PSI_THRESHOLD}
+    current_gaussian, baseline_gaussian = current.embedding_gaussian(), baseline.embedding_gaussian()
+    embedding_samples = current.effective_samples()
+    if current_gaussian and baseline_gaussian and embedding_samples >= EMBEDDING_MIN_SAMPLES:
+        # Remove the finite-sample bias of both fits, so only real shift is scored
+        dim = len(baseline_gaussian[0])
+        bias = kl_bias(dim, embedding_samples) + kl_bias(dim, baseline.effective_samples())
+        scores['embedding_kl'] = max(0.0, gaussian_kl(current_gaussian, baseline_gaussian) - bias)
+        thresholds['embedding_kl'] = EMBEDDING_KL_THRESHOLD
+
+    if current.count < MIN_SAMPLES:
+        status = 'insufficient_data'
+    else:
+        status = 'drift' if any(scores[name] > thresholds[name] for name in scores) else 'ok'
+    return {
+        'status': status,
+        'predictions': current.count,
+        'embedding_samples': round(embedding_samples),
+        'scores': {name: round(value, 4) for name, value in scores.items()},
+        'thresholds': thresholds,
+        'drifted': [name for name in scores if scores[name] > thresholds[name]],
+    }
+
+
+class DriftMonitor:
+    """One live sketch per model version plus the baseline loaded from disk"""
+
+    def __init__(self, num_classes, baseline_path=BASELINE_PATH, half_life=5000):
+        self.num_classes = num_classes
+        self.half_life = half_life
+        self.sketches = {}
+        self.baseline = None
+        self.baseline_info = None
+        try:
+            with open(baseline_path) as f:
+                data = json.load(f)
+            self.baseline = DriftSketch.from_dict(data['sketch'])
+            self.baseline_info = {key: value for key, value in data.items() if key != 'sketch'}
+        except FileNotFoundError:
+            pass
+
+    def update(self, model_version, probabilities, embeddings=None):
+        sketch = self.sketches.get(model_version)
+        if sketch is None:
+            sketch = self.sketches.setdefault(model_version, DriftSketch(self.num_classes, self.half_life))
+        sketch.update(probabilities, embeddings)
+
+    def report(self, model_version):
+        sketch = self.sketches.get(model_version)
+        body = {'model_version': model_version, 'baseline': self.baseline_info}
+        if self.baseline is None:
+            return {**body, 'status': 'no_baseline', 'predictions': sketch.count if sketch else 0}
+        if sketch is None:
+            return {**body, 'status': 'insufficient_data', 'predictions': 0}
+        # Score a consistent copy; request threads keep updating the live one
+        report = drift_report(DriftSketch.from_dict(sketch.to_dict()), self.baseline)
+        if self.baseline_info.get('model_version') != model_version:
+            report['warning'] = 'Baseline was computed with a different model version'
+        return {**body, **report}
+
+
+# ---------------------------------------------------------------------------
+# Baseline
+# ---------------------------------------------------------------------------
+
+def compute_baseline(export_dir, data_dir, batch_size=32):
+    """Sketch of the serving export's outputs on every image under data_dir"""
+    import inference
+    from prepare_dataset import list_image_files
+
+    serving = inference.ServingModel(export_dir)
+    paths, _, _ = list_image_files(data_dir)
+    sketch = DriftSketch(len(serving.id2label))
+    for start in range(0, len(paths), batch_size):
+        pixels = np.stack([
+            np.asarray(inference.resize_and_crop(inference.decode_image(path)))
+            for path in paths[start:start + batch_size]
+        ])
+        outputs = serving.predict_resized(pixels)
+        sketch.update(outputs['probabilities'], outputs['embedding'])
+        print(f"\r   {min(start + batch_size, len(paths))}/{len(paths)} images", end='', flush=True)
+    print()
+    return serving.version, sketch
+
+
+def main():
+    import argparse
+    import os
+
+    import inference
+
+    parser = argparse.ArgumentParser(description='Compute the drift baseline sketch from the val split')
+    parser.add_argument('--model', type=str, help='Serving export directory (default: newest export)')
+    parser.add_argument('--data', type=str, default=VAL_DIR, help=f'Baseline images (default: {VAL_DIR})')
+    parser.add_argument('--output', type=str, default=BASELINE_PATH, help=f'Output file (default: {BASELINE_PATH})')
+    parser.add_argument('--batch-size', type=int, default=32, help='Batch size (default: 32)')
+
+    args = parser.parse_args()
+
+    print("\n" + "🍅"*30)
+    print("TOMATO DISEASE API - DRIFT BASELINE")
+    print("🍅"*30 + "\n")
+
+    export_dir = args.model or inference.latest_serving_model()
+    if not export_dir:
+        print("❌ No serving export found")
+        print("   Run: python export_serving.py")
+        return
+    if not os.path.exists(args.data):
+        print(f"❌ {args.data} not found")
+        print("   Run: python prepare_dataset.py --download")
+        return
+
+    print(f"🔍 Scoring {args.data} with {export_dir}...")
+    version, sketch = compute_baseline(export_dir, args.data, args.batch_size)
+    with open(args.output, 'w') as f:
+        json.dump({'model_version': version, 'data': args.data, 'sketch': sketch.to_dict()}, f)
+
+    shares = sketch.class_counts / sketch.class_counts.sum()
+    confident = sketch.confidence_hist[int(sketch.bins * 0.9):].sum() / sketch.confidence_hist.sum()
+    print(f"\n✅ Baseline of {sketch.count} images written to {args.output}")
+    print(f"   Predictions with confidence >= 0.9: {confident*100:.1f}%")
+    print(f"   Class shares: {shares.min()*100:.1f}% - {shares.max()*100:.1f}%")
+    print("   Restart the server to pick it up\n")
+
+
+if __name__ == '__main__':
+    main()
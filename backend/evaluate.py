@@ -0,0 +1,369 @@
+"""
+Model Evaluation on the Validation Split
+Runs batched inference once, caches the logits keyed by model fingerprint and
+dataset manifest, and computes every report from the cache with NumPy.
+
+Usage:
+    python evaluate.py
+    python evaluate.py --model ./hf_model --data data/tomato_dataset/val --json report.json
+    python evaluate.py --tta                  # test-time augmentation gain vs. latency
+"""
+
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+import inference
+import tta
+from prepare_dataset import list_image_files
+
+CACHE_DIR = 'eval_cache'
+VAL_DIR = 'data/tomato_dataset/val'
+
+
+# ---------------------------------------------------------------------------
+# Cached predictions
+# ---------------------------------------------------------------------------
+
+def dataset_manifest(paths, root):
+    """Hash of relative path, size and mtime for every image in the split"""
+    h = hashlib.sha1()
+    for path in paths:
+        stat = os.stat(path)
+        h.update(f"{os.path.relpath(path, root)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return h.hexdigest()[:12]
+
+
+def compute_logits(model, model_path, paths, batch_size, workers, views=None):
+    """
+    Batched inference over `paths` -> float32 logits in model label order,
+    shaped (images, classes), or (images, views, classes) with TTA views.
+    A serving export is fed the uint8 crops the server sends it; its
+    log-probabilities stand in for logits (softmax gives the probabilities
+    back, and every report only uses the softmax).
+    """
+    serving = isinstance(model, inference.ServingModel)
+    logits, batch = [], []
+    start = time.perf_counter()
+
+    def forward(pixels):
+        if serving:
+            return np.log(model.predict_resized(pixels)['probabilities'])
+        return model(pixel_values=pixels).logits.numpy()
+
+    def run_batch():
+        if views:
+            logits.append(forward(np.concatenate(batch)).reshape(len(batch), len(views), -1))
+        else:
+            logits.append(forward(np.stack(batch)))
+        batch.clear()
+
+    items = ((path, path) for path in paths)
+    preprocessed = inference.iter_preprocessed(items, model_path, workers, batch_size * 4, views, resized=serving)
+    for i, (_, pixel_values, error) in enumerate(preprocessed, 1):
+        if error is not None:
+            raise RuntimeError(f"Could not read {paths[i - 1]}: {error}")
+        batch.append(pixel_values)
+        if len(batch) == batch_size:
+            run_batch()
+            print(f"\r   {i}/{len(paths)} images ({i / (time.perf_counter() - start):.1f} img/s)", end='', flush=True)
+    if batch:
+        run_batch()
+    print()
+    return np.concatenate(logits).astype(np.float32)
+
+
+def load_predictions(model_path, data_dir, model_bundle, batch_size=32, workers=None, views=None):
+    """
+    Return (logits, labels, id2label) for the split, labels in model label order.
+    With TTA `views`, logits hold one row per view (see compute_logits).
+    Inference only runs when no cache exists for this model + dataset (+ views);
+    model_bundle() returns the loaded (model, processor, id2label).
+    """
+    paths, folder_labels, class_names = list_image_files(data_dir)
+    id2label = inference.load_labels(model_path)
+    labels = inference.folder_to_model_index(class_names, id2label)[np.array(folder_labels)]
+
+    key = f"{inference.model_fingerprint(model_path)}-{dataset_manifest(paths, data_dir)}"
+    if views:
+        key += f"-tta-{'.'.join(views)}"
+    cache_path = os.path.join(CACHE_DIR, f"{key}.npz")
+    if os.path.exists(cache_path):
+        print(f"✅ Using cached predictions: {cache_path}")
+        return np.load(cache_path)['logits'], labels, id2label
+
+    print(f"🔮 Running inference on {len(paths)} images (cache key {key})...")
+    logits = compute_logits(model_bundle()[0], model_path, paths, batch_size, workers, views)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    np.savez(cache_path, logits=logits)
+    print(f"✅ Cached predictions: {cache_path}")
+    return logits, labels, id2label
+
+
+# ---------------------------------------------------------------------------
+# Metrics (vectorized)
+# ---------------------------------------------------------------------------
+
+def softmax(logits):
+    z = logits - logits.max(axis=1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=1, keepdims=True)
+
+
+def confusion_matrix(labels, predictions, num_classes):
+    """rows = true class, columns = predicted class"""
+    return np.bincount(labels * num_classes + predictions, minlength=num_classes ** 2).reshape(num_classes, num_classes)
+
+
+def per_class_metrics(cm):
+    tp = np.diag(cm).astype(np.float64)
+    support = cm.sum(axis=1)
+    predicted = cm.sum(axis=0)
+    precision = np.divide(tp, predicted, out=np.zeros_like(tp), where=predicted > 0)
+    recall = np.divide(tp, support, out=np.zeros_like(tp), where=support > 0)
+    denom = precision + recall
+    f1 = np.divide(2 * precision * recall, denom, out=np.zeros_like(tp), where=denom > 0)
+    return precision, recall, f1, support
+
+
+def top_k_accuracy(probabilities, labels, k):
+    top_k = np.argpartition(-probabilities, k - 1, axis=1)[:, :k]
+    return float(np.mean(np.any(top_k == labels[:, None], axis=1)))
+
+
+def calibration_table(probabilities, labels, num_bins=15):
+    """
+    Reliability table and expected calibration error.
+    Returns (ece, rows) where each row is (low, high, count, confidence, accuracy).
+    """
+    confidence = probabilities.max(axis=1)
+    correct = (probabilities.argmax(axis=1) == labels).astype(np.float64)
+    edges = np.linspace(0.0, 1.0, num_bins + 1)
+    bins = np.clip(np.digitize(confidence, edges[1:-1], right=True), 0, num_bins - 1)
+
+    counts = np.bincount(bins, minlength=num_bins)
+    conf_sum = np.bincount(bins, weights=confidence, minlength=num_bins)
+    acc_sum = np.bincount(bins, weights=correct, minlength=num_bins)
+    nonzero = counts > 0
+    avg_conf = np.divide(conf_sum, counts, out=np.zeros(num_bins), where=nonzero)
+    avg_acc = np.divide(acc_sum, counts, out=np.zeros(num_bins), where=nonzero)
+
+    ece = float(np.sum(counts / max(1, len(labels)) * np.abs(avg_acc - avg_conf)))
+    rows = [
+        (edges[i], edges[i + 1], int(counts[i]), float(avg_conf[i]), float(avg_acc[i]))
+        for i in range(num_bins) if counts[i]
+    ]
+    return ece, rows
+
+
+def build_report(logits, labels, id2label, num_bins=15):
+    num_classes = logits.shape[1]
+    probabilities = softmax(logits)
+    predictions = probabilities.argmax(axis=1)
+    cm = confusion_matrix(labels, predictions, num_classes)
+    precision, recall, f1, support = per_class_metrics(cm)
+    ece, calibration = calibration_table(probabilities, labels, num_bins)
+    names = [inference.short_name(id2label[str(i)]) for i in range(num_classes)]
+
+    return {
+        'num_images': int(len(labels)),
+        'top_1_accuracy': float(np.mean(predictions == labels)),
+        'top_3_accuracy': top_k_accuracy(probabilities, labels, min(3, num_classes)),
+        'macro_f1': float(f1.mean()),
+        'ece': ece,
+        'classes': names,
+        'confusion_matrix': cm.tolist(),
+        'per_class': [
+            {'class': names[i], 'precision': float(precision[i]), 'recall': float(recall[i]),
+             'f1': float(f1[i]), 'support': int(support[i])}
+            for i in range(num_classes)
+        ],
+        'calibration': [
+            {'bin': f"{lo:.2f}-{hi:.2f}", 'count': n, 'confidence': c, 'accuracy': a}
+            for lo, hi, n, c, a in calibration
+        ],
+    }
+
+
+def print_report(report):
+    names = report['classes']
+    abbrev = [name[:6] for name in names]
+
+    print("\n" + "="*70)
+    print("🎯 EVALUATION REPORT")
+    print("="*70)
+    print(f"Images: {report['num_images']}")
+    print(f"Top-1 Accuracy: {report['top_1_accuracy']*100:.2f}%")
+    print(f"Top-3 Accuracy: {report['top_3_accuracy']*100:.2f}%")
+    print(f"Macro F1: {report['macro_f1']:.4f}")
+    print(f"ECE: {report['ece']:.4f}")
+
+    print("\n📊 Per-class metrics:")
+    print(f"   {'Class':<24}{'Precision':>10}{'Recall':>10}{'F1':>8}{'Support':>9}")
+    for row in report['per_class']:
+        print(f"   {row['class']:<24}{row['precision']:>10.3f}{row['recall']:>10.3f}"
+              f"{row['f1']:>8.3f}{row['support']:>9}")
+
+    print("\n🔢 Confusion matrix (rows = true, columns = predicted):")
+    print("   " + " "*24 + "".join(f"{a:>7}" for a in abbrev))
+    for name, row in zip(names, report['confusion_matrix']):
+        print(f"   {name:<24}" + "".join(f"{v:>7}" for v in row))
+
+    print("\n🌡️  Calibration:")
+    print(f"   {'Confidence':<12}{'Count':>7}{'Avg conf':>10}{'Accuracy':>10}{'Gap':>8}")
+    for row in report['calibration']:
+        gap = row['accuracy'] - row['confidence']
+        print(f"   {row['bin']:<12}{row['count']:>7}{row['confidence']:>10.3f}{row['accuracy']:>10.3f}{gap:>+8.3f}")
+    print("="*70 + "\n")
+
+
+# ---------------------------------------------------------------------------
+# Test-time augmentation
+# ---------------------------------------------------------------------------
+
+TTA_THRESHOLDS = (0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+
+
+def measure_tta_latency(model, processor, paths, views, num_images=20):
+    """
+    Median milliseconds per request, preprocessing included: one image vs.
+    all TTA views in one batched call, fed to the model as app.py feeds it
+    """
+    images = [inference.decode_image(path) for path in paths[:num_images]]
+
+    def timed(fn):
+        for image in images[:2]:
+            fn(image)
+        times = []
+        for image in images:
+            start = time.perf_counter()
+            fn(image)
+            times.append((time.perf_counter() - start) * 1000)
+        return float(np.median(times))
+
+    if isinstance(model, inference.ServingModel):
+        single_ms = timed(lambda image: model.predict(np.asarray(image)[None]))
+        tta_ms = timed(lambda image: model.predict(np.stack([np.asarray(view) for view in tta.make_views(image, views)])))
+    else:
+        single_ms = timed(lambda image: model(pixel_values=inference.preprocess(processor, [image])).logits.numpy())
+        tta_ms = timed(lambda image: model(pixel_values=inference.preprocess(processor, tta.make_views(image, views))).logits.numpy())
+    return single_ms, tta_ms
+
+
+def build_tta_report(logits, view_logits, labels, views, single_ms, tta_ms):
+    """
+    Accuracy with and without TTA, per view, and for confidence-threshold
+    triggering (TTA only when the plain top-1 confidence is below it)
+    """
+    plain = softmax(logits)
+    view_probs = softmax(view_logits.reshape(-1, view_logits.shape[2])).reshape(view_logits.shape)
+    averaged = view_probs.mean(axis=1)
+
+    plain_correct = plain.argmax(axis=1) == labels
+    tta_correct = averaged.argmax(axis=1) == labels
+    confidence = plain.max(axis=1)
+
+    thresholds = []
+    for threshold in TTA_THRESHOLDS:
+        triggered = confidence < threshold
+        # Threshold mode runs the plain pass first, then the views as a second batch
+        thresholds.append({
+            'threshold': threshold,
+            'triggered': float(triggered.mean()),
+            'accuracy': float(np.where(triggered, tta_correct, plain_correct).mean()),
+            'latency_ms': single_ms + float(triggered.mean()) * tta_ms,
+        })
+
+    return {
+        'views': list(views),
+        'accuracy': float(plain_correct.mean()),
+        'tta_accuracy': float(tta_correct.mean()),
+        'per_view_accuracy': {
+            view: float(np.mean(view_probs[:, i].argmax(axis=1) == labels)) for i, view in enumerate(views)
+        },
+        'fixed': int(np.sum(tta_correct & ~plain_correct)),
+        'broken': int(np.sum(plain_correct & ~tta_correct)),
+        'latency_ms': single_ms,
+        'tta_latency_ms': tta_ms,
+        'thresholds': thresholds,
+    }
+
+
+def print_tta_report(report):
+    print("="*70)
+    print(f"🔁 TEST-TIME AUGMENTATION ({len(report['views'])} views: {', '.join(report['views'])})")
+    print("="*70)
+    print(f"{'':<18}{'Accuracy':>10}{'Latency ms':>12}")
+    print(f"{'Plain':<18}{report['accuracy']*100:>9.2f}%{report['latency_ms']:>12.1f}")
+    print(f"{'TTA (always)':<18}{report['tta_accuracy']*100:>9.2f}%{report['tta_latency_ms']:>12.1f}")
+    gain = (report['tta_accuracy'] - report['accuracy']) * 100
+    cost = report['tta_latency_ms'] / report['latency_ms']
+    print(f"\nGain: {gain:+.2f} points for {cost:.1f}x latency "
+          f"({report['fixed']} fixed, {report['broken']} broken)")
+
+    print("\n📊 Per-view accuracy:")
+    for view, accuracy in report['per_view_accuracy'].items():
+        print(f"   {view:<12}{accuracy*100:>8.2f}%")
+
+    print("\n🎚️  TTA only below a confidence threshold:")
+    print(f"   {'Threshold':<12}{'Triggered':>10}{'Accuracy':>10}{'Avg ms':>9}")
+    for row in report['thresholds']:
+        print(f"   {row['threshold']:<12.2f}{row['triggered']*100:>9.1f}%{row['accuracy']*100:>9.2f}%{row['latency_ms']:>9.1f}")
+    print("="*70 + "\n")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Evaluate the served model on the validation split')
+    parser.add_argument('--model', type=str, default=inference.MODEL_PATH, help='HF model, SavedModel or serving export directory (default: ./hf_model)')
+    parser.add_argument('--data', type=str, default=VAL_DIR, help=f'Split directory (default: {VAL_DIR})')
+    parser.add_argument('--batch-size', type=int, default=32, help='Inference batch size (default: 32)')
+    parser.add_argument('--workers', type=int, help='Decode processes (default: CPU count)')
+    parser.add_argument('--bins', type=int, default=15, help='Calibration bins (default: 15)')
+    parser.add_argument('--json', type=str, help='Also write the report to this JSON file')
+    parser.add_argument('--tta', action='store_true', help='Also report the test-time augmentation gain vs. latency')
+    parser.add_argument('--tta-views', type=str, default=','.join(tta.VIEWS),
+                        help=f"Comma-separated TTA views (default: {','.join(tta.VIEWS)})")
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.data):
+        print(f"❌ Dataset not found: {args.data}")
+        print("   Run: python prepare_dataset.py --download")
+        return
+
+    # Load the model at most once, and only if a cache is stale or latency is measured
+    model_cache = {}
+
+    def model_bundle():
+        if 'bundle' not in model_cache:
+            print(f"📥 Loading model from {args.model}...")
+            model_cache['bundle'] = inference.load_model(args.model)
+        return model_cache['bundle']
+
+    logits, labels, id2label = load_predictions(args.model, args.data, model_bundle, args.batch_size, args.workers)
+    report = build_report(logits, labels, id2label, args.bins)
+    print_report(report)
+
+    if args.tta:
+        views = tta.parse_views(args.tta_views)
+        view_logits, _, _ = load_predictions(args.model, args.data, model_bundle, args.batch_size, args.workers, views)
+        print("⏱️  Measuring request latency...")
+        paths, _, _ = list_image_files(args.data)
+        model, processor, _ = model_bundle()
+        single_ms, tta_ms = measure_tta_latency(model, processor, paths, views)
+        report['tta'] = build_tta_report(logits, view_logits, labels, views, single_ms, tta_ms)
+        print_tta_report(report['tta'])
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Report written to {args.json}\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+"""
+Serving SavedModel Export
+Writes tf_model/saved_model/<version> with preprocessing, the forward pass,
+softmax and top-k all inside the graph, then checks every signature, fed
+the way the server feeds it, against the Python pipeline the server has been
+using (AutoImageProcessor + HF model). The export is staged next to the
+numbered directories and only renamed to its version, with a parity.json
+marker, once the check passes; exports without the marker are never served.
+
+Signatures:
+    serving_default(images: uint8 [N, H, W, 3])   same-size decoded images
+    serve_encoded(image_bytes: string [N])        JPEG/PNG file contents
+    serve_resized(pixels: uint8 [N, 224, 224, 3]) already resized and cropped
+All return probabilities, top_k_indices, top_k_scores, top_k_labels and the
+pooled embedding.
+
+Usage:
+    python export_serving.py
+    python export_serving.py --version 3 --top-k 5
+    python export_serving.py --check tf_model/saved_model/2
+"""
+
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+from PIL import Image
+
+import inference
+from prepare_dataset import list_image_files
+
+VAL_DIR = 'data/tomato_dataset/val'
+PARITY_TOLERANCE = 0.02
+
+
+# ---------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------
+
+def next_version(base_dir):
+    """One past the highest numbered directory, complete or not"""
+    if not os.path.isdir(base_dir):
+        return 1
+    return max((int(name) for name in os.listdir(base_dir) if name.isdigit()), default=0) + 1
+
+
+def export(model_path, export_dir, top_k=3):
+    """Rebuild the HF model in Keras and write the serving SavedModel"""
+    from tensorflow import keras
+    import keras_resnet
+
+    weights, config = keras_resnet.load_hf_weights(model_path)
+    model = keras_resnet.load_weights(keras_resnet.build_model(config), weights, config)
+    # Expose the pooled features next to the logits
+    model = keras.Model(model.input, [model.get_layer('pooler').output, model.output])
+    return write_export(lambda pixels: model(pixels, training=False), config, model_path, export_dir, top_k, track=model)
+
+
+def write_export(forward, config, model_path, export_dir, top_k=3, track=None, optimizations=None):
+    """
+    Write the serving signatures around `forward`, which maps normalized
+    NHWC float32 pixels to (embedding, logits).
+
+    Args:
+        track: Keras model whose variables `forward` reads, saved alongside.
+            None for a forward with everything inlined (optimize_graph.py)
+        optimizations: Recorded in serving.json
+    """
+    import tensorflow as tf
+    from tensorflow import keras
+    import keras_resnet
+
+    id2label = config['id2label']
+    labels = tf.constant([id2label[str(i)] for i in range(len(id2label))])
+    image_size = keras_resnet.IMAGE_SIZE
+
+    def predict(pixels):
+        embedding, logits = forward(pixels)
+        probabilities = tf.nn.softmax(logits, axis=-1)
+        top_k_scores, top_k_indices = tf.math.top_k(probabilities, k=top_k)
+        return {
+            'probabilities': probabilities,
+            'top_k_indices': top_k_indices,
+            'top_k_scores': top_k_scores,
+            'top_k_labels': tf.gather(labels, top_k_indices),
+            'embedding': embedding,
+        }
+
+    def serve_images(images):
+        return predict(keras_resnet.preprocess(images))
+
+    def serve_resized(pixels):
+        return predict(keras_resnet.normalize(tf.cast(pixels, tf.float32) / 255.0))
+
+    def serve_encoded(image_bytes):
+        def decode(data):
+            image = tf.io.decode_image(data, channels=3, expand_animations=False)
+            return keras_resnet.preprocess(image)
+        pixels = tf.map_fn(
+            decode, image_bytes,
+            fn_output_signature=tf.TensorSpec([image_size, image_size, 3], tf.float32)
+        )
+        return predict(pixels)
+
+    archive = keras.export.ExportArchive()
+    if track is not None:
+        archive.track(track)
+    archive.add_endpoint(
+        name='serving_default',
+        fn=serve_images,
+        input_signature=[tf.TensorSpec([None, None, None, 3], tf.uint8, name='images')]
+    )
+    archive.add_endpoint(
+        name='serve_encoded',
+        fn=serve_encoded,
+        input_signature=[tf.TensorSpec([None], tf.string, name='image_bytes')]
+    )
+    archive.add_endpoint(
+        name='serve_resized',
+        fn=serve_resized,
+        input_signature=[tf.TensorSpec([None, image_size, image_size, 3], tf.uint8, name='pixels')]
+    )
+    archive.write_out(export_dir)
+
+    for name in ('config.json', 'preprocessor_config.json'):
+        shutil.copy(os.path.join(model_path, name), os.path.join(export_dir, name))
+    with open(os.path.join(export_dir, 'serving.json'), 'w') as f:
+        info = {'top_k': top_k, 'source_model': inference.model_fingerprint(model_path)}
+        if optimizations:
+            info['optimizations'] = optimizations
+        json.dump(info, f, indent=2)
+    return export_dir
+
+
+# ---------------------------------------------------------------------------
+# Parity with the Python pipeline
+# ---------------------------------------------------------------------------
+
+def check_parity(export_dir, model_path, image_paths, tolerance=PARITY_TOLERANCE):
+    """
+    Score every image with the HF pipeline and with each way the server
+    feeds the export, and compare the probabilities:
+        serving_default on the upload decoded as app.py decodes it
+        serve_resized on that image after resize_and_crop (raw uploads,
+            jobs, the shadow crop)
+        serve_encoded on the file contents, against serving_default
+    Small differences are expected: the HF processor resizes the full-size
+    image with PIL on uint8, while the server decodes JPEGs at reduced size
+    and the graph resizes in float. All must stay within `tolerance`.
+
+    Returns:
+        (passed, stats)
+    """
+    import tensorflow as tf
+
+    model, processor, _ = inference.load_model(model_path)
+    serving = inference.ServingModel(export_dir)
+
+    diffs, agree, resized_diffs, resized_agree, encoded_diffs = [], [], [], [], []
+    for path in image_paths:
+        image = Image.open(path).convert('RGB')
+        logits = model(pixel_values=inference.preprocess(processor, [image])).logits
+        expected = tf.nn.softmax(logits, axis=-1).numpy()[0]
+
+        upload = inference.decode_image(path)
+        outputs = serving.predict(np.asarray(upload)[None])
+        actual = outputs['probabilities'][0]
+        resized = serving.predict_resized(np.asarray(inference.resize_and_crop(upload))[None])['probabilities'][0]
+        with open(path, 'rb') as f:
+            encoded = serving.predict_encoded([f.read()])['probabilities'][0]
+
+        diffs.append(np.abs(actual - expected).max())
+        agree.append(outputs['top_k_indices'][0][0] == np.argmax(expected))
+        resized_diffs.append(np.abs(resized - expected).max())
+        resized_agree.append(np.argmax(resized) == np.argmax(expected))
+        encoded_diffs.append(np.abs(encoded - actual).max())
+
+    stats = {
+        'images': len(image_paths),
+        'max_abs_diff': float(np.max(diffs)),
+        'mean_abs_diff': float(np.mean(diffs)),
+        'top1_agreement': float(np.mean(agree)),
+        'resized_max_abs_diff': float(np.max(resized_diffs)),
+        'resized_top1_agreement': float(np.mean(resized_agree)),
+        'encoded_vs_pixels_max_diff': float(np.max(encoded_diffs)),
+    }
+    passed = (
+        stats['max_abs_diff'] <= tolerance and stats['top1_agreement'] == 1.0
+        and stats['resized_max_abs_diff'] <= tolerance and stats['resized_top1_agreement'] == 1.0
+        and stats['encoded_vs_pixels_max_diff'] <= tolerance
+    )
+    return passed, stats
+
+
+def mark_verified(export_dir, stats):
+    """Record a passed parity check; only marked exports are served"""
+    with open(os.path.join(export_dir, inference.VERIFIED_MARKER), 'w') as f:
+        json.dump(stats, f, indent=2)
+
+
+def publish(staging_dir, export_dir, stats):
+    """Mark a checked export and move it to its numbered directory in one rename"""
+    mark_verified(staging_dir, stats)
+    os.rename(staging_dir, export_dir)
+
+
+def staging_dir_for(export_dir):
+    """Sibling directory the export is written to until it passes; not numbered, so never served"""
+    parent, version = os.path.split(os.path.normpath(export_dir))
+    return os.path.join(parent, f".staging-{version}")
+
+
+def parity_images(data_dir, count):
+    """An evenly spaced sample of `count` images across all classes"""
+    paths, _, _ = list_image_files(data_dir)
+    if len(paths) <= count:
+        return paths
+    return [paths[i] for i in np.linspace(0, len(paths) - 1, count).astype(int)]
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Export the serving SavedModel and check it against the Python pipeline')
+    parser.add_argument('--model', type=str, default=inference.MODEL_PATH, help='HuggingFace model directory (default: ./hf_model)')
+    parser.add_argument('--output-dir', type=str, default=inference.SERVING_MODEL_DIR,
+                        help=f'Versioned export directory (default: {inference.SERVING_MODEL_DIR})')
+    parser.add_argument('--version', type=int, help='Version number (default: next free)')
+    parser.add_argument('--top-k', type=int, default=3, help='Labels returned per image (default: 3)')
+    parser.add_argument('--check', type=str, metavar='EXPORT_DIR', help='Only run the parity check on an existing export')
+    parser.add_argument('--data', type=str, default=VAL_DIR, help=f'Images for the parity check (default: {VAL_DIR})')
+    parser.add_argument('--parity-images', type=int, default=64, help='Images to compare (default: 64)')
+    parser.add_argument('--tolerance', type=float, default=PARITY_TOLERANCE,
+                        help=f'Max allowed probability difference (default: {PARITY_TOLERANCE})')
+
+    args = parser.parse_args()
+
+    print("\n" + "🍅"*30)
+    print("TOMATO DISEASE MODEL - SERVING EXPORT")
+    print("🍅"*30 + "\n")
+
+    if not os.path.exists(args.data):
+        print(f"❌ {args.data} not found, the parity check cannot run")
+        print("   Run: python prepare_dataset.py --download")
+        sys.exit(1)
+
+    if args.check:
+        export_dir = target_dir = args.check
+        marker = os.path.join(export_dir, inference.VERIFIED_MARKER)
+        if os.path.exists(marker):
+            os.remove(marker)
+    else:
+        version = args.version or next_version(args.output_dir)
+        target_dir = os.path.join(args.output_dir, str(version))
+        export_dir = staging_dir_for(target_dir)
+        if os.path.exists(target_dir):
+            print(f"❌ {target_dir} already exists")
+            sys.exit(1)
+        shutil.rmtree(export_dir, ignore_errors=True)
+        print(f"📦 Exporting {args.model} as version {version} (staged in {export_dir})...")
+        export(args.model, export_dir, args.top_k)
+
+    print(f"\n🔍 Checking parity on {args.parity_images} images from {args.data}...")
+    passed, stats = check_parity(export_dir, args.model, parity_images(args.data, args.parity_images), args.tolerance)
+
+    print("\n" + "="*60)
+    print("🎯 PARITY CHECK " + ("PASSED" if passed else "FAILED"))
+    print("="*60)
+    print(f"Images: {stats['images']}")
+    print(f"Top-1 agreement: {stats['top1_agreement']*100:.2f}%")
+    print(f"Max |Δprob|: {stats['max_abs_diff']:.5f} (tolerance {args.tolerance})")
+    print(f"Mean |Δprob|: {stats['mean_abs_diff']:.5f}")
+    print(f"Resized input (serve_resized), top-1 agreement: {stats['resized_top1_agreement']*100:.2f}%")
+    print(f"Resized input (serve_resized), max |Δprob|: {stats['resized_max_abs_diff']:.5f}")
+    print(f"Encoded vs decoded input, max |Δprob|: {stats['encoded_vs_pixels_max_diff']:.5f}")
+    print("="*60 + "\n")
+
+    if not passed:
+        if not args.check:
+            shutil.rmtree(export_dir, ignore_errors=True)
+        print(f"❌ {target_dir} will not be served")
+        sys.exit(1)
+
+    if args.check:
+        mark_verified(export_dir, stats)
+    else:
+        publish(export_dir, target_dir, stats)
+    print(f"✅ {target_dir} verified and servable\n")
+
+
+if __name__ == '__main__':
+    main()
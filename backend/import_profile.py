@@ -0,0 +1,122 @@
+"""
+Import-Time Profile of the Serving Entry Point
+Imports app.py in a fresh interpreter with `python -X importtime` and reports
+where the cold start goes: import time per top-level package, time until the
+module is imported (the port can be bound) and until the model is ready, and
+the worker's RSS at both points. Fails if torch or transformers get imported.
+
+Usage:
+    python import_profile.py
+    python import_profile.py --module app --top 20 --json import_profile.json
+"""
+
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+FORBIDDEN = ('torch', 'transformers')
+
+# Runs in the child interpreter; prints one JSON line on stdout
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import {module} as module
+
+def rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            return next(int(l.split()[1]) for l in f if l.startswith('VmRSS')) / 1024
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+report = {{'seconds': time.perf_counter() - start, 'rss_mb': rss_mb()}}
+if hasattr(module, 'wait_until_ready'):
+    report['ready'] = module.wait_until_ready()
+    report['ready_seconds'] = time.perf_counter() - start
+    report['ready_rss_mb'] = rss_mb()
+report['packages'] = sorted({{name.split('.')[0] for name in sys.modules}})
+print('IMPORT_PROFILE ' + json.dumps(report))
+"""
+
+
+def parse_importtime(stderr):
+    """
+    Sum the self time of every `-X importtime` line by top-level package.
+    Lines look like: 'import time:       412 |       1520 |   numpy.core'
+    """
+    per_package = defaultdict(int)
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|', 2)
+        per_package[name.strip().split('.')[0]] += int(self_us)
+    return per_package
+
+
+def profile(module):
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD.format(module=module)],
+        capture_output=True, text=True, env=env
+    )
+    summary = next((line for line in result.stdout.splitlines() if line.startswith('IMPORT_PROFILE ')), None)
+    if result.returncode != 0 or summary is None:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stdout}\n{result.stderr[-2000:]}")
+    report = json.loads(summary[len('IMPORT_PROFILE '):])
+    report['import_us'] = dict(parse_importtime(result.stderr))
+    return report
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Profile the import time and memory of the serving entry point')
+    parser.add_argument('--module', type=str, default='app', help='Module to import (default: app)')
+    parser.add_argument('--top', type=int, default=15, help='Packages to list (default: 15)')
+    parser.add_argument('--json', type=str, help='Also write the report to this JSON file')
+
+    args = parser.parse_args()
+
+    print("\n" + "🍅"*30)
+    print("TOMATO DISEASE API - IMPORT PROFILE")
+    print("🍅"*30 + "\n")
+
+    report = profile(args.module)
+    import_us = report['import_us']
+    total_import = sum(import_us.values()) / 1e6
+
+    print("="*60)
+    print(f"🎯 import {args.module}")
+    print("="*60)
+    print(f"Import (port can bind): {report['seconds']:.2f}s, RSS {report['rss_mb']:.0f} MB")
+    if 'ready_seconds' in report:
+        state = 'ready' if report['ready'] else 'load FAILED'
+        print(f"Model {state}: {report['ready_seconds']:.2f}s, RSS {report['ready_rss_mb']:.0f} MB")
+    print(f"Time in imports (interpreter startup included): {total_import:.2f}s")
+
+    print("\n📦 Slowest packages (self time of all their modules):")
+    for name, us in sorted(import_us.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"   {name:<28}{us / 1000:>10.1f} ms{us / 1e4 / max(total_import, 1e-9):>8.1f}%")
+
+    forbidden = [name for name in FORBIDDEN if name in report['packages']]
+    print()
+    if forbidden:
+        print(f"❌ Imported {', '.join(forbidden)} (not needed for serving)")
+    else:
+        print(f"✅ No {' / '.join(FORBIDDEN)} import")
+    print("="*60 + "\n")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Report written to {args.json}\n")
+
+    if forbidden:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,389 @@
+"""
+Shared Inference Helpers for the HuggingFace ResNet50 Model
+Model loading, preprocessing, postprocessing and label mapping
+"""
+
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+import tta
+
+MODEL_PATH = './hf_model'
+SERVING_MODEL_DIR = './tf_model/saved_model'
+# Written into a serving export once it has passed its parity check
+VERIFIED_MARKER = 'parity.json'
+
+# PlantVillage folder names (train.py CLASS_NAMES) -> hf_model id2label names
+FOLDER_TO_LABEL = {
+    'Tomato___Bacterial_spot': 'A tomato leaf with Bacterial Spot',
+    'Tomato___Early_blight': 'A tomato leaf with Early Blight',
+    'Tomato___Late_blight': 'A tomato leaf with Late Blight',
+    'Tomato___Leaf_Mold': 'A tomato leaf with Leaf Mold',
+    'Tomato___Septoria_leaf_spot': 'A tomato leaf with Septoria Leaf Spot',
+    'Tomato___Spider_mites Two-spotted_spider_mite': 'A tomato leaf with Spider Mites Two-spotted Spider Mite',
+    'Tomato___Target_Spot': 'A tomato leaf with Target Spot',
+    'Tomato___Tomato_Yellow_Leaf_Curl_Virus': 'A tomato leaf with Tomato Yellow Leaf Curl Virus',
+    'Tomato___Tomato_mosaic_virus': 'A tomato leaf with Tomato Mosaic Virus',
+    'Tomato___healthy': 'A healthy tomato leaf',
+}
+
+# Disease information with treatments
+DISEASE_TREATMENTS = {
+    "A healthy tomato leaf": {
+        "short_name": "Healthy",
+        "description": "Your tomato leaf is healthy! No disease detected.",
+        "treatment": "Continue regular care: adequate watering, proper fertilization, and monitoring for pests."
+    },
+    "A tomato leaf with Bacterial Spot": {
+        "short_name": "Bacterial Spot",
+        "description": "Bacterial spot causes dark, greasy-looking spots on leaves and fruit.",
+        "treatment": "Remove infected leaves, avoid overhead watering, apply copper-based bactericides, and use disease-resistant varieties."
+    },
+    "A tomato leaf with Early Blight": {
+        "short_name": "Early Blight",
+        "description": "Early blight creates concentric rings (target spots) on lower leaves first.",
+        "treatment": "Remove infected leaves, improve air circulation, mulch to prevent soil splash, and apply fungicides containing chlorothalonil or copper."
+    },
+    "A tomato leaf with Late Blight": {
+        "short_name": "Late Blight",
+        "description": "Late blight causes water-soaked spots that quickly turn brown and can destroy entire plants.",
+        "treatment": "Remove and destroy infected plants immediately, apply fungicides preventively in wet weather, and ensure proper spacing for air circulation."
+    },
+    "A tomato leaf with Leaf Mold": {
+        "short_name": "Leaf Mold",
+        "description": "Leaf mold appears as yellow spots on upper leaf surfaces with olive-green mold on undersides.",
+        "treatment": "Improve greenhouse ventilation, reduce humidity below 85%, remove infected leaves, and apply fungicides if necessary."
+    },
+    "A tomato leaf with Septoria Leaf Spot": {
+        "short_name": "Septoria Leaf Spot",
+        "description": "Septoria leaf spot shows circular spots with dark borders and gray centers containing tiny black dots.",
+        "treatment": "Remove infected leaves, avoid overhead watering, mulch around plants, rotate crops, and apply fungicides containing copper or chlorothalonil."
+    },
+    "A tomato leaf with Spider Mites Two-spotted Spider Mite": {
+        "short_name": "Spider Mites",
+        "description": "Spider mites cause stippling and yellowing of leaves, with fine webbing in severe cases.",
+        "treatment": "Spray plants with strong water jets, introduce predatory mites, apply insecticidal soap or neem oil, and maintain adequate humidity."
+    },
+    "A tomato leaf with Target Spot": {
+        "short_name": "Target Spot",
+        "description": "Target spot creates concentric rings similar to early blight but with distinct tan-colored centers.",
+        "treatment": "Remove infected leaves, improve air circulation, avoid overhead irrigation, and apply fungicides containing azoxystrobin or chlorothalonil."
+    },
+    "A tomato leaf with Tomato Mosaic Virus": {
+        "short_name": "Tomato Mosaic Virus",
+        "description": "Mosaic virus causes mottled light and dark green patterns on leaves and stunted growth.",
+        "treatment": "No cure available. Remove and destroy infected plants, disinfect tools, wash hands before handling plants, and use virus-resistant varieties."
+    },
+    "A tomato leaf with Tomato Yellow Leaf Curl Virus": {
+        "short_name": "Yellow Leaf Curl Virus",
+        "description": "This virus causes severe leaf curling, yellowing, and stunted plant growth.",
+        "treatment": "No cure available. Remove infected plants, control whitefly populations (the virus vector), use reflective mulches, and plant resistant varieties."
+    }
+}
+
+# EXIF orientation tag -> transpose that makes the image upright
+EXIF_ORIENTATION = 0x0112
+ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+def load_labels(model_path=MODEL_PATH):
+    """Read id2label from the model's config.json"""
+    with open(os.path.join(model_path, 'config.json'), 'r') as f:
+        return json.load(f)['id2label']
+
+
+class SavedModelClassifier:
+    """
+    Exported SavedModel (see keras_resnet.export_saved_model) with the same
+    call interface as the HF model: model(pixel_values=...).logits
+    """
+
+    class Output:
+        def __init__(self, logits):
+            self.logits = logits
+
+    def __init__(self, model_path):
+        import tensorflow as tf
+        self._tf = tf
+        self.module = tf.saved_model.load(model_path)
+        self.signature = self.module.signatures['serving_default']
+
+    def __call__(self, pixel_values):
+        outputs = self.signature(pixel_values=self._tf.convert_to_tensor(pixel_values, self._tf.float32))
+        return self.Output(outputs['logits'])
+
+
+def is_saved_model(model_path):
+    return os.path.exists(os.path.join(model_path, 'saved_model.pb'))
+
+
+def is_serving_export(model_path):
+    """A versioned export from export_serving.py or optimize_graph.py (takes uint8 images, not pixel_values)"""
+    return os.path.exists(os.path.join(model_path, 'serving.json'))
+
+
+def load_model(model_path=MODEL_PATH):
+    """
+    Load the ResNet50 classifier and its image processor. `model_path` is
+    the HuggingFace model (hf_model), an exported SavedModel directory, or a
+    serving export, which is returned as a ServingModel without a processor:
+    feed it uint8 crops (iter_preprocessed(..., resized=True)) rather than
+    pixel_values.
+
+    Returns:
+        (model, processor, id2label)
+    """
+    if is_serving_export(model_path):
+        serving = ServingModel(model_path)
+        return serving, None, serving.id2label
+
+    from transformers import TFResNetForImageClassification, AutoImageProcessor
+
+    if is_saved_model(model_path):
+        model = SavedModelClassifier(model_path)
+    else:
+        model = TFResNetForImageClassification.from_pretrained(model_path, from_pt=True)
+    processor = AutoImageProcessor.from_pretrained(model_path)
+    return model, processor, load_labels(model_path)
+
+
+class ServingModel:
+    """
+    SavedModel written by export_serving.py. Preprocessing, softmax and top-k
+    run inside the graph, so callers pass decoded uint8 pixels (or encoded
+    image bytes) and get numpy outputs back:
+    probabilities, top_k_indices, top_k_scores, top_k_labels, embedding.
+    """
+
+    def __init__(self, export_dir):
+        import tensorflow as tf
+        self._tf = tf
+        self.export_dir = export_dir
+        self.version = os.path.basename(os.path.normpath(export_dir))
+        self.module = tf.saved_model.load(export_dir)
+        self.serve_images = self.module.signatures['serving_default']
+        self.serve_encoded = self.module.signatures['serve_encoded']
+        # Exports older than the raw-upload fast path lack this signature
+        self.serve_resized = self.module.signatures.get('serve_resized')
+        self.id2label = load_labels(export_dir)
+
+    def predict(self, images):
+        """images: uint8 (N, H, W, 3), all the same size"""
+        outputs = self.serve_images(images=self._tf.convert_to_tensor(images, self._tf.uint8))
+        return {name: value.numpy() for name, value in outputs.items()}
+
+    def predict_resized(self, pixels):
+        """pixels: uint8 (N, 224, 224, 3) already resized and cropped; only normalized in-graph"""
+        if self.serve_resized is None:
+            raise ValueError(f"{self.export_dir} has no serve_resized signature; re-run export_serving.py")
+        outputs = self.serve_resized(pixels=self._tf.convert_to_tensor(pixels, self._tf.uint8))
+        return {name: value.numpy() for name, value in outputs.items()}
+
+    def predict_encoded(self, image_bytes):
+        """image_bytes: list of JPEG/PNG file contents, any sizes"""
+        outputs = self.serve_encoded(image_bytes=self._tf.constant(image_bytes, self._tf.string))
+        return {name: value.numpy() for name, value in outputs.items()}
+
+
+def serving_versions(base_dir=SERVING_MODEL_DIR):
+    """
+    Numbered exports under base_dir that passed their parity check, oldest
+    first. Exports without VERIFIED_MARKER are never served; mark an older
+    one with: python export_serving.py --check <export_dir>
+    """
+    if not os.path.isdir(base_dir):
+        return []
+    return sorted(
+        int(name) for name in os.listdir(base_dir)
+        if name.isdigit() and is_saved_model(os.path.join(base_dir, name))
+        and os.path.exists(os.path.join(base_dir, name, VERIFIED_MARKER))
+    )
+
+
+def latest_serving_model(base_dir=SERVING_MODEL_DIR):
+    """Path of the newest serving export, or None if there is none"""
+    versions = serving_versions(base_dir)
+    return os.path.join(base_dir, str(versions[-1])) if versions else None
+
+
+def decode_image(source, min_size=tta.BASE_SIZE):
+    """
+    Decode a path or encoded bytes to an upright RGB PIL image.
+
+    JPEGs are decoded with DCT-domain downscaling (by 1/2, 1/4 or 1/8) to the
+    smallest size whose shortest edge is still >= min_size, which is all the
+    processor keeps anyway. EXIF orientation is applied afterwards, on the
+    already small image.
+    """
+    image = Image.open(source if isinstance(source, str) else io.BytesIO(source))
+    orientation = image.getexif().get(EXIF_ORIENTATION, 1)
+    if image.format == 'JPEG':
+        image.draft('RGB', (min_size, min_size))
+    image = image.convert('RGB')
+    if orientation in ORIENTATION_TRANSPOSE:
+        image = image.transpose(ORIENTATION_TRANSPOSE[orientation])
+    return image
+
+
+def resize_and_crop(image, size=224):
+    """The processor's resize (shortest edge 256) and center crop, in PIL"""
+    image = tta.base_image(image)
+    left, top = (image.width - size) // 2, (image.height - size) // 2
+    return image.crop((left, top, left + size, top + size))
+
+
+def preprocess(processor, images):
+    """Run the model's image processor on a list of PIL images -> float32 NCHW array"""
+    return processor(images=images, return_tensors='np')['pixel_values']
+
+
+# Per-process image processor and TTA views, set once by the pool initializer
+_worker_processor = None
+_worker_views = None
+
+
+def _init_decode_worker(model_path, views=None, resized=False):
+    global _worker_processor, _worker_views
+    if not resized:
+        from transformers import AutoImageProcessor
+        _worker_processor = AutoImageProcessor.from_pretrained(model_path)
+    _worker_views = views
+
+
+def _decode_and_preprocess(item):
+    """Decode and preprocess one image in a worker process"""
+    key, source = item
+    try:
+        image = decode_image(source)
+        images = tta.make_views(image, _worker_views) if _worker_views else [image]
+        if _worker_processor is None:
+            # uint8 crops for ServingModel.predict_resized, as the job worker sends them
+            pixels = np.stack([np.asarray(resize_and_crop(view)) for view in images])
+        else:
+            pixels = preprocess(_worker_processor, images)
+        return key, pixels if _worker_views else pixels[0], None
+    except Exception as e:
+        return key, None, str(e)
+
+
+def iter_preprocessed(items, model_path=MODEL_PATH, workers=None, prefetch=128, views=None, resized=False):
+    """
+    Decode and preprocess images on all cores, yielding results in input order.
+
+    Args:
+        items: Iterable of (key, path_or_bytes); consumed lazily
+        prefetch: Max images in flight, which bounds memory use
+        views: Optional TTA views (see tta.py) to produce per image
+        resized: Produce uint8 (224, 224, 3) crops for a ServingModel instead
+            of the processor's pixel_values
+
+    Yields:
+        (key, pixel_values, error) where pixel_values is float32 (3, 224, 224),
+        or (len(views), 3, 224, 224) with views (uint8 (224, 224, 3) and
+        (len(views), 224, 224, 3) with resized), or None with an error message
+        if the image could not be read
+    """
+    items = iter(items)
+    # Callers have usually loaded the model already, and forking a process
+    # after TensorFlow has started its thread pools can deadlock the child
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_decode_worker, initargs=(model_path, views, resized)) as pool:
+        in_flight = deque()
+
+        def submit_next():
+            item = next(items, None)
+            if item is not None:
+                in_flight.append(pool.submit(_decode_and_preprocess, item))
+
+        for _ in range(prefetch):
+            submit_next()
+
+        while in_flight:
+            result = in_flight.popleft().result()
+            submit_next()
+            yield result
+
+
+def folder_to_model_index(class_names, id2label):
+    """
+    Column permutation from model label order to dataset folder order.
+
+    `logits[:, perm]` reorders model outputs so that column i corresponds to
+    `class_names[i]` (the order flow_from_directory assigns labels in).
+    """
+    label2id = {label: int(idx) for idx, label in id2label.items()}
+    return np.array([label2id[FOLDER_TO_LABEL[name]] for name in class_names])
+
+
+def model_fingerprint(model_path=MODEL_PATH):
+    """Short hash of the model files (names, sizes, mtimes) used as a model version"""
+    h = hashlib.sha1()
+    for root, dirs, files in os.walk(model_path):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            h.update(f"{os.path.relpath(path, model_path)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return h.hexdigest()[:12]
+
+
+def short_name(label):
+    """Display name for a model label, e.g. 'Early Blight'"""
+    return DISEASE_TREATMENTS.get(label, {}).get('short_name', label)
+
+
+def format_prediction(probabilities, id2label, top_k=3, top_indices=None):
+    """
+    Build the /predict response body (minus 'success') from one row of class
+    probabilities.
+
+    Args:
+        top_indices: Class indices by descending probability if already known
+            (the serving SavedModel computes them in-graph)
+    """
+    if top_indices is None:
+        top_indices = np.argsort(probabilities)[-top_k:][::-1]
+    top_indices = [int(idx) for idx in top_indices[:top_k]]
+
+    predicted_class_idx = top_indices[0]
+    confidence = float(probabilities[predicted_class_idx])
+    predicted_label = id2label[str(predicted_class_idx)]
+
+    disease_info = DISEASE_TREATMENTS.get(predicted_label, {
+        "short_name": "Unknown",
+        "description": predicted_label,
+        "treatment": "Unable to provide treatment information."
+    })
+
+    top_predictions = [
+        {
+            'disease': short_name(id2label[str(idx)]),
+            'confidence': float(probabilities[idx]),
+            'full_label': id2label[str(idx)]
+        }
+        for idx in top_indices
+    ]
+
+    return {
+        'disease': disease_info['short_name'],
+        'confidence': confidence,
+        'description': disease_info['description'],
+        'treatment': disease_info['treatment'],
+        'full_label': predicted_label,
+        'top_predictions': top_predictions
+    }
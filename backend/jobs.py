@@ -0,0 +1,416 @@
+"""
+Asynchronous Prediction Jobs
+Durable job queue for large submissions: uploaded images are written to
+job_uploads/<job_id>/ and every image becomes a row in a SQLite database, so
+queued work survives a restart. A background worker scores pending images in
+batches, only while no interactive /predict request is running, and finished
+jobs are deleted once their TTL has passed.
+
+Usage:
+    python jobs.py                                  # list jobs in jobs.db
+    python jobs.py --sweep                          # delete expired jobs now
+"""
+
+import functools
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+import zipfile
+
+from prepare_dataset import IMAGE_EXTENSIONS
+
+DB_PATH = 'jobs.db'
+UPLOAD_DIR = 'job_uploads'
+RESULT_TTL_SECONDS = 24 * 3600
+MAX_JOB_IMAGES = 1000
+# Uncompressed size limits for zip uploads, checked before anything is
+# inflated; same per-image cap as a /predict upload
+MAX_IMAGE_BYTES = 16 * 1024 * 1024
+MAX_ARCHIVE_BYTES = 1024 * 1024 * 1024
+# A claimed image not finished within this time is handed out again
+# (its worker died, e.g. the server restarted mid-batch)
+CLAIM_LEASE_SECONDS = 300
+# Claims per image before it is marked failed, so one image that keeps
+# crashing its batch cannot hold its job open forever
+MAX_ATTEMPTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    created REAL NOT NULL,
+    finished REAL,
+    expires REAL
+);
+CREATE TABLE IF NOT EXISTS items (
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    filename TEXT NOT NULL,
+    path TEXT NOT NULL,
+    status TEXT NOT NULL,
+    claimed REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    PRIMARY KEY (job_id, idx)
+);
+CREATE INDEX IF NOT EXISTS items_status ON items (status, job_id, idx);
+"""
+
+
+def connect(path):
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+
+def archive_images(archive, max_images=MAX_JOB_IMAGES, max_image_bytes=MAX_IMAGE_BYTES,
+                   max_total_bytes=MAX_ARCHIVE_BYTES):
+    """
+    (filename, open_member) for each image in an open zipfile.ZipFile, in
+    archive order. Nothing is inflated here: JobStore.create streams each
+    member to disk through open_member(). Raises ValueError when the archive
+    would inflate past the size limits (zipfile never reads past a member's
+    declared file_size).
+    """
+    images = []
+    total = 0
+    for info in archive.infolist():
+        name = os.path.basename(info.filename)
+        if info.is_dir() or name.startswith('.') or not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        if len(images) == max_images:
+            raise ValueError(f'Archive has more than {max_images} images')
+        if info.file_size > max_image_bytes:
+            raise ValueError(f'{info.filename} is larger than {max_image_bytes // (1024 * 1024)} MB uncompressed')
+        total += info.file_size
+        if total > max_total_bytes:
+            raise ValueError(f'Archive is larger than {max_total_bytes // (1024 * 1024)} MB uncompressed')
+        images.append((info.filename, functools.partial(archive.open, info)))
+    return images
+
+
+class JobStore:
+    """Jobs and their images in SQLite; image files on disk until scored"""
+
+    def __init__(self, path=DB_PATH, upload_dir=UPLOAD_DIR, ttl=RESULT_TTL_SECONDS):
+        self.path = path
+        self.upload_dir = upload_dir
+        self.ttl = ttl
+        os.makedirs(upload_dir, exist_ok=True)
+        conn = connect(path)
+        try:
+            conn.executescript(SCHEMA)
+            # Databases created before items.attempts existed
+            if 'attempts' not in {row[1] for row in conn.execute('PRAGMA table_info(items)')}:
+                conn.execute('ALTER TABLE items ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0')
+                conn.commit()
+        finally:
+            conn.close()
+
+    def create(self, images):
+        """
+        Queue a job for a list of (filename, data), data being bytes or a
+        callable returning a file object to stream from (archive_images).
+        The files are on disk before the job row is committed, so a queued
+        job is always complete.
+        """
+        job_id = uuid.uuid4().hex
+        job_dir = os.path.join(self.upload_dir, job_id)
+        os.makedirs(job_dir)
+        rows = []
+        try:
+            for idx, (filename, data) in enumerate(images):
+                path = os.path.join(job_dir, f"{idx:05d}{os.path.splitext(filename)[1].lower()}")
+                with open(path, 'wb') as f:
+                    if isinstance(data, bytes):
+                        f.write(data)
+                    else:
+                        with data() as source:
+                            shutil.copyfileobj(source, f)
+                rows.append((job_id, idx, filename, path, 'pending'))
+        except BaseException:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise
+
+        conn = connect(self.path)
+        try:
+            with conn:
+                conn.execute("INSERT INTO jobs (id, status, total, created) VALUES (?, 'queued', ?, ?)",
+                             (job_id, len(rows), time.time()))
+                conn.executemany("INSERT INTO items (job_id, idx, filename, path, status) VALUES (?, ?, ?, ?, ?)", rows)
+        finally:
+            conn.close()
+        return job_id
+
+    def get(self, job_id):
+        """Status, progress and the results so far, or None for an unknown/expired job"""
+        conn = connect(self.path)
+        try:
+            job = conn.execute("SELECT status, total, created, finished, expires FROM jobs WHERE id = ?",
+                               (job_id,)).fetchone()
+            if job is None:
+                return None
+            items = conn.execute("SELECT filename, status, result FROM items WHERE job_id = ? ORDER BY idx",
+                                 (job_id,)).fetchall()
+        finally:
+            conn.close()
+
+        status, total, created, finished, expires = job
+        results = [
+            {'filename': filename, 'status': item_status, **json.loads(result)}
+            for filename, item_status, result in items if item_status in ('done', 'failed')
+        ]
+        return {
+            'job_id': job_id,
+            'status': status,
+            'total': total,
+            'completed': len(results),
+            'failed': sum(1 for r in results if r['status'] == 'failed'),
+            'created': created,
+            'finished': finished,
+            'expires': expires,
+            'results': results,
+        }
+
+    def claim(self, batch_size, lease=CLAIM_LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        """
+        Atomically take up to batch_size pending images of the oldest job
+        (plus any whose lease ran out). Images whose lease ran out
+        max_attempts times are marked failed instead. Returns [(job_id, idx, path)].
+        """
+        now = time.time()
+        conn = connect(self.path)
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            given_up = conn.execute(
+                "SELECT job_id, idx, path FROM items WHERE status = 'running' AND claimed < ? AND attempts >= ?",
+                (now - lease, max_attempts)
+            ).fetchall()
+            if given_up:
+                result = json.dumps({'error': f'Failed {max_attempts} times, giving up'})
+                conn.executemany("UPDATE items SET status = 'failed', result = ? WHERE job_id = ? AND idx = ?",
+                                 [(result, job_id, idx) for job_id, idx, _ in given_up])
+                self._close_finished(conn, {job_id for job_id, _, _ in given_up}, now)
+
+            rows = conn.execute(
+                """
+                SELECT i.job_id, i.idx, i.path FROM items i JOIN jobs j ON j.id = i.job_id
+                WHERE i.status = 'pending' OR (i.status = 'running' AND i.claimed < ?)
+                ORDER BY j.created, i.idx
+                LIMIT ?
+                """,
+                (now - lease, batch_size)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE items SET status = 'running', claimed = ?, attempts = attempts + 1 WHERE job_id = ? AND idx = ?",
+                [(now, job_id, idx) for job_id, idx, _ in rows]
+            )
+            conn.executemany("UPDATE jobs SET status = 'running' WHERE id = ? AND status = 'queued'",
+                             [(job_id,) for job_id in {row[0] for row in rows}])
+            conn.commit()
+        finally:
+            conn.close()
+        self._remove_files(given_up)
+        return rows
+
+    def finish(self, results):
+        """
+        Store [(job_id, idx, path, result_dict, ok)] and close every job whose
+        images are all scored. Scored image files are deleted right away.
+        """
+        now = time.time()
+        conn = connect(self.path)
+        try:
+            with conn:
+                conn.executemany(
+                    "UPDATE items SET status = ?, result = ? WHERE job_id = ? AND idx = ?",
+                    [('done' if ok else 'failed', json.dumps(result), job_id, idx)
+                     for job_id, idx, _, result, ok in results]
+                )
+                self._close_finished(conn, {r[0] for r in results}, now)
+        finally:
+            conn.close()
+        self._remove_files(results)
+
+    def _close_finished(self, conn, job_ids, now):
+        """Mark jobs with no pending or running images done and start their TTL"""
+        for job_id in job_ids:
+            conn.execute(
+                """
+                UPDATE jobs SET status = 'done', finished = ?, expires = ?
+                WHERE id = ? AND NOT EXISTS (
+                    SELECT 1 FROM items WHERE job_id = ? AND status IN ('pending', 'running'))
+                """,
+                (now, now + self.ttl, job_id, job_id)
+            )
+
+    @staticmethod
+    def _remove_files(items):
+        for _, _, path, *_ in items:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def sweep(self):
+        """Delete jobs past their TTL, and upload folders without a job; returns the number of jobs removed"""
+        conn = connect(self.path)
+        try:
+            with conn:
+                expired = [row[0] for row in conn.execute("SELECT id FROM jobs WHERE expires < ?", (time.time(),))]
+                conn.executemany("DELETE FROM items WHERE job_id = ?", [(job_id,) for job_id in expired])
+                conn.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in expired])
+            known = {row[0] for row in conn.execute("SELECT id FROM jobs")}
+        finally:
+            conn.close()
+        # Folders of expired jobs, and of uploads that died before their job was committed
+        for name in os.listdir(self.upload_dir):
+            path = os.path.join(self.upload_dir, name)
+            if name not in known and time.time() - os.path.getmtime(path) > 3600:
+                shutil.rmtree(path, ignore_errors=True)
+        return len(expired)
+
+    def summary(self):
+        conn = connect(self.path)
+        try:
+            return conn.execute(
+                """
+                SELECT j.id, j.status, j.total, j.created, j.expires,
+                       (SELECT COUNT(*) FROM items i WHERE i.job_id = j.id AND i.status IN ('done', 'failed'))
+                FROM jobs j ORDER BY j.created
+                """
+            ).fetchall()
+        finally:
+            conn.close()
+
+
+# ---------------------------------------------------------------------------
+# Background worker
+# ---------------------------------------------------------------------------
+
+class InteractiveTracker:
+    """Counts in-flight interactive requests so background work can stay out of their way"""
+
+    def __init__(self):
+        self.active = 0
+        self.last_finished = 0.0
+        self._cond = threading.Condition()
+
+    def enter(self):
+        with self._cond:
+            self.active += 1
+
+    def exit(self):
+        with self._cond:
+            self.active -= 1
+            self.last_finished = time.monotonic()
+            self._cond.notify_all()
+
+    def wait_idle(self, quiet_seconds):
+        """Block until nothing is in flight and nothing finished in the last quiet_seconds"""
+        with self._cond:
+            while True:
+                if self.active:
+                    self._cond.wait()
+                    continue
+                remaining = self.last_finished + quiet_seconds - time.monotonic()
+                if remaining <= 0:
+                    return
+                self._cond.wait(remaining)
+
+
+class JobWorker:
+    """
+    Scores queued images with `classify_batch(paths) -> [(result_dict, ok)]`.
+    Each batch starts only once no interactive request has been running for
+    `quiet_seconds`, so /predict never queues behind more than one batch.
+    """
+
+    def __init__(self, store, classify_batch, tracker, ready=lambda: True,
+                 batch_size=8, quiet_seconds=0.2, poll_seconds=2.0, sweep_seconds=600):
+        self.store = store
+        self.classify_batch = classify_batch
+        self.tracker = tracker
+        self.ready = ready
+        self.batch_size = batch_size
+        self.quiet_seconds = quiet_seconds
+        self.poll_seconds = poll_seconds
+        self.sweep_seconds = sweep_seconds
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='job-worker', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        last_sweep = 0.0
+        while not self._stop.is_set():
+            try:
+                if time.monotonic() - last_sweep > self.sweep_seconds:
+                    self.store.sweep()
+                    last_sweep = time.monotonic()
+                worked = self.ready() and self._run_batch()
+            except Exception as e:
+                # e.g. the database locked past its timeout; claimed images
+                # are handed out again when their lease runs out
+                print(f"✗ Job worker error: {str(e)}")
+                worked = False
+            if not worked:
+                self._stop.wait(self.poll_seconds)
+
+    def _run_batch(self):
+        """Claim and score one batch; False when there was nothing to do or it failed"""
+        self.tracker.wait_idle(self.quiet_seconds)
+        batch = self.store.claim(self.batch_size)
+        if not batch:
+            return False
+        try:
+            outcomes = self.classify_batch([path for _, _, path in batch])
+        except Exception as e:
+            # Leave the images claimed; they are retried when the lease runs
+            # out, and marked failed after MAX_ATTEMPTS claims
+            print(f"✗ Job batch failed: {str(e)}")
+            return False
+        self.store.finish([(*item, result, ok) for item, (result, ok) in zip(batch, outcomes)])
+        return True
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Inspect the prediction job queue')
+    parser.add_argument('--db', type=str, default=DB_PATH, help=f'Job database (default: {DB_PATH})')
+    parser.add_argument('--upload-dir', type=str, default=UPLOAD_DIR, help=f'Upload folder (default: {UPLOAD_DIR})')
+    parser.add_argument('--sweep', action='store_true', help='Delete expired jobs')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"❌ Database not found: {args.db}")
+        return
+
+    store = JobStore(args.db, args.upload_dir)
+    if args.sweep:
+        print(f"🧹 Removed {store.sweep()} expired job(s)")
+
+    rows = store.summary()
+    print("\n" + "="*78)
+    print(f"📋 JOBS ({len(rows)})")
+    print("="*78)
+    print(f"{'Job':<34}{'Status':<10}{'Progress':>12}  {'Created':<20}")
+    for job_id, status, total, created, expires, completed in rows:
+        print(f"{job_id:<34}{status:<10}{f'{completed}/{total}':>12}  "
+              f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(created)):<20}")
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+"""
+Plain Keras Rebuild of the HuggingFace ResNet50
+Rebuilds hf_model as a Keras functional model (NHWC, no transformers needed at
+inference time), with optional per-block bottleneck widths for pruned models
+and an inference-only variant with every BatchNorm folded into its conv, and
+exports it as a SavedModel that inference.load_model can serve.
+"""
+
+import json
+import os
+import shutil
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+from tensorflow.keras import layers
+
+IMAGE_SIZE = 224
+CROP_PCT = 0.875
+IMAGE_MEAN = (0.485, 0.456, 0.406)
+IMAGE_STD = (0.229, 0.224, 0.225)
+BN_EPSILON = 1e-5
+
+
+# ---------------------------------------------------------------------------
+# Weights
+# ---------------------------------------------------------------------------
+
+def load_hf_weights(model_path):
+    """
+    Load hf_model and return ({variable path: array}, config dict).
+    Paths look like 'resnet/encoder/stages.0/layers.0/layer.1/convolution/kernel'.
+    """
+    import inference
+    model, _, _ = inference.load_model(model_path)
+    weights = {v.name.split(':')[0]: v.numpy() for v in model.weights}
+    with open(os.path.join(model_path, 'config.json')) as f:
+        config = json.load(f)
+    return weights, config
+
+
+def _get(weights, suffix):
+    """Find the one variable whose path ends with `suffix`"""
+    matches = [name for name in weights if name == suffix or name.endswith('/' + suffix)]
+    if len(matches) != 1:
+        raise KeyError(f"Expected one weight matching '{suffix}', found {matches}")
+    return weights[matches[0]]
+
+
+def conv_bn_weights(weights, prefix):
+    """(kernel, gamma, beta, moving_mean, moving_variance) for one conv + BN"""
+    return (
+        _get(weights, f"{prefix}/convolution/kernel"),
+        _get(weights, f"{prefix}/normalization/gamma"),
+        _get(weights, f"{prefix}/normalization/beta"),
+        _get(weights, f"{prefix}/normalization/moving_mean"),
+        _get(weights, f"{prefix}/normalization/moving_variance"),
+    )
+
+
+def block_prefix(stage, block):
+    return f"resnet/encoder/stages.{stage}/layers.{block}"
+
+
+def default_widths(config):
+    """Bottleneck inner width for every block, as in the original model"""
+    return {
+        (s, b): config['hidden_sizes'][s] // 4
+        for s, depth in enumerate(config['depths']) for b in range(depth)
+    }
+
+
+# ---------------------------------------------------------------------------
+# Model
+# ---------------------------------------------------------------------------
+
+def _name(prefix):
+    return prefix.replace('resnet/encoder/', '').replace('/', '_').replace('.', '')
+
+
+def _conv_bn(x, filters, kernel_size, stride, prefix, relu=True, folded=False):
+    """
+    HF TFResNetConvLayer: symmetric zero pad k//2, valid conv, BN, optional ReLU.
+    With folded=True the BN is left out and the conv gets a bias instead.
+    """
+    name = _name(prefix)
+    if kernel_size > 1:
+        x = layers.ZeroPadding2D(kernel_size // 2, name=f"{name}_pad")(x)
+    x = layers.Conv2D(filters, kernel_size, strides=stride, padding='valid', use_bias=folded, name=f"{name}_conv")(x)
+    if not folded:
+        x = layers.BatchNormalization(epsilon=BN_EPSILON, name=f"{name}_bn")(x)
+    if relu:
+        x = layers.ReLU(name=f"{name}_relu")(x)
+    return x
+
+
+def build_model(config, widths=None, folded=False):
+    """
+    Keras ResNet matching the HF architecture in `config`.
+    Input: ImageNet-normalized NHWC float32. Outputs: logits.
+    folded=True builds the inference-only variant for fold_batch_norm().
+    """
+    widths = widths or default_widths(config)
+    inputs = keras.Input((IMAGE_SIZE, IMAGE_SIZE, 3), name='pixel_values')
+
+    x = _conv_bn(inputs, config['embedding_size'], 7, 2, 'resnet/embedder/embedder', folded=folded)
+    x = layers.ZeroPadding2D(1, name='embedder_pool_pad')(x)
+    x = layers.MaxPool2D(3, strides=2, padding='valid', name='embedder_pool')(x)
+
+    for s, (depth, out_channels) in enumerate(zip(config['depths'], config['hidden_sizes'])):
+        for b in range(depth):
+            prefix = block_prefix(s, b)
+            stride = 2 if (s > 0 and b == 0) else 1
+            width = widths[(s, b)]
+
+            if x.shape[-1] != out_channels or stride != 1:
+                shortcut = _conv_bn(x, out_channels, 1, stride, f"{prefix}/shortcut", relu=False, folded=folded)
+            else:
+                shortcut = x
+
+            h = _conv_bn(x, width, 1, 1, f"{prefix}/layer.0", folded=folded)
+            h = _conv_bn(h, width, 3, stride, f"{prefix}/layer.1", folded=folded)
+            h = _conv_bn(h, out_channels, 1, 1, f"{prefix}/layer.2", relu=False, folded=folded)
+            x = layers.Add(name=f"{_name(prefix)}_add")([h, shortcut])
+            x = layers.ReLU(name=f"{_name(prefix)}_out")(x)
+
+    pooled = layers.GlobalAveragePooling2D(name='pooler')(x)
+    logits = layers.Dense(len(config['id2label']), name='classifier')(pooled)
+    return keras.Model(inputs, logits, name='resnet_tomato')
+
+
+def _set_conv_bn(model, prefix, kernel, gamma, beta, mean, var):
+    name = _name(prefix)
+    model.get_layer(f"{name}_conv").set_weights([kernel])
+    model.get_layer(f"{name}_bn").set_weights([gamma, beta, mean, var])
+
+
+def load_weights(model, weights, config, keep=None):
+    """
+    Copy HF weights into a model from build_model().
+
+    Args:
+        keep: Optional {(stage, block): (keep0, keep1)} channel indices kept in
+            the first and second conv of each bottleneck (structured pruning)
+    """
+    _set_conv_bn(model, 'resnet/embedder/embedder', *conv_bn_weights(weights, 'resnet/embedder/embedder'))
+    layer_names = {layer.name for layer in model.layers}
+
+    for s, depth in enumerate(config['depths']):
+        for b in range(depth):
+            prefix = block_prefix(s, b)
+            if f"{_name(prefix)}_shortcut_conv" in layer_names:
+                _set_conv_bn(model, f"{prefix}/shortcut", *conv_bn_weights(weights, f"{prefix}/shortcut"))
+
+            k0, *bn0 = conv_bn_weights(weights, f"{prefix}/layer.0")
+            k1, *bn1 = conv_bn_weights(weights, f"{prefix}/layer.1")
+            k2, *bn2 = conv_bn_weights(weights, f"{prefix}/layer.2")
+
+            if keep is not None:
+                keep0, keep1 = keep[(s, b)]
+                k0 = k0[..., keep0]
+                bn0 = [p[keep0] for p in bn0]
+                k1 = k1[:, :, keep0, :][..., keep1]
+                bn1 = [p[keep1] for p in bn1]
+                k2 = k2[:, :, keep1, :]
+
+            _set_conv_bn(model, f"{prefix}/layer.0", k0, *bn0)
+            _set_conv_bn(model, f"{prefix}/layer.1", k1, *bn1)
+            _set_conv_bn(model, f"{prefix}/layer.2", k2, *bn2)
+
+    model.get_layer('classifier').set_weights([
+        _get(weights, 'classifier.1/kernel'),
+        _get(weights, 'classifier.1/bias'),
+    ])
+    return model
+
+
+def fold_batch_norm(model, config, widths=None):
+    """
+    Inference-only copy of a build_model() model with every BatchNorm folded
+    into the conv before it: W' = W * s and b' = beta - mean * s, where
+    s = gamma / sqrt(var + eps) per output channel. Same outputs (up to
+    float rounding), one op less per conv.
+    """
+    folded = build_model(config, widths, folded=True)
+    for layer in folded.layers:
+        if not layer.name.endswith('_conv'):
+            continue
+        kernel, = model.get_layer(layer.name).get_weights()
+        # In float64, so the folded float32 weights round only once
+        gamma, beta, mean, var = (p.astype(np.float64) for p in model.get_layer(layer.name[:-len('_conv')] + '_bn').get_weights())
+        scale = gamma / np.sqrt(var + BN_EPSILON)
+        layer.set_weights([kernel * scale, beta - mean * scale])
+    folded.get_layer('classifier').set_weights(model.get_layer('classifier').get_weights())
+    return folded
+
+
+# ---------------------------------------------------------------------------
+# Preprocessing (TensorFlow ops mirroring ConvNextImageProcessor)
+# ---------------------------------------------------------------------------
+
+def resize_and_crop(image, size=IMAGE_SIZE, crop_pct=CROP_PCT):
+    """
+    Resize the shortest edge to size / crop_pct (bicubic) and center crop to
+    size x size, like the HF processor. `image` is HWC or NHWC, any numeric
+    dtype. Returns float32 in the input's value range.
+    """
+    target = int(size / crop_pct)
+    shape = tf.cast(tf.shape(image)[-3:-1], tf.float32)
+    short = tf.reduce_min(shape)
+    new_shape = tf.cast(tf.floor(shape * target / short), tf.int32)
+    new_shape = tf.maximum(new_shape, target)
+    image = tf.image.resize(tf.cast(image, tf.float32), new_shape, method='bicubic', antialias=True)
+    return tf.image.resize_with_crop_or_pad(image, size, size)
+
+
+def normalize(image01):
+    """[0, 1] RGB -> ImageNet-normalized"""
+    return (image01 - tf.constant(IMAGE_MEAN)) / tf.constant(IMAGE_STD)
+
+
+def preprocess(images):
+    """uint8 RGB (HWC or NHWC, any size) -> normalized 224x224 float32, like the HF processor"""
+    images = tf.clip_by_value(resize_and_crop(images), 0.0, 255.0) / 255.0
+    return normalize(images)
+
+
+# ---------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------
+
+def export_saved_model(model, export_dir, source_model_path):
+    """
+    Write `model` as a SavedModel whose serving signature takes the same
+    NCHW `pixel_values` as the HF model and returns {'logits': ...}.
+    The source config.json / preprocessor_config.json are copied alongside so
+    inference.load_model can load the directory like hf_model.
+    """
+    def serve(pixel_values):
+        return {'logits': model(tf.transpose(pixel_values, [0, 2, 3, 1]), training=False)}
+
+    archive = keras.export.ExportArchive()
+    archive.track(model)
+    archive.add_endpoint(
+        name='serving_default',
+        fn=serve,
+        input_signature=[tf.TensorSpec([None, 3, IMAGE_SIZE, IMAGE_SIZE], tf.float32, name='pixel_values')]
+    )
+    archive.write_out(export_dir)
+
+    for name in ('config.json', 'preprocessor_config.json'):
+        shutil.copy(os.path.join(source_model_path, name), os.path.join(export_dir, name))
+    return export_dir
+
+
+def directory_size_mb(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total / (1024 * 1024)
+
+
+def count_params(model):
+    return int(sum(np.prod(w.shape) for w in model.weights))
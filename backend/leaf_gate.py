@@ -0,0 +1,152 @@
+"""
+Leaf Gate
+Cheap check run before the model: the share of "plant coloured" pixels
+(green through yellow/brown, reasonably saturated and not too dark) in a
+32x32 thumbnail. Dark pocket shots, grey or washed-out frames, sky and skin
+fall below the threshold and are turned away without a forward pass. Brown
+soil, bark and wood do not: they share their hue with the brown lesions the
+model has to see, so the gate cannot tell them apart.
+
+The gate is off (threshold 0) until a threshold has been measured on the
+val split with this script.
+
+Usage:
+    python leaf_gate.py                              # tune on the val split
+    python leaf_gate.py --target-frr 0.005 --negatives samples/not_leaves
+"""
+
+import time
+
+import numpy as np
+from PIL import Image
+
+THUMBNAIL_SIZE = 32
+# Off until tuned; see main()
+DEFAULT_THRESHOLD = 0.0
+CANDIDATE_THRESHOLDS = (0.05, 0.10, 0.15, 0.20, 0.30)
+VAL_DIR = 'data/tomato_dataset/val'
+
+# PIL HSV channels are 0-255; hue 21-128 is roughly 30-180 degrees
+# (orange-brown lesions through yellow to green and a little cyan)
+HUE_RANGE = (21, 128)
+MIN_SATURATION = 40
+MIN_VALUE = 30
+
+
+def plant_fraction(image):
+    """Fraction of plant-coloured pixels in a PIL image or uint8 HWC array"""
+    if isinstance(image, np.ndarray):
+        step = max(1, min(image.shape[:2]) // THUMBNAIL_SIZE)
+        image = Image.fromarray(np.ascontiguousarray(image[::step, ::step]))
+    else:
+        image = image.resize((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.NEAREST)
+    hsv = np.asarray(image.convert('HSV'))
+    hue, saturation, value = hsv[..., 0], hsv[..., 1], hsv[..., 2]
+    plant = ((hue >= HUE_RANGE[0]) & (hue <= HUE_RANGE[1])
+             & (saturation >= MIN_SATURATION) & (value >= MIN_VALUE))
+    return float(plant.mean())
+
+
+def is_leaf(image, threshold=DEFAULT_THRESHOLD):
+    """
+    Returns:
+        (passed, plant_fraction)
+    """
+    fraction = plant_fraction(image)
+    return fraction >= threshold, fraction
+
+
+# ---------------------------------------------------------------------------
+# Tuning
+# ---------------------------------------------------------------------------
+
+def score_directory(paths):
+    """Plant fraction of every image, decoded the way the server decodes uploads"""
+    from inference import decode_image
+    fractions, seconds = [], []
+    for path in paths:
+        image = decode_image(path)
+        start = time.perf_counter()
+        fractions.append(plant_fraction(image))
+        seconds.append(time.perf_counter() - start)
+    return np.array(fractions), np.array(seconds)
+
+
+def false_reject_rate(fractions, threshold):
+    return float((fractions < threshold).mean()) if len(fractions) else 0.0
+
+
+def threshold_for_frr(fractions, target_frr):
+    """Highest threshold whose false-reject rate on `fractions` stays <= target_frr"""
+    ordered = np.sort(fractions)
+    allowed = int(np.floor(target_frr * len(ordered)))
+    # Everything strictly below ordered[allowed] is rejected
+    return float(ordered[min(allowed, len(ordered) - 1)])
+
+
+def main():
+    import argparse
+    import os
+
+    from prepare_dataset import list_image_files, IMAGE_EXTENSIONS
+
+    parser = argparse.ArgumentParser(description='Measure and tune the leaf gate on leaf / non-leaf images')
+    parser.add_argument('--data', type=str, default=VAL_DIR, help=f'Leaf images by class (default: {VAL_DIR})')
+    parser.add_argument('--negatives', type=str, help='Folder of non-leaf images, to measure the reject rate')
+    parser.add_argument('--target-frr', type=float, default=0.01,
+                        help='Acceptable false-reject rate on --data (default: 0.01)')
+
+    args = parser.parse_args()
+
+    print("\n" + "🍅"*30)
+    print("TOMATO DISEASE API - LEAF GATE TUNING")
+    print("🍅"*30 + "\n")
+
+    if not os.path.exists(args.data):
+        print(f"❌ {args.data} not found")
+        print("   Run: python prepare_dataset.py --download")
+        return
+
+    paths, labels, class_names = list_image_files(args.data)
+    print(f"🔍 Scoring {len(paths)} leaf images from {args.data}...")
+    fractions, seconds = score_directory(paths)
+    labels = np.array(labels)
+
+    negatives = None
+    if args.negatives:
+        negative_paths = sorted(
+            os.path.join(root, name) for root, _, files in os.walk(args.negatives)
+            for name in files if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        print(f"🔍 Scoring {len(negative_paths)} non-leaf images from {args.negatives}...")
+        negatives, _ = score_directory(negative_paths)
+
+    recommended = threshold_for_frr(fractions, args.target_frr)
+
+    print("\n" + "="*60)
+    print("🎯 LEAF GATE")
+    print("="*60)
+    print(f"Gate time: median {np.median(seconds)*1e6:.0f} µs, p99 {np.percentile(seconds, 99)*1e6:.0f} µs")
+    print(f"Plant fraction on leaves: min {fractions.min():.3f}, p1 {np.percentile(fractions, 1):.3f}, "
+          f"median {np.median(fractions):.3f}")
+
+    print(f"\n{'Threshold':>10}{'False reject':>14}" + (f"{'Non-leaf rejected':>19}" if negatives is not None else ''))
+    for threshold in sorted({*CANDIDATE_THRESHOLDS, round(recommended, 3)}):
+        row = f"{threshold:>10.3f}{false_reject_rate(fractions, threshold)*100:>13.2f}%"
+        if negatives is not None:
+            row += f"{(1 - false_reject_rate(negatives, threshold) if len(negatives) else 0)*100:>18.2f}%"
+        print(row + ("  <- recommended" if threshold == round(recommended, 3) else ''))
+
+    print(f"\n📊 False rejects per class at {recommended:.3f}:")
+    for idx, class_name in enumerate(class_names):
+        class_fractions = fractions[labels == idx]
+        print(f"   {class_name:<50}{false_reject_rate(class_fractions, recommended)*100:>7.2f}%"
+              f"  (min {class_fractions.min():.3f})")
+
+    print(f"\n✅ Threshold for ≤{args.target_frr*100:g}% false rejects: {recommended:.3f}")
+    print(f"   Serve with: LEAF_GATE_THRESHOLD={recommended:.3f}")
+    print("="*60 + "\n")
+
+
+if __name__ == '__main__':
+    main()
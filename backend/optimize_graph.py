@@ -0,0 +1,286 @@
+"""
+Inference Graph Optimization
+Offline pass over the serving forward graph. Every BatchNorm is folded into
+the conv before it (keras_resnet.fold_batch_norm), the variables are frozen
+into constants, and Grappler's constant folding, arithmetic simplification,
+dependency optimization and dead-op pruning are run once on the result. The
+optimized graph is written as a regular serving export (the signatures of
+export_serving.py), so ServingModel and app.py load it like any other version.
+
+Nothing is written unless the optimized logits match the HF model's on the
+same pixels, and the written export is only served once it passes
+export_serving.check_parity like any other export. Latency at batch sizes 1, 8 and 32 is compared with the
+unoptimized Keras rebuild that export_serving.py writes.
+
+Usage:
+    python optimize_graph.py
+    python optimize_graph.py --version 4 --parity-images 128
+    python optimize_graph.py --dry-run               # checks and latency only
+"""
+
+import os
+import shutil
+import sys
+from collections import Counter
+
+import numpy as np
+
+import inference
+from benchmark import FORWARD_BATCH_SIZES, time_call
+from export_serving import (PARITY_TOLERANCE, VAL_DIR, check_parity, next_version, parity_images, publish,
+                            staging_dir_for, write_export)
+
+# Folding changes float32 rounding only; anything larger is a bug
+LOGIT_TOLERANCE = 1e-3
+GRAPPLER_PASSES = ('pruning', 'constfold', 'arithmetic', 'dependency')
+# Ops a folded graph should no longer contain
+BN_OPS = ('FusedBatchNorm', 'FusedBatchNormV3', 'Rsqrt')
+
+
+# ---------------------------------------------------------------------------
+# Freezing and Grappler
+# ---------------------------------------------------------------------------
+
+def freeze(model):
+    """Concrete function of model(pixels) with every variable inlined as a constant"""
+    import tensorflow as tf
+    from tensorflow.python.framework.convert_to_constants import convert_variables_to_constants_v2
+    import keras_resnet
+
+    size = keras_resnet.IMAGE_SIZE
+    forward = tf.function(lambda pixels: model(pixels, training=False))
+    return convert_variables_to_constants_v2(
+        forward.get_concrete_function(tf.TensorSpec([None, size, size, 3], tf.float32, name='pixels'))
+    )
+
+
+def run_grappler(frozen, passes=GRAPPLER_PASSES):
+    """Run the given Grappler passes once over a frozen concrete function; returns the GraphDef"""
+    import tensorflow as tf
+    from tensorflow.core.protobuf import meta_graph_pb2
+    from tensorflow.python.grappler import tf_optimizer
+
+    meta_graph = tf.compat.v1.train.export_meta_graph(graph_def=frozen.graph.as_graph_def(), graph=frozen.graph)
+    # Grappler keeps whatever is reachable from the 'train_op' collection
+    fetches = meta_graph_pb2.CollectionDef()
+    for tensor in frozen.inputs + frozen.outputs:
+        fetches.node_list.value.append(tensor.name)
+    meta_graph.collection_def['train_op'].CopyFrom(fetches)
+
+    config = tf.compat.v1.ConfigProto()
+    config.graph_options.rewrite_options.optimizers.extend(passes)
+    return tf_optimizer.OptimizeGraph(config, meta_graph)
+
+
+def load_graph(graph_def, inputs, outputs):
+    """Callable ConcreteFunction running graph_def, fed and fetched by tensor name"""
+    import tensorflow as tf
+
+    wrapped = tf.compat.v1.wrap_function(lambda: tf.compat.v1.import_graph_def(graph_def, name=''), [])
+    return wrapped.prune(
+        [wrapped.graph.as_graph_element(name) for name in inputs],
+        [wrapped.graph.as_graph_element(name) for name in outputs],
+    )
+
+
+def op_counts(graph_def):
+    """Op type -> count, including ops inside library functions"""
+    counts = Counter(node.op for node in graph_def.node)
+    for function in graph_def.library.function:
+        counts.update(node.op for node in function.node_def)
+    return counts
+
+
+def optimize(model_path):
+    """
+    Rebuild hf_model, fold BatchNorm, freeze and run Grappler.
+
+    Returns:
+        (original, forward, config, graphs): the unoptimized Keras model and
+        the optimized forward, both pixels -> [embedding, logits], and
+        {stage: op counts} for the report
+    """
+    from tensorflow import keras
+    import keras_resnet
+
+    weights, config = keras_resnet.load_hf_weights(model_path)
+    model = keras_resnet.load_weights(keras_resnet.build_model(config), weights, config)
+    folded = keras_resnet.fold_batch_norm(model, config)
+    # Expose the pooled features next to the logits, as export_serving does
+    original = keras.Model(model.input, [model.get_layer('pooler').output, model.output])
+    folded = keras.Model(folded.input, [folded.get_layer('pooler').output, folded.output])
+
+    frozen = freeze(folded)
+    optimized = run_grappler(frozen)
+    forward = load_graph(optimized, [t.name for t in frozen.inputs], [t.name for t in frozen.outputs])
+    graphs = {
+        'original': op_counts(freeze(original).graph.as_graph_def()),
+        'bn_folded': op_counts(frozen.graph.as_graph_def()),
+        'optimized': op_counts(optimized),
+    }
+    return original, forward, config, graphs
+
+
+# ---------------------------------------------------------------------------
+# Checks
+# ---------------------------------------------------------------------------
+
+def parity_pixels(data_dir, count):
+    """Normalized NHWC pixels of `count` val images, or random ones without a dataset"""
+    import keras_resnet
+
+    if not os.path.exists(data_dir):
+        print(f"⚠️  {data_dir} not found, checking parity on random pixels")
+        size = keras_resnet.IMAGE_SIZE
+        return np.random.default_rng(0).standard_normal((count, size, size, 3)).astype(np.float32)
+    return np.stack([
+        keras_resnet.preprocess(np.asarray(inference.decode_image(path))).numpy()
+        for path in parity_images(data_dir, count)
+    ])
+
+
+def check_logit_parity(forward, model_path, pixels, tolerance=LOGIT_TOLERANCE, batch_size=16):
+    """
+    Compare the optimized logits with the HF model's on identical inputs.
+
+    Returns:
+        (passed, stats)
+    """
+    model, _, _ = inference.load_model(model_path)
+    diffs, agree = [], []
+    for start in range(0, len(pixels), batch_size):
+        batch = pixels[start:start + batch_size]
+        expected = model(pixel_values=batch.transpose(0, 3, 1, 2)).logits.numpy()
+        actual = forward(batch)[1].numpy()
+        diffs.append(np.abs(actual - expected).max(axis=1))
+        agree.append(actual.argmax(axis=1) == expected.argmax(axis=1))
+    diffs, agree = np.concatenate(diffs), np.concatenate(agree)
+
+    stats = {
+        'images': len(pixels),
+        'max_abs_diff': float(diffs.max()),
+        'mean_abs_diff': float(diffs.mean()),
+        'top1_agreement': float(agree.mean()),
+    }
+    return stats['max_abs_diff'] <= tolerance and stats['top1_agreement'] == 1.0, stats
+
+
+def compare_latency(original, forward, batch_sizes=FORWARD_BATCH_SIZES):
+    """{batch_size: (original, optimized)} median forward time in ms"""
+    import tensorflow as tf
+    import keras_resnet
+
+    size = keras_resnet.IMAGE_SIZE
+    original_fn = tf.function(lambda pixels: original(pixels, training=False))
+    results = {}
+    for batch_size in batch_sizes:
+        pixels = tf.constant(np.random.default_rng(batch_size).standard_normal((batch_size, size, size, 3)), tf.float32)
+        results[batch_size] = (
+            time_call(lambda: [t.numpy() for t in original_fn(pixels)])['median_ms'],
+            time_call(lambda: [t.numpy() for t in forward(pixels)])['median_ms'],
+        )
+    return results
+
+
+def print_graph_report(graphs):
+    print("\n" + "="*60)
+    print("🔧 GRAPH")
+    print("="*60)
+    print(f"{'Stage':<14}{'Nodes':>8}{'Conv2D':>8}{'BN ops':>8}")
+    for stage, counts in graphs.items():
+        print(f"{stage:<14}{sum(counts.values()):>8}{counts['Conv2D']:>8}{sum(counts[op] for op in BN_OPS):>8}")
+    print("="*60)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Fold BatchNorm, constant-fold and prune the serving graph')
+    parser.add_argument('--model', type=str, default=inference.MODEL_PATH, help='HuggingFace model directory (default: ./hf_model)')
+    parser.add_argument('--output-dir', type=str, default=inference.SERVING_MODEL_DIR,
+                        help=f'Versioned export directory (default: {inference.SERVING_MODEL_DIR})')
+    parser.add_argument('--version', type=int, help='Version number (default: next free)')
+    parser.add_argument('--top-k', type=int, default=3, help='Labels returned per image (default: 3)')
+    parser.add_argument('--data', type=str, default=VAL_DIR, help=f'Images for the parity check (default: {VAL_DIR})')
+    parser.add_argument('--parity-images', type=int, default=64, help='Images to compare (default: 64)')
+    parser.add_argument('--tolerance', type=float, default=LOGIT_TOLERANCE,
+                        help=f'Max allowed logit difference (default: {LOGIT_TOLERANCE})')
+    parser.add_argument('--dry-run', action='store_true', help='Run the checks without writing an export')
+
+    args = parser.parse_args()
+
+    print("\n" + "🍅"*30)
+    print("TOMATO DISEASE MODEL - GRAPH OPTIMIZATION")
+    print("🍅"*30 + "\n")
+
+    version = args.version or next_version(args.output_dir)
+    export_dir = os.path.join(args.output_dir, str(version))
+    if not args.dry_run:
+        if os.path.exists(export_dir):
+            print(f"❌ {export_dir} already exists")
+            sys.exit(1)
+        if not os.path.exists(args.data):
+            print(f"❌ {args.data} not found, the export parity check cannot run")
+            print("   Run: python prepare_dataset.py --download")
+            sys.exit(1)
+
+    print(f"🔧 Folding BatchNorm and optimizing {args.model}...")
+    original, forward, config, graphs = optimize(args.model)
+    print_graph_report(graphs)
+
+    print(f"\n🔍 Checking logits on {args.parity_images} images...")
+    passed, stats = check_logit_parity(forward, args.model, parity_pixels(args.data, args.parity_images), args.tolerance)
+
+    print("\n" + "="*60)
+    print("🎯 LOGIT PARITY " + ("PASSED" if passed else "FAILED"))
+    print("="*60)
+    print(f"Images: {stats['images']}")
+    print(f"Top-1 agreement: {stats['top1_agreement']*100:.2f}%")
+    print(f"Max |Δlogit|: {stats['max_abs_diff']:.2e} (tolerance {args.tolerance:.0e})")
+    print(f"Mean |Δlogit|: {stats['mean_abs_diff']:.2e}")
+    print("="*60)
+
+    print("\n⏱️  Timing the forward pass...")
+    latency = compare_latency(original, forward)
+    print("\n" + "="*60)
+    print("⏱️  LATENCY (median)")
+    print("="*60)
+    print(f"{'Batch':>6}{'Original ms':>14}{'Optimized ms':>14}{'ms/image':>10}{'Speedup':>10}")
+    for batch_size, (before, after) in latency.items():
+        print(f"{batch_size:>6}{before:>14.1f}{after:>14.1f}{after / batch_size:>10.2f}{before / after:>9.2f}x")
+    print("="*60 + "\n")
+
+    if not passed:
+        print("❌ Optimized graph does not match the original, nothing written")
+        sys.exit(1)
+    if args.dry_run:
+        return
+
+    print(f"📦 Writing the optimized graph as version {version}...")
+    staging_dir = staging_dir_for(export_dir)
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    write_export(forward, config, args.model, staging_dir, args.top_k,
+                 optimizations=['fold_batch_norm', *GRAPPLER_PASSES])
+
+    print(f"\n🔍 Checking the written export on {args.parity_images} images...")
+    export_passed, export_stats = check_parity(staging_dir, args.model, parity_images(args.data, args.parity_images))
+    print("\n" + "="*60)
+    print("🎯 EXPORT PARITY " + ("PASSED" if export_passed else "FAILED"))
+    print("="*60)
+    print(f"Top-1 agreement: {export_stats['top1_agreement']*100:.2f}%")
+    print(f"Max |Δprob|: {export_stats['max_abs_diff']:.5f} (tolerance {PARITY_TOLERANCE})")
+    print(f"Resized input, max |Δprob|: {export_stats['resized_max_abs_diff']:.5f}")
+    print(f"Encoded vs decoded input, max |Δprob|: {export_stats['encoded_vs_pixels_max_diff']:.5f}")
+    print("="*60 + "\n")
+    if not export_passed:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        print(f"❌ {export_dir} will not be served")
+        sys.exit(1)
+
+    publish(staging_dir, export_dir, {**export_stats, 'logit_parity': stats})
+    print(f"✅ Saved to {export_dir}")
+    print("   The server serves the newest version after a restart\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+"""
+Prediction Log Store
+Append-only SQLite (WAL mode) log of every prediction for analytics. Request
+threads only enqueue; a background writer inserts in batches, and when the
+bounded queue is full new records are dropped and counted instead of
+blocking the request. A batch that fails to insert (database locked past the
+busy timeout, disk full) is counted as failed and the writer backs off, then
+carries on.
+
+Usage:
+    python prediction_store.py                      # daily class counts, last 30 days
+    python prediction_store.py --days 7 --db predictions.db
+"""
+
+import json
+import queue
+import sqlite3
+import threading
+import time
+
+DB_PATH = 'predictions.db'
+# Longest pause after consecutive failed inserts (locked or full database)
+MAX_BACKOFF_SECONDS = 30.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    request_id TEXT,
+    image_sha1 TEXT,
+    label TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    top_k TEXT NOT NULL,
+    latency_ms REAL,
+    model_version TEXT
+);
+CREATE INDEX IF NOT EXISTS predictions_ts ON predictions (ts);
+"""
+
+COLUMNS = ('ts', 'request_id', 'image_sha1', 'label', 'confidence', 'top_k', 'latency_ms', 'model_version')
+
+
+def connect(path):
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class PredictionStore:
+    """
+    Non-blocking writer. record() never waits on disk: rows go into a bounded
+    queue that a daemon thread drains every `flush_interval` seconds or
+    `batch_size` rows, whichever comes first.
+    """
+
+    def __init__(self, path=DB_PATH, max_queue=10000, batch_size=256, flush_interval=1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._stop = threading.Event()
+        # Open once here so schema errors surface at startup, not in the thread
+        connect(path).close()
+        self._thread = threading.Thread(target=self._run, name='prediction-store', daemon=True)
+        self._thread.start()
+
+    def record(self, label, confidence, top_k, request_id=None, image_sha1=None,
+               latency_ms=None, model_version=None):
+        row = (time.time(), request_id, image_sha1, label, float(confidence),
+               json.dumps(top_k), latency_ms, model_version)
+        try:
+            self.queue.put_nowait(row)
+        except queue.Full:
+            # Single increment under the GIL; an exact count is not required
+            self.dropped += 1
+
+    def _run(self):
+        conn = connect(self.path)
+        backoff = 0.0
+        try:
+            while not (self._stop.is_set() and self.queue.empty()):
+                batch = self._next_batch()
+                if not batch:
+                    continue
+                try:
+                    with conn:
+                        conn.executemany(
+                            f"INSERT INTO predictions ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                            batch
+                        )
+                except sqlite3.Error as e:
+                    # The batch is lost; keep draining so record() never stalls
+                    self.failed += len(batch)
+                    backoff = min(max(backoff * 2, self.flush_interval), MAX_BACKOFF_SECONDS)
+                    print(f"✗ Prediction store: {len(batch)} rows not written ({str(e)}), pausing {backoff:g}s")
+                    self._stop.wait(backoff)
+                    continue
+                backoff = 0.0
+                self.written += len(batch)
+        finally:
+            conn.close()
+
+    def _next_batch(self):
+        """Wait up to flush_interval for the first row, then take what is queued"""
+        try:
+            batch = [self.queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def stats(self):
+        return {'queued': self.queue.qsize(), 'written': self.written, 'dropped': self.dropped,
+                'failed': self.failed}
+
+    def close(self, timeout=5.0):
+        """Flush what is queued and stop the writer"""
+        self._stop.set()
+        self._thread.join(timeout)
+
+
+# ---------------------------------------------------------------------------
+# Queries
+# ---------------------------------------------------------------------------
+
+def daily_class_counts(path=DB_PATH, days=30):
+    """{day: {label: count}} for the last `days` days (UTC), oldest first"""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute(
+            """
+            SELECT date(ts, 'unixepoch') AS day, label, COUNT(*)
+            FROM predictions
+            WHERE ts >= ?
+            GROUP BY day, label
+            ORDER BY day, label
+            """,
+            (time.time() - days * 86400,)
+        ).fetchall()
+    finally:
+        conn.close()
+
+    counts = {}
+    for day, label, count in rows:
+        counts.setdefault(day, {})[label] = count
+    return counts
+
+
+def main():
+    import argparse
+    import os
+
+    from inference import short_name
+
+    parser = argparse.ArgumentParser(description='Daily prediction counts per class')
+    parser.add_argument('--db', type=str, default=DB_PATH, help=f'Prediction database (default: {DB_PATH})')
+    parser.add_argument('--days', type=int, default=30, help='Days to include (default: 30)')
+    parser.add_argument('--json', action='store_true', help='Print JSON instead of a table')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"❌ Database not found: {args.db}")
+        return
+
+    counts = daily_class_counts(args.db, args.days)
+    if args.json:
+        print(json.dumps(counts, indent=2))
+        return
+
+    labels = sorted({label for day in counts.values() for label in day})
+    names = [short_name(label)[:10] for label in labels]
+
+    print("\n" + "="*(12 + 11 * len(labels) + 8))
+    print(f"📊 PREDICTIONS PER DAY (last {args.days} days, UTC)")
+    print("="*(12 + 11 * len(labels) + 8))
+    print(f"{'Day':<12}" + "".join(f"{name:>11}" for name in names) + f"{'Total':>8}")
+    for day, day_counts in counts.items():
+        row = [day_counts.get(label, 0) for label in labels]
+        print(f"{day:<12}" + "".join(f"{n:>11}" for n in row) + f"{sum(row):>8}")
+    totals = [sum(day.get(label, 0) for day in counts.values()) for label in labels]
+    print(f"{'Total':<12}" + "".join(f"{n:>11}" for n in totals) + f"{sum(totals):>8}")
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -7,6 +7,8 @@ import os
 import shutil
 from pathlib import Path
 
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
 def create_directory_structure():
     """
     Create the required directory structure for the dataset
@@ -37,13 +39,34 @@ def create_directory_structure():
     print(f"\n✅ Directory structure created at: {base_dir}")
     return base_dir
 
-def split_dataset(source_dir, train_ratio=0.8):
+def list_image_files(directory):
+    """
+    List images under `directory/<class_name>/`.
+    Classes are taken in sorted folder order, same as flow_from_directory.
+    
+    Returns:
+        (paths, labels, class_names)
+    """
+    class_names = sorted(
+        d for d in os.listdir(directory) if os.path.isdir(os.path.join(directory, d))
+    )
+    paths, labels = [], []
+    for label, class_name in enumerate(class_names):
+        class_dir = os.path.join(directory, class_name)
+        for name in sorted(os.listdir(class_dir)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.join(class_dir, name))
+                labels.append(label)
+    return paths, labels, class_names
+
+def split_dataset(source_dir, train_ratio=0.8, dedup=False):
     """
     Split dataset into train and validation sets
     
     Args:
         source_dir: Directory containing the downloaded PlantVillage dataset
         train_ratio: Ratio of training data (default: 0.8)
+        dedup: Keep near-duplicate images (dedup.py) on the same side of the split
     """
     import random
     
@@ -59,19 +82,45 @@ def split_dataset(source_dir, train_ratio=0.8):
     
     print(f"\n📂 Found {len(tomato_classes)} tomato disease classes")
     
-    for class_dir in tomato_classes:
+    class_images = {
+        class_dir: list(class_dir.glob('*.jpg')) + list(class_dir.glob('*.JPG'))
+        for class_dir in tomato_classes
+    }
+    
+    group_of = None
+    if dedup:
+        import dedup as near_duplicates
+        all_images = [img for images in class_images.values() for img in images]
+        print(f"\n🔍 Grouping near-duplicates among {len(all_images)} images...")
+        groups, _ = near_duplicates.find_groups([str(img) for img in all_images])
+        group_of = dict(zip(all_images, groups))
+        print(f"   {len(set(groups))} groups, {len(all_images) - len(set(groups))} redundant images")
+    # Side of the split per duplicate group, shared across classes
+    group_side = {}
+    
+    for class_dir, images in class_images.items():
         class_name = class_dir.name
         print(f"\n📁 Processing: {class_name}")
         
-        # Get all images
-        images = list(class_dir.glob('*.jpg')) + list(class_dir.glob('*.JPG'))
-        random.shuffle(images)
-        
         # Calculate split point
         split_point = int(len(images) * train_ratio)
         
-        train_images = images[:split_point]
-        val_images = images[split_point:]
+        if group_of is None:
+            random.shuffle(images)
+            train_images = images[:split_point]
+            val_images = images[split_point:]
+        else:
+            # Shuffle whole groups and fill train up to the split point
+            groups = {}
+            for img in images:
+                groups.setdefault(group_of[img], []).append(img)
+            group_ids = list(groups)
+            random.shuffle(group_ids)
+            train_images, val_images = [], []
+            for group in group_ids:
+                if group not in group_side:
+                    group_side[group] = 'train' if len(train_images) < split_point else 'val'
+                (train_images if group_side[group] == 'train' else val_images).extend(groups[group])
         
         print(f"   Total: {len(images)} | Train: {len(train_images)} | Val: {len(val_images)}")
         
@@ -127,6 +176,8 @@ def main():
     parser.add_argument('--source', type=str, help='Path to downloaded PlantVillage dataset')
     parser.add_argument('--download', action='store_true', help='Download dataset from Kaggle')
     parser.add_argument('--train-ratio', type=float, default=0.8, help='Training data ratio (default: 0.8)')
+    parser.add_argument('--dedup', action='store_true',
+                        help='Keep near-duplicate images on one side of the split (see dedup.py)')
     
     args = parser.parse_args()
     
@@ -141,9 +192,9 @@ def main():
     if args.download:
         source_dir = download_from_kaggle()
         if source_dir:
-            split_dataset(source_dir, args.train_ratio)
+            split_dataset(source_dir, args.train_ratio, args.dedup)
     elif args.source:
-        split_dataset(args.source, args.train_ratio)
+        split_dataset(args.source, args.train_ratio, args.dedup)
     else:
         print("\n📋 Next Steps:")
         print("="*60)
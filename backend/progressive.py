@@ -0,0 +1,165 @@
+"""
+Progressive-Resolution Training
+Runs the early epochs at low resolution with proportionally larger batches
+(e.g. 128 -> 160 -> 224) and the final epochs at full size. The model is
+built once with a variable input size, so each phase only swaps the input
+iterator; every phase is one model.fit call continuing the same epoch count.
+Validation always runs at full size so val accuracy stays comparable.
+EarlyStopping / ReduceLROnPlateau state is carried from phase to phase, so
+patience and best weights behave as in a single fit.
+"""
+
+import time
+
+from tensorflow import keras
+
+from checkpointing import CALLBACK_STATE_ATTRS
+from run_log import TimedBatches
+
+FULL_SIZE = 224
+DEFAULT_SIZES = (128, 160, 224)
+# Share of the epochs trained at full size; the rest is split evenly
+FULL_SIZE_FRACTION = 0.4
+
+
+def default_schedule(epochs, sizes=DEFAULT_SIZES, full_fraction=FULL_SIZE_FRACTION):
+    """[(size, epochs), ...] summing to `epochs`, the last size getting full_fraction of them"""
+    full_epochs = max(1, round(epochs * full_fraction))
+    low = sizes[:-1]
+    schedule = [(size, (epochs - full_epochs) // len(low)) for size in low]
+    schedule[0] = (schedule[0][0], schedule[0][1] + (epochs - full_epochs) % len(low))
+    schedule.append((sizes[-1], full_epochs))
+    return [(size, n) for size, n in schedule if n > 0]
+
+
+def parse_schedule(spec):
+    """'128:10,160:10,224:30' -> [(128, 10), (160, 10), (224, 30)] (size:epochs)"""
+    schedule = []
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        size, _, epochs = item.partition(':')
+        schedule.append((int(size), int(epochs)))
+    return schedule
+
+
+def phase_batch_size(base_batch_size, size, full_size=FULL_SIZE, multiple=8, max_batch_size=256):
+    """Scale the batch by the pixel ratio so a step costs about the same at every size"""
+    scaled = base_batch_size * (full_size / size) ** 2
+    return int(min(max_batch_size, max(base_batch_size, scaled // multiple * multiple)))
+
+
+class CarryCallbackState(keras.callbacks.Callback):
+    """
+    Keras callbacks reset their patience counters, best value and best
+    weights in on_train_begin. Placed last, this puts back what they had at
+    the end of the previous phase's fit.
+    """
+
+    def __init__(self, callbacks, attrs=CALLBACK_STATE_ATTRS + ('best_weights',)):
+        super().__init__()
+        self.callbacks = [cb for cb in callbacks if any(hasattr(cb, name) for name in attrs)]
+        self.attrs = attrs
+        self.state = None
+
+    def on_train_begin(self, logs=None):
+        if self.state is None:
+            return
+        for callback, attrs in zip(self.callbacks, self.state):
+            for name, value in attrs.items():
+                setattr(callback, name, value)
+
+    def on_train_end(self, logs=None):
+        self.state = [
+            {name: getattr(cb, name) for name in self.attrs if hasattr(cb, name)}
+            for cb in self.callbacks
+        ]
+
+
+def fit_progressive(model, schedule, make_train_data, validation_data, callbacks, base_batch_size,
+                    initial_epoch=0, monitor=None, checkpoint=None):
+    """
+    Train through `schedule` ([(size, epochs), ...]).
+
+    Args:
+        make_train_data: (image_size, batch_size) -> Keras iterator/PyDataset
+        monitor: ThroughputMonitor in `callbacks`, told about each phase
+        checkpoint: TrainingCheckpoint in `callbacks`, given each phase's iterator
+        initial_epoch: Resume point; completed phases are skipped
+
+    Returns:
+        [{'size', 'batch_size', 'epochs', 'seconds'}] for the phases that ran
+    """
+    # A learning rate restored on resume already carries the batch scaling of
+    # the phase it was saved in: the one holding the last completed epoch
+    batch_size = base_batch_size
+    epoch = 0
+    for size, epochs in schedule:
+        if epoch < initial_epoch:
+            batch_size = phase_batch_size(base_batch_size, size)
+        epoch += epochs
+
+    carry = CarryCallbackState(callbacks)
+    callbacks = list(callbacks) + [carry]
+    phases = []
+    epoch = 0
+    for size, epochs in schedule:
+        start, end = epoch, epoch + epochs
+        epoch = end
+        if end <= initial_epoch:
+            continue
+
+        # Keep the learning rate per example constant as the batch grows or shrinks
+        new_batch_size = phase_batch_size(base_batch_size, size)
+        learning_rate = float(keras.ops.convert_to_numpy(model.optimizer.learning_rate))
+        model.optimizer.learning_rate = learning_rate * new_batch_size / batch_size
+        batch_size = new_batch_size
+
+        data = make_train_data((size, size), batch_size)
+        if checkpoint is not None:
+            checkpoint.attach_data(data)
+        if monitor is not None:
+            data = TimedBatches(data)
+            monitor.timer = data
+            monitor.batch_size = batch_size
+            monitor.phase = {'img_size': size, 'batch_size': batch_size}
+
+        print(f"\n📐 Phase {size}x{size}, batch {batch_size}: epochs {max(start, initial_epoch) + 1}-{end}")
+        phase_start = time.perf_counter()
+        model.fit(
+            data,
+            validation_data=validation_data,
+            epochs=end,
+            initial_epoch=max(start, initial_epoch),
+            callbacks=callbacks,
+            verbose=1
+        )
+        phases.append({
+            'size': size,
+            'batch_size': batch_size,
+            'epochs': end - max(start, initial_epoch),
+            'seconds': time.perf_counter() - phase_start,
+        })
+        if model.stop_training:
+            print("⏹️  Early stopping, skipping the remaining phases")
+            break
+    return phases
+
+
+def print_phase_report(phases):
+    """Wall time per phase and the speedup over training every epoch at full size"""
+    print("\n" + "="*60)
+    print("📐 PROGRESSIVE RESIZING")
+    print("="*60)
+    print(f"{'Size':>6}{'Batch':>8}{'Epochs':>8}{'Total s':>10}{'s/epoch':>10}")
+    for phase in phases:
+        print(f"{phase['size']:>6}{phase['batch_size']:>8}{phase['epochs']:>8}"
+              f"{phase['seconds']:>10.0f}{phase['seconds'] / phase['epochs']:>10.1f}")
+
+    total = sum(p['seconds'] for p in phases)
+    full = [p for p in phases if p['size'] == FULL_SIZE]
+    if full and len(full) < len(phases):
+        epoch_time = sum(p['seconds'] for p in full) / sum(p['epochs'] for p in full)
+        fixed = epoch_time * sum(p['epochs'] for p in phases)
+        print(f"\nWall time: {total:.0f}s vs ~{fixed:.0f}s at {FULL_SIZE} for every epoch "
+              f"({fixed / total:.2f}x faster)")
+        print("   Full-size estimate uses this run's own 224 epochs; compare run logs with run_log.py")
+    print("="*60)
@@ -0,0 +1,216 @@
+"""
+Structured Channel Pruning of the HuggingFace ResNet50
+Removes the least important filters inside every bottleneck block, fine-tunes
+briefly on the tomato dataset and exports each pruned model as a dense
+SavedModel the server can load, with a sparsity / accuracy / latency / size
+report to pick an operating point from.
+
+Usage:
+    python prune.py
+    python prune.py --sparsities 0,0.5,0.75 --epochs 2
+    MODEL_PATH=pruned_models/sparsity_500 python app.py
+"""
+
+import csv
+import json
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+
+import inference
+import keras_resnet
+from data_pipeline import list_image_files, AUTOTUNE
+from distill import measure_latency
+
+DATA_DIR = 'data/tomato_dataset'
+OUTPUT_DIR = 'pruned_models'
+REPORT_PATH = 'pruning_report.csv'
+DEFAULT_SPARSITIES = '0,0.25,0.5,0.625,0.75'
+CHANNEL_MULTIPLE = 8
+
+
+# ---------------------------------------------------------------------------
+# Channel selection
+# ---------------------------------------------------------------------------
+
+def filter_importance(kernel, gamma, moving_variance):
+    """
+    L1 norm of each output filter after folding in its BatchNorm scale:
+    |gamma| / sqrt(var + eps) * ||W||_1. Filters the BN layer scales towards
+    zero contribute little no matter how large their weights are.
+    """
+    scale = np.abs(gamma) / np.sqrt(moving_variance + keras_resnet.BN_EPSILON)
+    return scale * np.abs(kernel).sum(axis=(0, 1, 2))
+
+
+def kept_channels(width, sparsity):
+    """Channels left after pruning, rounded to a multiple of 8 for fast kernels"""
+    kept = int(round(width * (1 - sparsity) / CHANNEL_MULTIPLE)) * CHANNEL_MULTIPLE
+    return min(width, max(CHANNEL_MULTIPLE, kept))
+
+
+def prune_plan(weights, config, sparsity):
+    """
+    Pick the channels to keep in the two inner convs of every bottleneck.
+    The block outputs (and so every residual connection) keep their width.
+
+    Returns:
+        (widths, keep) for keras_resnet.build_model / load_weights
+    """
+    widths, keep = {}, {}
+    for (s, b), width in keras_resnet.default_widths(config).items():
+        prefix = keras_resnet.block_prefix(s, b)
+        n = kept_channels(width, sparsity)
+        block_keep = []
+        for layer in ('layer.0', 'layer.1'):
+            kernel, gamma, _, _, variance = keras_resnet.conv_bn_weights(weights, f"{prefix}/{layer}")
+            scores = filter_importance(kernel, gamma, variance)
+            block_keep.append(np.sort(np.argsort(-scores)[:n]))
+        widths[(s, b)] = n
+        keep[(s, b)] = tuple(block_keep)
+    return widths, keep
+
+
+# ---------------------------------------------------------------------------
+# Data
+# ---------------------------------------------------------------------------
+
+def load_image(path):
+    """Decode and preprocess like the HF image processor -> normalized NHWC"""
+    image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+    return keras_resnet.preprocess(image)
+
+
+def make_dataset(directory, id2label, batch_size, training):
+    """Dataset of (image, label) with labels in model label order"""
+    paths, folder_labels, class_names = list_image_files(directory)
+    labels = inference.folder_to_model_index(class_names, id2label)[np.array(folder_labels)]
+
+    dataset = tf.data.Dataset.from_tensor_slices((paths, labels))
+    if training:
+        dataset = dataset.shuffle(len(paths), reshuffle_each_iteration=True)
+    dataset = dataset.map(lambda path, label: (load_image(path), label), num_parallel_calls=AUTOTUNE)
+    if training:
+        dataset = dataset.map(
+            lambda image, label: (tf.image.random_flip_left_right(image), label),
+            num_parallel_calls=AUTOTUNE
+        )
+    return dataset.batch(batch_size).prefetch(AUTOTUNE)
+
+
+# ---------------------------------------------------------------------------
+# Report
+# ---------------------------------------------------------------------------
+
+def export_dir_for(output_dir, sparsity):
+    return os.path.join(output_dir, f"sparsity_{int(round(sparsity * 1000)):03d}")
+
+
+def print_report(rows):
+    baseline = rows[0]
+    print("\n" + "="*78)
+    print("🎯 PRUNING RESULTS (validation set, CPU latency at batch size 1)")
+    print("="*78)
+    print(f"{'Sparsity':>9}{'Accuracy':>11}{'Latency ms':>12}{'Speedup':>9}{'Params (M)':>12}{'Size (MB)':>11}  Model")
+    for row in rows:
+        print(f"{row['sparsity']:>9.3f}{row['val_accuracy']*100:>10.2f}%{row['latency_ms']:>12.1f}"
+              f"{baseline['latency_ms'] / row['latency_ms']:>8.2f}x{row['params']/1e6:>12.1f}"
+              f"{row['size_mb']:>11.1f}  {row['model_dir']}")
+    print("="*78 + "\n")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Prune ResNet50 channels and report the accuracy/latency trade-off')
+    parser.add_argument('--model', type=str, default=inference.MODEL_PATH, help='HuggingFace model directory (default: ./hf_model)')
+    parser.add_argument('--data', type=str, default=DATA_DIR, help=f'Dataset with train/ and val/ (default: {DATA_DIR})')
+    parser.add_argument('--sparsities', type=str, default=DEFAULT_SPARSITIES,
+                        help=f'Comma-separated fraction of bottleneck channels to remove (default: {DEFAULT_SPARSITIES})')
+    parser.add_argument('--epochs', type=int, default=1, help='Fine-tuning epochs per pruned model (default: 1)')
+    parser.add_argument('--steps-per-epoch', type=int, help='Cap fine-tuning steps per epoch')
+    parser.add_argument('--batch-size', type=int, default=32, help='Batch size (default: 32)')
+    parser.add_argument('--learning-rate', type=float, default=1e-4, help='Fine-tuning learning rate (default: 1e-4)')
+    parser.add_argument('--output-dir', type=str, default=OUTPUT_DIR, help=f'Exported models (default: {OUTPUT_DIR})')
+    parser.add_argument('--report', type=str, default=REPORT_PATH, help=f'CSV report (default: {REPORT_PATH})')
+
+    args = parser.parse_args()
+
+    print("\n" + "🍅"*30)
+    print("TOMATO DISEASE MODEL - STRUCTURED PRUNING")
+    print("🍅"*30 + "\n")
+
+    train_dir = os.path.join(args.data, 'train')
+    val_dir = os.path.join(args.data, 'val')
+    if not os.path.exists(train_dir):
+        print("❌ Dataset not found!")
+        print("   Run: python prepare_dataset.py --download")
+        return
+
+    print(f"📥 Loading weights from {args.model}...")
+    weights, config = keras_resnet.load_hf_weights(args.model)
+    id2label = config['id2label']
+    train_ds = make_dataset(train_dir, id2label, args.batch_size, training=True)
+    val_ds = make_dataset(val_dir, id2label, args.batch_size, training=False)
+
+    sparsities = sorted(float(s) for s in args.sparsities.split(','))
+    latency_input = np.random.rand(1, 3, keras_resnet.IMAGE_SIZE, keras_resnet.IMAGE_SIZE).astype(np.float32)
+    rows = []
+
+    for sparsity in sparsities:
+        print(f"\n✂️  Sparsity {sparsity:.3f}")
+        widths, keep = prune_plan(weights, config, sparsity)
+        model = keras_resnet.build_model(config, widths)
+        keras_resnet.load_weights(model, weights, config, keep if sparsity > 0 else None)
+        model.compile(
+            optimizer=keras.optimizers.Adam(learning_rate=args.learning_rate),
+            loss=keras.losses.SparseCategoricalCrossentropy(from_logits=True),
+            metrics=['accuracy']
+        )
+
+        # The unpruned model is the one being served; only pruned ones are fine-tuned
+        if sparsity > 0:
+            start = time.perf_counter()
+            model.fit(train_ds, epochs=args.epochs, steps_per_epoch=args.steps_per_epoch)
+            print(f"   Fine-tuned in {time.perf_counter() - start:.0f}s")
+        _, accuracy = model.evaluate(val_ds, verbose=0)
+
+        export_dir = export_dir_for(args.output_dir, sparsity)
+        keras_resnet.export_saved_model(model, export_dir, args.model)
+        with open(os.path.join(export_dir, 'pruning.json'), 'w') as f:
+            json.dump({
+                'sparsity': sparsity,
+                'source_model': inference.model_fingerprint(args.model),
+                'widths': {f"{s}.{b}": w for (s, b), w in widths.items()},
+            }, f, indent=2)
+
+        # Time the exported model the way the server will run it
+        with tf.device('/CPU:0'):
+            served = inference.SavedModelClassifier(export_dir)
+            latency_ms = measure_latency(lambda: served(pixel_values=latency_input).logits.numpy())
+
+        rows.append({
+            'sparsity': sparsity,
+            'val_accuracy': float(accuracy),
+            'latency_ms': latency_ms,
+            'params': keras_resnet.count_params(model),
+            'size_mb': keras_resnet.directory_size_mb(export_dir),
+            'model_dir': export_dir,
+        })
+        print(f"   Accuracy {accuracy*100:.2f}%, {latency_ms:.1f} ms, saved to {export_dir}")
+        keras.backend.clear_session()
+
+    print_report(rows)
+    with open(args.report, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"✅ Report written to {args.report}")
+    print(f"   Serve a pruned model with: MODEL_PATH={rows[-1]['model_dir']} python app.py\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -11,6 +11,10 @@ from tensorflow.keras.layers import Dense, GlobalAveragePooling2D, Dropout
 from tensorflow.keras.models import Model
 from tensorflow.keras.preprocessing.image import ImageDataGenerator
 
+from checkpointing import TrainingCheckpoint
+from run_log import ThroughputMonitor, TimedBatches, default_log_path
+import progressive
+
 # Quick training configuration
 IMG_SIZE = (224, 224)
 BATCH_SIZE = 32
@@ -21,6 +25,7 @@ DATASET_DIR = 'data/tomato_dataset'
 TRAIN_DIR = os.path.join(DATASET_DIR, 'train')
 VAL_DIR = os.path.join(DATASET_DIR, 'val')
 MODEL_SAVE_PATH = 'tomato_resnet50_model.h5'
+CHECKPOINT_DIR = 'checkpoints/quick'
 
 CLASS_NAMES = [
     'Tomato___Bacterial_spot',
@@ -35,19 +40,23 @@ CLASS_NAMES = [
     'Tomato___healthy'
 ]
 
-def quick_train():
-    """Fast training with MobileNetV2"""
-    
-    print("🚀 Quick Training Mode - Using MobileNetV2 for speed")
-    print("   Expected training time: 30-60 minutes (with GPU)")
-    print()
+def build_model(num_classes, head_units=256, dropout=0.5, activation='softmax', image_size=IMG_SIZE):
+    """
+    MobileNetV2 (frozen, ImageNet weights) with a small classification head.
+    Pass activation=None to get logits, e.g. for distillation.
+    """
+    base = MobileNetV2(weights='imagenet', include_top=False, input_shape=(*image_size, 3))
+    base.trainable = False
     
-    if not os.path.exists(TRAIN_DIR):
-        print("❌ Dataset not found!")
-        print("   Run: python prepare_dataset.py --download")
-        return
+    x = GlobalAveragePooling2D()(base.output)
+    x = Dense(head_units, activation='relu')(x)
+    x = Dropout(dropout)(x)
+    output = Dense(num_classes, activation=activation)(x)
     
-    # Data generators
+    return Model(inputs=base.input, outputs=output)
+
+def make_train_generator(image_size=IMG_SIZE, batch_size=BATCH_SIZE):
+    """Augmented training batches at `image_size`"""
     train_datagen = ImageDataGenerator(
         rescale=1./255,
         rotation_range=20,
@@ -57,14 +66,32 @@ def quick_train():
         fill_mode='nearest'
     )
     
-    val_datagen = ImageDataGenerator(rescale=1./255)
-    
-    train_gen = train_datagen.flow_from_directory(
+    return train_datagen.flow_from_directory(
         TRAIN_DIR,
-        target_size=IMG_SIZE,
-        batch_size=BATCH_SIZE,
+        target_size=image_size,
+        batch_size=batch_size,
         class_mode='categorical'
     )
+
+def quick_train(resume=False, checkpoint_dir=CHECKPOINT_DIR, checkpoint_every=1, run_log=None, schedule=None):
+    """
+    Fast training with MobileNetV2.
+    schedule: [(size, epochs), ...] for progressive resizing (see progressive.py)
+    """
+    
+    print("🚀 Quick Training Mode - Using MobileNetV2 for speed")
+    print("   Expected training time: 30-60 minutes (with GPU)")
+    print()
+    
+    if not os.path.exists(TRAIN_DIR):
+        print("❌ Dataset not found!")
+        print("   Run: python prepare_dataset.py --download")
+        return
+    
+    # Data generators
+    val_datagen = ImageDataGenerator(rescale=1./255)
+    
+    train_gen = make_train_generator()
     
     val_gen = val_datagen.flow_from_directory(
         VAL_DIR,
@@ -77,16 +104,8 @@ def quick_train():
     print(f"✅ Found {val_gen.samples} validation images")
     print()
     
-    # Build model
-    base = MobileNetV2(weights='imagenet', include_top=False, input_shape=(*IMG_SIZE, 3))
-    base.trainable = False
-    
-    x = GlobalAveragePooling2D()(base.output)
-    x = Dense(256, activation='relu')(x)
-    x = Dropout(0.5)(x)
-    output = Dense(len(CLASS_NAMES), activation='softmax')(x)
-    
-    model = Model(inputs=base.input, outputs=output)
+    # Build model (variable input size when the resolution changes between phases)
+    model = build_model(len(CLASS_NAMES), image_size=(None, None) if schedule else IMG_SIZE)
     
     model.compile(
         optimizer=keras.optimizers.Adam(learning_rate=LEARNING_RATE),
@@ -97,24 +116,66 @@ def quick_train():
     print("✅ Model compiled")
     print()
     
+    callbacks = [
+        keras.callbacks.ModelCheckpoint(
+            MODEL_SAVE_PATH,
+            save_best_only=True,
+            monitor='val_accuracy'
+        ),
+        keras.callbacks.EarlyStopping(
+            patience=5,
+            restore_best_weights=True
+        )
+    ]
+    
+    # Full training state checkpoints (must run after the callbacks it tracks)
+    checkpoint = TrainingCheckpoint(
+        checkpoint_dir,
+        data=None if schedule else train_gen,  # phases attach their own iterators
+        every_n_epochs=checkpoint_every,
+        tracked_callbacks=callbacks
+    )
+    initial_epoch = checkpoint.restore(model) if resume else 0
+    callbacks.append(checkpoint)
+    
+    # Throughput instrumentation
+    timed_train = TimedBatches(train_gen)
+    monitor = ThroughputMonitor(
+        run_log or default_log_path('quick_train'),
+        batch_size=BATCH_SIZE,
+        data=timed_train,
+        config={
+            'script': 'quick_train.py',
+            'model': 'MobileNetV2',
+            'img_size': list(IMG_SIZE),
+            'batch_size': BATCH_SIZE,
+            'epochs': EPOCHS,
+            'learning_rate': LEARNING_RATE,
+            'progressive': schedule,
+        }
+    )
+    callbacks.append(monitor)
+    
     # Train
     print("🏋️  Training started...")
-    history = model.fit(
-        train_gen,
-        validation_data=val_gen,
-        epochs=EPOCHS,
-        callbacks=[
-            keras.callbacks.ModelCheckpoint(
-                MODEL_SAVE_PATH,
-                save_best_only=True,
-                monitor='val_accuracy'
-            ),
-            keras.callbacks.EarlyStopping(
-                patience=5,
-                restore_best_weights=True
-            )
-        ]
-    )
+    if schedule:
+        print(f"   Progressive resizing: {' → '.join(f'{size}px x{n}' for size, n in schedule)}")
+        phases = progressive.fit_progressive(
+            model, schedule, make_train_generator, val_gen, callbacks,
+            base_batch_size=BATCH_SIZE,
+            initial_epoch=initial_epoch,
+            monitor=monitor,
+            checkpoint=checkpoint,
+        )
+        progressive.print_phase_report(phases)
+    else:
+        model.fit(
+            timed_train,
+            validation_data=val_gen,
+            epochs=EPOCHS,
+            initial_epoch=initial_epoch,
+            callbacks=callbacks
+        )
     
     print(f"\n✅ Training complete!")
     print(f"   Model saved: {MODEL_SAVE_PATH}")
@@ -122,6 +183,34 @@ def quick_train():
     # Evaluate
     results = model.evaluate(val_gen)
     print(f"\n📊 Validation Accuracy: {results[1]*100:.2f}%")
-    
+
+def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Quick MobileNetV2 training')
+    parser.add_argument('--resume', action='store_true', help='Resume from the latest checkpoint')
+    parser.add_argument('--checkpoint-dir', type=str, default=CHECKPOINT_DIR, help='Training state checkpoint directory')
+    parser.add_argument('--checkpoint-every', type=int, default=1, help='Save training state every N epochs (default: 1)')
+    parser.add_argument('--run-log', type=str, help='Throughput/metrics JSONL run log (default: runs/quick_train-<time>.jsonl)')
+    parser.add_argument('--progressive', action='store_true',
+                        help='Progressive resizing: early epochs at 128/160 with larger batches, the rest at 224')
+    parser.add_argument('--schedule', type=str,
+                        help="Progressive schedule as size:epochs, e.g. '128:10,160:8,224:12' (default: from EPOCHS)")
+    
+    args = parser.parse_args()
+    
+    schedule = None
+    if args.progressive or args.schedule:
+        schedule = progressive.parse_schedule(args.schedule) if args.schedule else progressive.default_schedule(EPOCHS)
+    
+    quick_train(
+        resume=args.resume,
+        checkpoint_dir=args.checkpoint_dir,
+        checkpoint_every=args.checkpoint_every,
+        run_log=args.run_log,
+        schedule=schedule
+    )
+
 if __name__ == '__main__':
-    quick_train()
+    main()
+
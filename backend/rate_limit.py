@@ -0,0 +1,192 @@
+"""
+Per-Client Rate Limiting
+Token buckets keyed by API key or client IP, kept in an LRU map so memory is
+O(1) per active client and idle clients are evicted. A rejected request gets
+the number of seconds until its next token, for a 429 with Retry-After.
+
+Usage:
+    python rate_limit.py                            # noisy-neighbour simulation
+    python rate_limit.py --noisy-rps 40 --rate 2 --burst 5
+"""
+
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `burst`"""
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now):
+        """0 if a token was taken, otherwise seconds until one is available"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    One bucket per client. `limits` overrides (rate, burst) for specific
+    clients, e.g. a trusted batch uploader. Buckets idle for longer than
+    `idle_seconds` are dropped, and the least recently used ones go first
+    when more than `max_clients` are active.
+    """
+
+    def __init__(self, rate, burst, limits=None, idle_seconds=300, max_clients=10000):
+        self.rate = rate
+        self.burst = burst
+        self.limits = limits or {}
+        self.idle_seconds = idle_seconds
+        self.max_clients = max_clients
+        self.buckets = OrderedDict()
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def check(self, client, now=None):
+        """0 if the request may proceed, otherwise the Retry-After in seconds"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self.buckets.get(client)
+            if bucket is None:
+                rate, burst = self.limits.get(client, (self.rate, self.burst))
+                bucket = self.buckets[client] = TokenBucket(rate, burst, now)
+            else:
+                self.buckets.move_to_end(client)
+            self._evict(now)
+            wait = bucket.take(now)
+            if wait:
+                self.rejected += 1
+            return wait
+
+    def _evict(self, now):
+        # Least recently used first, so stop at the first bucket still in use
+        while self.buckets:
+            client, bucket = next(iter(self.buckets.items()))
+            if len(self.buckets) <= self.max_clients and now - bucket.updated < self.idle_seconds:
+                break
+            del self.buckets[client]
+
+    def stats(self):
+        return {'active_clients': len(self.buckets), 'rejected': self.rejected}
+
+
+def parse_limits(spec):
+    """'key1=5:10,10.0.0.7=1:2' -> {'key1': (5.0, 10.0), '10.0.0.7': (1.0, 2.0)} (rate:burst)"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        client, _, limit = item.rpartition('=')
+        rate, _, burst = limit.partition(':')
+        limits[client] = (float(rate), float(burst or rate))
+    return limits
+
+
+def retry_after_header(seconds):
+    """Retry-After takes whole seconds"""
+    return str(max(1, math.ceil(seconds)))
+
+
+# ---------------------------------------------------------------------------
+# Noisy-neighbour simulation
+# ---------------------------------------------------------------------------
+
+def simulate(clients, service_ms, duration, timeout, limiter=None, seed=0):
+    """
+    Discrete-event simulation of one model worker serving requests FIFO.
+    `clients` maps name -> requests/second (Poisson arrivals). A request that
+    would wait longer than `timeout` seconds is abandoned by its client and
+    never reaches the model.
+
+    Returns:
+        {client: {'sent', 'rejected', 'timed_out', 'served', 'latencies'}}
+    """
+    rng = random.Random(seed)
+    arrivals = []
+    for name, rps in clients.items():
+        t = rng.expovariate(rps)
+        while t < duration:
+            arrivals.append((t, name))
+            t += rng.expovariate(rps)
+    arrivals.sort()
+
+    service = service_ms / 1000
+    results = {name: {'sent': 0, 'rejected': 0, 'timed_out': 0, 'served': 0, 'latencies': []} for name in clients}
+    worker_free = 0.0
+    for t, name in arrivals:
+        stats = results[name]
+        stats['sent'] += 1
+        if limiter and limiter.check(name, now=t):
+            stats['rejected'] += 1
+            continue
+        start = max(t, worker_free)
+        if start - t > timeout:
+            stats['timed_out'] += 1
+            continue
+        worker_free = start + service
+        stats['served'] += 1
+        stats['latencies'].append(worker_free - t)
+    return results
+
+
+def print_simulation(title, results, duration):
+    served_total = sum(stats['served'] for stats in results.values())
+    print("\n" + "="*78)
+    print(f"🎯 {title}")
+    print("="*78)
+    print(f"{'Client':<12}{'Sent/s':>8}{'Served/s':>10}{'Share':>8}{'429':>7}{'Timeout':>9}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, stats in results.items():
+        latencies = sorted(stats['latencies'])
+        p50 = latencies[len(latencies) // 2] * 1000 if latencies else float('nan')
+        p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else float('nan')
+        share = stats['served'] / served_total * 100 if served_total else 0
+        print(f"{name:<12}{stats['sent'] / duration:>8.1f}{stats['served'] / duration:>10.2f}{share:>7.1f}%"
+              f"{stats['rejected']:>7}{stats['timed_out']:>9}{p50:>10.0f}{p95:>10.0f}")
+    print("="*78)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Noisy-neighbour simulation of the per-client rate limiter')
+    parser.add_argument('--service-ms', type=float, default=100, help='Model time per request (default: 100)')
+    parser.add_argument('--noisy-rps', type=float, default=30, help='Request rate of the misbehaving client (default: 30)')
+    parser.add_argument('--clients', type=int, default=4, help='Well-behaved clients (default: 4)')
+    parser.add_argument('--client-rps', type=float, default=1.5, help='Request rate of each well-behaved client (default: 1.5)')
+    parser.add_argument('--rate', type=float, default=2, help='Limiter tokens per second per client (default: 2)')
+    parser.add_argument('--burst', type=float, default=5, help='Limiter bucket size (default: 5)')
+    parser.add_argument('--timeout', type=float, default=10, help='Client timeout in seconds (default: 10)')
+    parser.add_argument('--duration', type=float, default=600, help='Simulated seconds (default: 600)')
+
+    args = parser.parse_args()
+
+    print("\n" + "🍅"*30)
+    print("TOMATO DISEASE API - NOISY NEIGHBOUR SIMULATION")
+    print("🍅"*30)
+
+    clients = {'noisy': args.noisy_rps}
+    clients.update({f'client_{i + 1}': args.client_rps for i in range(args.clients)})
+    capacity = 1000 / args.service_ms
+    print(f"\nModel capacity: {capacity:.1f} req/s, offered load: {sum(clients.values()):.1f} req/s")
+
+    print_simulation('WITHOUT RATE LIMITING',
+                     simulate(clients, args.service_ms, args.duration, args.timeout), args.duration)
+    limiter = RateLimiter(args.rate, args.burst)
+    print_simulation(f'WITH RATE LIMITING ({args.rate:g}/s per client, burst {args.burst:g})',
+                     simulate(clients, args.service_ms, args.duration, args.timeout, limiter), args.duration)
+    print()
+
+
+if __name__ == '__main__':
+    main()
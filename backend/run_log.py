@@ -0,0 +1,283 @@
+"""
+Training Run Log
+Throughput instrumentation callback that streams to a JSONL run log,
+plus a report command to compare runs
+
+Usage:
+    python run_log.py runs/train-20250101-120000.jsonl runs/quick_train-20250101-130000.jsonl
+"""
+
+import json
+import os
+import resource
+import statistics
+import threading
+import time
+
+from tensorflow import keras
+
+RUN_LOG_DIR = 'runs'
+
+
+def default_log_path(script_name):
+    """runs/<script>-<timestamp>.jsonl"""
+    return os.path.join(RUN_LOG_DIR, f"{script_name}-{time.strftime('%Y%m%d-%H%M%S')}.jsonl")
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB (peak RSS where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class TimedBatches(keras.utils.PyDataset):
+    """
+    Wrap a Keras data iterator (e.g. ImageDataGenerator.flow_from_directory)
+    and accumulate the time spent producing batches.
+
+    With the default single-worker PyDataset this is time the training loop
+    is blocked waiting on the input pipeline.
+    """
+
+    def __init__(self, data):
+        super().__init__()
+        self.data = data
+        self.wait_time = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        start = time.perf_counter()
+        batch = self.data[index]
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.wait_time += elapsed
+        return batch
+
+    def on_epoch_end(self):
+        self.data.on_epoch_end()
+
+    def __getattr__(self, name):
+        # Forward samples, class_indices, ... to the wrapped iterator
+        if name == 'data':
+            raise AttributeError(name)
+        return getattr(self.data, name)
+
+
+class ThroughputMonitor(keras.callbacks.Callback):
+    """
+    Record per-step time, images/sec, input wait, RSS and per-epoch wall time.
+
+    Records are appended to a JSONL file, one object per line:
+        {"type": "run", ...}     run name and configuration
+        {"type": "step", ...}    every `log_every` training steps
+        {"type": "epoch", ...}   epoch wall time, throughput and Keras metrics
+        {"type": "end", ...}     total wall time
+
+    One monitor may be passed to several model.fit calls of the same run
+    (progressive resizing): the run record is written once and every end
+    record carries the time since the first call. Set `phase` to add fields
+    to the epoch records, and `batch_size` / `timer` when they change.
+    """
+
+    def __init__(self, log_path, batch_size, data=None, log_every=10, config=None):
+        super().__init__()
+        self.log_path = log_path
+        self.batch_size = batch_size
+        self.timer = data if isinstance(data, TimedBatches) else None
+        self.log_every = max(1, int(log_every))
+        self.config = config or {}
+        self.phase = {}
+        self._file = None
+        self._train_start = None
+
+    def _write(self, record):
+        self._file.write(json.dumps(record) + '\n')
+
+    def _wait_total(self):
+        return self.timer.wait_time if self.timer is not None else None
+
+    def on_train_begin(self, logs=None):
+        os.makedirs(os.path.dirname(self.log_path) or '.', exist_ok=True)
+        self._file = open(self.log_path, 'a')
+        if self._train_start is not None:
+            return
+        self._train_start = time.perf_counter()
+        self._write({
+            'type': 'run',
+            'run': os.path.splitext(os.path.basename(self.log_path))[0],
+            'started_at': time.time(),
+            'batch_size': self.batch_size,
+            'config': self.config,
+        })
+        self._file.flush()
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._epoch = epoch
+        self._epoch_start = time.perf_counter()
+        self._epoch_wait_start = self._wait_total()
+        self._last_step_end = self._epoch_start
+        self._last_wait = self._epoch_wait_start
+        self._steps = 0
+        self._train_time = 0.0
+
+    def on_train_batch_end(self, batch, logs=None):
+        now = time.perf_counter()
+        step_time = now - self._last_step_end
+        self._last_step_end = now
+        self._steps += 1
+        self._train_time += step_time
+
+        wait = None
+        if self.timer is not None:
+            total = self._wait_total()
+            wait = total - self._last_wait
+            self._last_wait = total
+
+        if self._steps % self.log_every == 0:
+            self._write({
+                'type': 'step',
+                'epoch': self._epoch,
+                'step': batch,
+                'step_time': step_time,
+                'images_per_sec': self.batch_size / step_time if step_time > 0 else None,
+                'input_wait': wait,
+                'rss_mb': current_rss_mb(),
+            })
+
+    def on_epoch_end(self, epoch, logs=None):
+        wall_time = time.perf_counter() - self._epoch_start
+        images = self._steps * self.batch_size
+
+        input_wait = None
+        if self.timer is not None:
+            input_wait = self._wait_total() - self._epoch_wait_start
+
+        self._write({
+            'type': 'epoch',
+            'epoch': epoch,
+            'wall_time': wall_time,
+            'train_time': self._train_time,
+            'steps': self._steps,
+            'images_per_sec': images / self._train_time if self._train_time > 0 else None,
+            'input_wait': input_wait,
+            'input_bound': input_wait / self._train_time if input_wait is not None and self._train_time > 0 else None,
+            'rss_mb': current_rss_mb(),
+            'metrics': {k: float(v) for k, v in (logs or {}).items()},
+            **self.phase,
+        })
+        self._file.flush()
+
+    def on_train_end(self, logs=None):
+        self._write({
+            'type': 'end',
+            'total_time': time.perf_counter() - self._train_start,
+            'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        })
+        self._file.close()
+        print(f"📈 Run log saved to '{self.log_path}'")
+
+
+# ---------------------------------------------------------------------------
+# Report
+# ---------------------------------------------------------------------------
+
+def load_run(path):
+    """Read a run log into {'run': ..., 'steps': [...], 'epochs': [...], 'end': ...}"""
+    run = {'run': {}, 'steps': [], 'epochs': [], 'end': {}}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            kind = record.get('type')
+            if kind == 'step':
+                run['steps'].append(record)
+            elif kind == 'epoch':
+                run['epochs'].append(record)
+            elif kind in ('run', 'end'):
+                run[kind] = record
+    return run
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return None
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def summarize_run(path):
+    """Reduce one run log to the numbers shown in the comparison table"""
+    run = load_run(path)
+    epochs = run['epochs']
+    step_times = [s['step_time'] for s in run['steps']]
+    throughput = [e['images_per_sec'] for e in epochs if e['images_per_sec']]
+    input_bound = [e['input_bound'] for e in epochs if e.get('input_bound') is not None]
+    rss = [e['rss_mb'] for e in epochs] + [s['rss_mb'] for s in run['steps']]
+    val_acc = [e['metrics'].get('val_accuracy') for e in epochs if 'val_accuracy' in e['metrics']]
+
+    return {
+        'run': run['run'].get('run', os.path.basename(path)),
+        'epochs': len(epochs),
+        'epoch_time': statistics.mean(e['wall_time'] for e in epochs) if epochs else None,
+        'step_p50': percentile(step_times, 50),
+        'step_p95': percentile(step_times, 95),
+        'images_per_sec': statistics.mean(throughput) if throughput else None,
+        'input_bound': statistics.mean(input_bound) if input_bound else None,
+        'peak_rss_mb': max(rss) if rss else None,
+        'best_val_acc': max(val_acc) if val_acc else None,
+        'total_time': run['end'].get('total_time'),
+    }
+
+
+def _fmt(value, spec):
+    return format(value, spec) if value is not None else '-'
+
+
+def print_report(paths):
+    rows = [summarize_run(p) for p in paths]
+    width = max(len(r['run']) for r in rows) + 2
+
+    print("\n" + "="*(width + 88))
+    print(f"{'Run':<{width}}{'Epochs':>7}{'Epoch s':>10}{'Step p50':>10}{'Step p95':>10}"
+          f"{'img/s':>9}{'Input%':>8}{'RSS MB':>9}{'Val acc':>9}{'Total s':>10}")
+    print("="*(width + 88))
+    for r in rows:
+        input_pct = r['input_bound'] * 100 if r['input_bound'] is not None else None
+        val_pct = r['best_val_acc'] * 100 if r['best_val_acc'] is not None else None
+        print(f"{r['run']:<{width}}{r['epochs']:>7}{_fmt(r['epoch_time'], '.1f'):>10}"
+              f"{_fmt(r['step_p50'], '.3f'):>10}{_fmt(r['step_p95'], '.3f'):>10}"
+              f"{_fmt(r['images_per_sec'], '.1f'):>9}{_fmt(input_pct, '.0f'):>8}"
+              f"{_fmt(r['peak_rss_mb'], '.0f'):>9}{_fmt(val_pct, '.2f'):>9}"
+              f"{_fmt(r['total_time'], '.0f'):>10}")
+    print("="*(width + 88))
+
+    if len(rows) > 1 and rows[0]['images_per_sec'] and all(r['images_per_sec'] for r in rows):
+        base = rows[0]['images_per_sec']
+        print(f"\nThroughput relative to {rows[0]['run']}:")
+        for r in rows[1:]:
+            print(f"   {r['run']}: {r['images_per_sec'] / base:.2f}x")
+    print("\nInput% = share of training step time spent waiting on the input pipeline\n")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Compare training run logs')
+    parser.add_argument('logs', nargs='+', help='Run log JSONL files (first one is the reference)')
+
+    args = parser.parse_args()
+    print_report(args.logs)
+
+
+if __name__ == '__main__':
+    main()
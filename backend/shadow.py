@@ -0,0 +1,244 @@
+"""
+Shadow Model Evaluation
+Mirrors a sample of live /predict inputs to a candidate Keras model (a
+tomato_resnet50_model.h5 from train.py, a MobileNetV2 from quick_train.py or
+distill.py) and records how often it agrees with the served model. It gets
+the upload resized and center-cropped to 224x224 as the served model does,
+built only for sampled requests, and only plain single-crop predictions are
+compared (no TTA). The candidate runs on its own thread, only while no
+/predict request is in flight; the request path only enqueues, and inputs
+are dropped when the small queue is full.
+
+Each comparison is appended to logs/shadow.jsonl.
+
+Usage:
+    python shadow.py                                # summarize logs/shadow.jsonl
+    python shadow.py --log logs/shadow.jsonl --candidate tomato_resnet50_model.h5
+"""
+
+import json
+import os
+import queue
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+
+import numpy as np
+from PIL import Image
+
+from inference import FOLDER_TO_LABEL, folder_to_model_index, short_name
+
+SHADOW_LOG_PATH = 'logs/shadow.jsonl'
+# flow_from_directory orders classes by sorted folder name
+CANDIDATE_CLASS_NAMES = sorted(FOLDER_TO_LABEL)
+
+
+class ShadowEvaluator:
+    """
+    Args:
+        model_path: Candidate .h5/.keras model taking NHWC float input in [0, 1]
+        id2label: Served model labels; candidate outputs are mapped onto them
+        tracker: jobs.InteractiveTracker of in-flight /predict requests
+    """
+
+    def __init__(self, model_path, id2label, tracker, sample_rate=0.1, max_queue=16, batch_size=8,
+                 quiet_seconds=0.2, log_path=SHADOW_LOG_PATH):
+        self.model_path = model_path
+        self.id2label = id2label
+        self.tracker = tracker
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.quiet_seconds = quiet_seconds
+        self.log_path = log_path
+        self.queue = queue.Queue(maxsize=max_queue)
+        # Candidate output i -> served model class index
+        self.to_model_index = folder_to_model_index(CANDIDATE_CLASS_NAMES, id2label)
+
+        self.status = 'loading'
+        self.error = None
+        self.sampled = 0
+        self.dropped = 0
+        self.compared = 0
+        self.agreed = 0
+        self.confusion = defaultdict(Counter)   # served label -> candidate label -> count
+        self.latency_ms = []
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='shadow-model', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def sample(self):
+        """Whether to mirror the current request; counts it as sampled if so"""
+        if self.status != 'ready' or random.random() >= self.sample_rate:
+            return False
+        self.sampled += 1
+        return True
+
+    def submit(self, crop, primary_index, primary_confidence, request_id=None):
+        """
+        Mirror one sampled input: the uint8 224x224x3 upload, resized and
+        center-cropped as the served model does. Never blocks.
+        """
+        try:
+            self.queue.put_nowait((crop, int(primary_index), float(primary_confidence), request_id))
+        except queue.Full:
+            self.dropped += 1
+
+    def _load(self):
+        from tensorflow import keras
+        model = keras.models.load_model(self.model_path, compile=False)
+        height, width = model.input_shape[1:3]
+        return model, (width or 224, height or 224)
+
+    def _run(self):
+        try:
+            model, size = self._load()
+        except Exception as e:
+            print(f"✗ Shadow model failed to load: {str(e)}")
+            self.status, self.error = 'failed', str(e)
+            return
+        self.status = 'ready'
+        print(f"✓ Shadow model {self.model_path} ready (sampling {self.sample_rate*100:g}% of /predict)")
+
+        os.makedirs(os.path.dirname(self.log_path) or '.', exist_ok=True)
+        with open(self.log_path, 'a') as log:
+            while True:
+                batch = [self.queue.get()]
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                self.tracker.wait_idle(self.quiet_seconds)
+                try:
+                    self._compare(model, size, batch, log)
+                except Exception as e:
+                    print(f"✗ Shadow batch failed: {str(e)}")
+
+    def _compare(self, model, size, batch, log):
+        crops = []
+        for crop, _, _, _ in batch:
+            if crop.shape[1::-1] != size:
+                # Candidates trained at another input size
+                crop = np.asarray(Image.fromarray(crop).resize(size, Image.BILINEAR))
+            crops.append(crop)
+        pixels = np.stack(crops).astype(np.float32) / 255.0
+
+        start = time.perf_counter()
+        outputs = np.asarray(model(pixels, training=False))
+        batch_ms = (time.perf_counter() - start) * 1000
+
+        # Reorder candidate outputs into served model label order
+        probabilities = np.zeros_like(outputs)
+        probabilities[:, self.to_model_index] = outputs
+        candidates = probabilities.argmax(axis=1)
+
+        now = time.time()
+        with self._lock:
+            self.latency_ms.append(batch_ms / len(batch))
+            del self.latency_ms[:-1000]
+            for (_, primary, confidence, request_id), candidate, probs in zip(batch, candidates, probabilities):
+                primary_label = self.id2label[str(primary)]
+                candidate_label = self.id2label[str(int(candidate))]
+                self.compared += 1
+                self.agreed += int(primary == candidate)
+                self.confusion[primary_label][candidate_label] += 1
+                log.write(json.dumps({
+                    'ts': now,
+                    'request_id': request_id,
+                    'candidate': self.model_path,
+                    'primary': primary_label,
+                    'primary_confidence': round(confidence, 5),
+                    'shadow': candidate_label,
+                    'shadow_confidence': round(float(probs[candidate]), 5),
+                    'latency_ms': round(batch_ms / len(batch), 2),
+                    'batch_size': len(batch),
+                }) + '\n')
+        log.flush()
+
+    def stats(self):
+        with self._lock:
+            latency = np.array(self.latency_ms) if self.latency_ms else None
+            return {
+                'candidate': self.model_path,
+                'status': self.status,
+                'error': self.error,
+                'sample_rate': self.sample_rate,
+                'sampled': self.sampled,
+                'dropped': self.dropped,
+                'compared': self.compared,
+                'agreement': self.agreed / self.compared if self.compared else None,
+                'latency_ms_per_image': {
+                    'median': float(np.median(latency)),
+                    'p95': float(np.percentile(latency, 95)),
+                } if latency is not None else None,
+                'disagreements': {
+                    short_name(primary): {short_name(label): n for label, n in counts.items() if label != primary}
+                    for primary, counts in self.confusion.items()
+                    if sum(counts.values()) > counts.get(primary, 0)
+                },
+            }
+
+
+# ---------------------------------------------------------------------------
+# Log summary
+# ---------------------------------------------------------------------------
+
+def summarize(records):
+    """Agreement and per-class disagreement by served label"""
+    per_class = defaultdict(lambda: {'total': 0, 'agree': 0, 'shadow': Counter()})
+    for record in records:
+        row = per_class[record['primary']]
+        row['total'] += 1
+        row['agree'] += record['primary'] == record['shadow']
+        if record['primary'] != record['shadow']:
+            row['shadow'][record['shadow']] += 1
+    return per_class
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Summarize shadow model comparisons')
+    parser.add_argument('--log', type=str, default=SHADOW_LOG_PATH, help=f'Shadow log (default: {SHADOW_LOG_PATH})')
+    parser.add_argument('--candidate', type=str, help='Only records of this candidate model path')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.log):
+        print(f"❌ Shadow log not found: {args.log}")
+        print("   Serve with SHADOW_MODEL=<candidate.h5> to record one")
+        return
+
+    with open(args.log) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    if args.candidate:
+        records = [r for r in records if r['candidate'] == args.candidate]
+    if not records:
+        print("❌ No shadow comparisons recorded")
+        return
+
+    latency = np.array([r['latency_ms'] for r in records])
+    agreement = np.mean([r['primary'] == r['shadow'] for r in records])
+
+    print("\n" + "="*70)
+    print("🎯 SHADOW MODEL REPORT")
+    print("="*70)
+    for candidate, count in Counter(r['candidate'] for r in records).items():
+        print(f"Candidate: {candidate} ({count} comparisons)")
+    print(f"Top-1 agreement: {agreement*100:.2f}%")
+    print(f"Candidate latency per image: median {np.median(latency):.1f} ms, p95 {np.percentile(latency, 95):.1f} ms")
+
+    print(f"\n{'Served class':<28}{'Count':>7}{'Agree':>9}  Most common shadow answer when different")
+    for primary, row in sorted(summarize(records).items(), key=lambda item: item[1]['agree'] / item[1]['total']):
+        other = row['shadow'].most_common(1)
+        other = f"{short_name(other[0][0])} ({other[0][1]})" if other else '-'
+        print(f"{short_name(primary):<28}{row['total']:>7}{row['agree'] / row['total']*100:>8.1f}%  {other}")
+    print("="*70 + "\n")
+
+
+if __name__ == '__main__':
+    main()
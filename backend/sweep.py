@@ -0,0 +1,300 @@
+"""
+Parallel Hyperparameter Sweep with Early Pruning
+Random search over train.py / quick_train.py hyperparameters. Trials run in a
+process pool, each pinned to its own share of CPUs, and trials whose
+validation accuracy falls below the median of their peers are stopped early.
+
+Usage:
+    python sweep.py --trials 40 --parallel 4
+    python sweep.py --model resnet50 --space my_space.json --time-budget 10
+"""
+
+import csv
+import json
+import math
+import multiprocessing
+import os
+import random
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+RESULTS_PATH = 'sweep_results.csv'
+
+# Each entry is {"type": "choice", "values": [...]},
+# {"type": "uniform", "low": a, "high": b} or {"type": "loguniform", "low": a, "high": b}
+DEFAULT_SPACES = {
+    'mobilenetv2': {
+        'img_size': {'type': 'choice', 'values': [160, 192, 224]},
+        'batch_size': {'type': 'choice', 'values': [16, 32, 64]},
+        'learning_rate': {'type': 'loguniform', 'low': 1e-4, 'high': 3e-3},
+        'dropout': {'type': 'uniform', 'low': 0.2, 'high': 0.6},
+        'head_units': {'type': 'choice', 'values': [128, 256, 512]},
+    },
+    'resnet50': {
+        'img_size': {'type': 'choice', 'values': [160, 192, 224]},
+        'batch_size': {'type': 'choice', 'values': [16, 32, 64]},
+        'learning_rate': {'type': 'loguniform', 'low': 3e-5, 'high': 1e-3},
+        'dropout': {'type': 'uniform', 'low': 0.3, 'high': 0.6},
+        'dropout2': {'type': 'uniform', 'low': 0.1, 'high': 0.4},
+        'head_units': {'type': 'choice', 'values': [256, 512, 1024]},
+        'head_units2': {'type': 'choice', 'values': [128, 256]},
+    },
+}
+
+
+def sample_config(space, rng):
+    """Draw one configuration from a search space"""
+    config = {}
+    for name, spec in space.items():
+        kind = spec['type']
+        if kind == 'choice':
+            config[name] = rng.choice(spec['values'])
+        elif kind == 'uniform':
+            config[name] = round(rng.uniform(spec['low'], spec['high']), 4)
+        elif kind == 'loguniform':
+            config[name] = float(f"{math.exp(rng.uniform(math.log(spec['low']), math.log(spec['high']))):.3g}")
+        else:
+            raise ValueError(f"Unknown search space type for '{name}': {kind}")
+    return config
+
+
+# ---------------------------------------------------------------------------
+# Trial (runs in a worker process)
+# ---------------------------------------------------------------------------
+
+def run_trial(trial_id, config, settings, cpu_slots, reports, lock):
+    """Train one configuration. Returns a result row for the results table."""
+    slot = cpu_slots.get()
+    start = time.time()
+    try:
+        # Pin before TensorFlow is imported so its thread pools size to the slot
+        if hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, slot)
+
+        import tensorflow as tf
+        from tensorflow import keras
+        from data_pipeline import make_dataset
+
+        tf.config.threading.set_intra_op_parallelism_threads(len(slot))
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+
+        image_size = (config['img_size'], config['img_size'])
+        # With steps_per_epoch, fit keeps one iterator across epochs; it must not run out
+        train_ds, _ = make_dataset(settings['train_dir'], image_size, config['batch_size'], training=True,
+                                   repeat=bool(settings['steps_per_epoch']))
+        val_ds, _ = make_dataset(settings['val_dir'], image_size, config['batch_size'])
+        num_classes = sum(
+            1 for d in os.listdir(settings['train_dir']) if os.path.isdir(os.path.join(settings['train_dir'], d))
+        )
+
+        if settings['model'] == 'resnet50':
+            import train
+            model = train.build_model(
+                num_classes,
+                head_units=(config['head_units'], config['head_units2']),
+                dropout=(config['dropout'], config['dropout2']),
+                image_size=image_size
+            )
+        else:
+            import quick_train
+            model = quick_train.build_model(
+                num_classes,
+                head_units=config['head_units'],
+                dropout=config['dropout'],
+                image_size=image_size
+            )
+
+        model.compile(
+            optimizer=keras.optimizers.Adam(learning_rate=config['learning_rate']),
+            loss='categorical_crossentropy',
+            metrics=['accuracy']
+        )
+
+        pruner = make_median_pruner(trial_id, reports, lock, settings['warmup_epochs'], settings['min_peers'])
+        history = model.fit(
+            train_ds,
+            validation_data=val_ds,
+            epochs=settings['epochs'],
+            steps_per_epoch=settings['steps_per_epoch'],
+            callbacks=[pruner],
+            verbose=0
+        )
+
+        val_acc = history.history.get('val_accuracy', [])
+        status = 'pruned' if pruner.pruned else 'complete'
+        return {
+            'trial': trial_id, 'status': status, **config,
+            'epochs_run': len(val_acc),
+            'best_val_acc': max(val_acc) if val_acc else None,
+            'final_val_acc': val_acc[-1] if val_acc else None,
+            'wall_time': time.time() - start,
+        }
+    except Exception as e:
+        return {
+            'trial': trial_id, 'status': f'failed: {e}', **config,
+            'epochs_run': 0, 'best_val_acc': None, 'final_val_acc': None,
+            'wall_time': time.time() - start,
+        }
+    finally:
+        cpu_slots.put(slot)
+
+
+def make_median_pruner(trial_id, reports, lock, warmup_epochs, min_peers):
+    """
+    Keras callback that stops a trial whose val_accuracy at an epoch is below
+    the median of other trials at the same epoch. Results are shared through
+    a Manager dict. Defined lazily so the parent process never imports TF.
+    """
+    from tensorflow import keras
+
+    class MedianPruner(keras.callbacks.Callback):
+        def __init__(self):
+            super().__init__()
+            self.pruned = False
+
+        def on_epoch_end(self, epoch, logs=None):
+            acc = (logs or {}).get('val_accuracy')
+            if acc is None:
+                return
+            with lock:
+                reports[f"{trial_id}:{epoch}"] = float(acc)
+                peers = [
+                    value for key, value in reports.items()
+                    if key.endswith(f":{epoch}") and not key.startswith(f"{trial_id}:")
+                ]
+            if epoch + 1 <= warmup_epochs or len(peers) < min_peers:
+                return
+            if acc < statistics.median(peers):
+                self.pruned = True
+                self.model.stop_training = True
+
+    return MedianPruner()
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def cpu_partitions(parallel, cpus_per_trial):
+    """Split the CPUs this process may use into one disjoint set per concurrent trial"""
+    if hasattr(os, 'sched_getaffinity'):
+        cpus = sorted(os.sched_getaffinity(0))
+    else:
+        cpus = list(range(os.cpu_count() or 1))
+    per_trial = cpus_per_trial or max(1, len(cpus) // parallel)
+    return [{cpus[(i * per_trial + j) % len(cpus)] for j in range(per_trial)} for i in range(parallel)]
+
+
+def write_row(path, row, fieldnames):
+    is_new = not os.path.exists(path)
+    with open(path, 'a', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore')
+        if is_new:
+            writer.writeheader()
+        writer.writerow(row)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Parallel hyperparameter sweep with early pruning')
+    parser.add_argument('--model', choices=['mobilenetv2', 'resnet50'], default='mobilenetv2', help='Model to tune (default: mobilenetv2)')
+    parser.add_argument('--space', type=str, help='JSON search space file (default: built-in space for the model)')
+    parser.add_argument('--trials', type=int, default=32, help='Number of trials (default: 32)')
+    parser.add_argument('--parallel', type=int, default=4, help='Concurrent trials (default: 4)')
+    parser.add_argument('--cpus-per-trial', type=int, help='CPUs pinned per trial (default: all CPUs / parallel)')
+    parser.add_argument('--epochs', type=int, default=10, help='Max epochs per trial (default: 10)')
+    parser.add_argument('--steps-per-epoch', type=int, help='Cap training steps per epoch to shorten trials')
+    parser.add_argument('--warmup-epochs', type=int, default=2, help='Epochs before a trial can be pruned (default: 2)')
+    parser.add_argument('--min-peers', type=int, default=3, help='Peer results needed before pruning (default: 3)')
+    parser.add_argument('--time-budget', type=float, help='Stop launching new trials after this many hours')
+    parser.add_argument('--data', type=str, default='data/tomato_dataset', help='Dataset directory with train/ and val/')
+    parser.add_argument('--output', type=str, default=RESULTS_PATH, help=f'Results table (default: {RESULTS_PATH})')
+    parser.add_argument('--seed', type=int, default=42, help='Sampling seed (default: 42)')
+
+    args = parser.parse_args()
+
+    print("\n" + "🍅"*30)
+    print("TOMATO DISEASE MODEL - HYPERPARAMETER SWEEP")
+    print("🍅"*30 + "\n")
+
+    settings = {
+        'model': args.model,
+        'train_dir': os.path.join(args.data, 'train'),
+        'val_dir': os.path.join(args.data, 'val'),
+        'epochs': args.epochs,
+        'steps_per_epoch': args.steps_per_epoch,
+        'warmup_epochs': args.warmup_epochs,
+        'min_peers': args.min_peers,
+    }
+    if not os.path.exists(settings['train_dir']):
+        print(f"❌ Training directory not found: {settings['train_dir']}")
+        print("   Run: python prepare_dataset.py --download")
+        return
+
+    if args.space:
+        with open(args.space) as f:
+            space = json.load(f)
+    else:
+        space = DEFAULT_SPACES[args.model]
+
+    rng = random.Random(args.seed)
+    configs = [sample_config(space, rng) for _ in range(args.trials)]
+    fieldnames = ['trial', 'status', *space.keys(), 'epochs_run', 'best_val_acc', 'final_val_acc', 'wall_time']
+
+    slots = cpu_partitions(args.parallel, args.cpus_per_trial)
+    print(f"🔬 {args.trials} trials of {args.model}, {args.parallel} at a time")
+    print(f"   CPUs per trial: {len(slots[0])}")
+    print(f"   Results: {args.output}\n")
+
+    ctx = multiprocessing.get_context('spawn')
+    manager = ctx.Manager()
+    cpu_slots = manager.Queue()
+    for slot in slots:
+        cpu_slots.put(slot)
+    reports = manager.dict()
+    lock = manager.Lock()
+
+    deadline = time.time() + args.time_budget * 3600 if args.time_budget else None
+    results = []
+    pending = set()
+    next_trial = 0
+
+    # One process per trial: TF thread pools can't be resized once initialised
+    with ProcessPoolExecutor(max_workers=args.parallel, mp_context=ctx, max_tasks_per_child=1) as pool:
+        while next_trial < len(configs) or pending:
+            while (next_trial < len(configs) and len(pending) < args.parallel
+                   and (deadline is None or time.time() < deadline)):
+                pending.add(pool.submit(run_trial, next_trial, configs[next_trial], settings, cpu_slots, reports, lock))
+                next_trial += 1
+            if not pending:
+                print("⏰ Time budget reached, no more trials launched")
+                break
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                row = future.result()
+                results.append(row)
+                write_row(args.output, row, fieldnames)
+                acc = f"{row['best_val_acc']*100:.2f}%" if row['best_val_acc'] is not None else '-'
+                print(f"   Trial {row['trial']:>3}: {row['status']:<9} val_acc={acc:<8} "
+                      f"epochs={row['epochs_run']:<3} {row['wall_time']/60:.1f} min")
+
+    finished = [r for r in results if r['best_val_acc'] is not None]
+    finished.sort(key=lambda r: r['best_val_acc'], reverse=True)
+
+    print("\n" + "="*60)
+    print("🏆 TOP CONFIGURATIONS")
+    print("="*60)
+    for r in finished[:5]:
+        params = ', '.join(f"{k}={r[k]}" for k in space)
+        print(f"{r['best_val_acc']*100:6.2f}%  [{r['status']}]  {params}")
+    pruned = sum(1 for r in results if r['status'] == 'pruned')
+    print(f"\nTrials run: {len(results)} | Pruned: {pruned} | "
+          f"Total trial time: {sum(r['wall_time'] for r in results)/3600:.1f} CPU-slot hours")
+    print("="*60 + "\n")
+
+
+if __name__ == '__main__':
+    main()
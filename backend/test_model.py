@@ -3,12 +3,18 @@ Test the trained model with sample predictions
 """
 
 import os
+import csv
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from PIL import Image
 import tensorflow as tf
 from tensorflow import keras
+from tensorflow.keras.applications.resnet50 import preprocess_input
 
 MODEL_PATH = 'tomato_resnet50_model.h5'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
 
 CLASS_NAMES = [
     'Tomato___Bacterial_spot',
@@ -23,20 +29,19 @@ CLASS_NAMES = [
     'Tomato___healthy'
 ]
 
-def preprocess_image(image_path):
-    """Preprocess image for prediction"""
+def load_image_array(image_path):
+    """Decode, resize and normalize one image -> float32 (224, 224, 3)"""
     img = Image.open(image_path)
     if img.mode != 'RGB':
         img = img.convert('RGB')
     
     img = img.resize((224, 224), Image.LANCZOS)
-    img_array = np.array(img)
-    img_array = np.expand_dims(img_array, axis=0)
-    
-    from tensorflow.keras.applications.resnet50 import preprocess_input
-    img_array = preprocess_input(img_array)
-    
-    return img_array
+    img_array = np.asarray(img, dtype=np.float32)
+    return preprocess_input(img_array)
+
+def preprocess_image(image_path):
+    """Preprocess image for prediction"""
+    return np.expand_dims(load_image_array(image_path), axis=0)
 
 def predict_image(model, image_path):
     """Make prediction on a single image"""
@@ -59,12 +64,102 @@ def predict_image(model, image_path):
         conf = predictions[0][idx] * 100
         print(f"   {i}. {class_name}: {conf:.2f}%")
 
+def iter_image_paths(folder):
+    """Yield image paths in `folder` without building the full list"""
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                yield entry.path
+
+def _safe_load(path):
+    try:
+        return load_image_array(path)
+    except Exception as e:
+        print(f"⚠️  Skipping {os.path.basename(path)}: {e}")
+        return None
+
+def predict_folder(model, folder, batch_size=32, workers=None, output=None):
+    """
+    Score every image in `folder` in fixed-size batches.
+    
+    Paths are streamed through a thread pool that decodes and resizes in
+    parallel; at most two batches are in flight, so memory stays flat
+    regardless of folder size. Results are printed (or written to CSV) as
+    each batch completes.
+    """
+    workers = workers or os.cpu_count() or 4
+    batch = np.empty((batch_size, 224, 224, 3), dtype=np.float32)
+    batch_paths = []
+    scored = 0
+    
+    writer = None
+    out_file = None
+    if output:
+        out_file = open(output, 'w', newline='')
+        writer = csv.writer(out_file)
+        writer.writerow(['image', 'prediction', 'confidence', 'top_3'])
+    
+    def flush():
+        nonlocal scored
+        n = len(batch_paths)
+        predictions = model.predict_on_batch(batch[:n])
+        predictions = np.asarray(predictions)
+        top_3 = np.argsort(predictions, axis=1)[:, -3:][:, ::-1]
+        for path, probs, top in zip(batch_paths, predictions, top_3):
+            label = CLASS_NAMES[top[0]].replace('Tomato___', '').replace('_', ' ')
+            if writer:
+                writer.writerow([
+                    path, CLASS_NAMES[top[0]], f"{probs[top[0]]:.4f}",
+                    ';'.join(f"{CLASS_NAMES[i]}:{probs[i]:.4f}" for i in top)
+                ])
+            else:
+                print(f"📸 {os.path.basename(path)}: {label} ({probs[top[0]]*100:.2f}%)")
+        scored += n
+        batch_paths.clear()
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        in_flight = deque()
+        paths = iter_image_paths(folder)
+        
+        def submit_next():
+            path = next(paths, None)
+            if path is not None:
+                in_flight.append((path, pool.submit(_safe_load, path)))
+        
+        for _ in range(batch_size * 2):
+            submit_next()
+        
+        while in_flight:
+            path, future = in_flight.popleft()
+            submit_next()
+            img_array = future.result()
+            if img_array is None:
+                continue
+            batch[len(batch_paths)] = img_array
+            batch_paths.append(path)
+            if len(batch_paths) == batch_size:
+                flush()
+        
+        if batch_paths:
+            flush()
+    elapsed = time.perf_counter() - start
+    
+    if out_file:
+        out_file.close()
+        print(f"✅ Results written to {output}")
+    
+    return scored, elapsed
+
 def main():
     import argparse
     
     parser = argparse.ArgumentParser(description='Test trained model')
     parser.add_argument('--image', type=str, help='Path to image file')
     parser.add_argument('--folder', type=str, help='Path to folder with images')
+    parser.add_argument('--batch-size', type=int, default=32, help='Batch size for folder scoring (default: 32)')
+    parser.add_argument('--workers', type=int, help='Decode threads for folder scoring (default: CPU count)')
+    parser.add_argument('--output', type=str, help='Write folder results to this CSV instead of printing')
     
     args = parser.parse_args()
     
@@ -92,17 +187,18 @@ def main():
     # Test folder
     elif args.folder:
         if os.path.exists(args.folder):
-            images = []
-            for ext in ['*.jpg', '*.jpeg', '*.png', '*.JPG', '*.JPEG', '*.PNG']:
-                images.extend(Path(args.folder).glob(ext))
+            scored, elapsed = predict_folder(
+                model, args.folder,
+                batch_size=args.batch_size,
+                workers=args.workers,
+                output=args.output
+            )
             
-            if not images:
+            if not scored:
                 print(f"❌ No images found in {args.folder}")
                 return
             
-            print(f"Found {len(images)} images\n")
-            for img_path in images:
-                predict_image(model, str(img_path))
+            print(f"\n📊 Scored {scored} images in {elapsed:.1f}s ({scored / elapsed:.1f} images/sec)")
         else:
             print(f"❌ Folder not found: {args.folder}")
     
@@ -116,5 +212,4 @@ def main():
     print("\n" + "🍅"*30 + "\n")
 
 if __name__ == '__main__':
-    from pathlib import Path
     main()
@@ -0,0 +1,101 @@
+"""
+Per-Request Tracing
+Request IDs, per-stage timings returned as a Server-Timing header, and a
+sampled log of slow requests. When tracing is off every request shares one
+no-op trace, so the cost is a couple of attribute lookups.
+"""
+
+import json
+import logging
+import os
+import random
+import re
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from logging.handlers import RotatingFileHandler
+
+SLOW_LOG_PATH = 'logs/slow_requests.jsonl'
+
+_REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+
+class RequestTrace:
+    """Timings (ms) of the stages of one request, in the order they ran"""
+
+    enabled = True
+
+    def __init__(self, request_id=None):
+        self.request_id = request_id if request_id and _REQUEST_ID.match(request_id) else uuid.uuid4().hex[:16]
+        self.start = time.perf_counter()
+        self.stages = {}
+        self.meta = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - start) * 1000)
+
+    def add(self, name, ms):
+        # A stage that runs twice (e.g. a second TTA pass) accumulates
+        self.stages[name] = self.stages.get(name, 0.0) + ms
+
+    def total_ms(self):
+        return (time.perf_counter() - self.start) * 1000
+
+    def server_timing(self):
+        """Server-Timing header value, e.g. 'decode;dur=12.3, infer;dur=80.1, total;dur=95.0'"""
+        parts = [f"{name};dur={ms:.1f}" for name, ms in self.stages.items()]
+        parts.append(f"total;dur={self.total_ms():.1f}")
+        return ', '.join(parts)
+
+
+class _NullTrace:
+    """Stand-in used when tracing is disabled"""
+
+    enabled = False
+    request_id = None
+    _noop = nullcontext()
+
+    def stage(self, name):
+        return self._noop
+
+    def add(self, name, ms):
+        pass
+
+
+NULL_TRACE = _NullTrace()
+
+
+class SlowRequestLog:
+    """
+    JSON lines for requests slower than threshold_ms, keeping a `sample_rate`
+    fraction of them. Rotated at 10 MB.
+    """
+
+    def __init__(self, path=SLOW_LOG_PATH, threshold_ms=1000.0, sample_rate=1.0):
+        self.threshold_ms = threshold_ms
+        self.sample_rate = sample_rate
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.logger = logging.getLogger('slow_requests')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        if not self.logger.handlers:
+            self.logger.addHandler(RotatingFileHandler(path, maxBytes=10 * 1024 * 1024, backupCount=3))
+
+    def maybe_log(self, trace, path, status):
+        total_ms = trace.total_ms()
+        if total_ms < self.threshold_ms or random.random() >= self.sample_rate:
+            return
+        self.logger.info(json.dumps({
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'request_id': trace.request_id,
+            'path': path,
+            'status': status,
+            'total_ms': round(total_ms, 1),
+            'stages': {name: round(ms, 1) for name, ms in trace.stages.items()},
+            **trace.meta,
+        }))
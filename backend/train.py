@@ -15,6 +15,10 @@ from tensorflow.keras.preprocessing.image import ImageDataGenerator
 from tensorflow.keras.callbacks import ModelCheckpoint, EarlyStopping, ReduceLROnPlateau
 import matplotlib.pyplot as plt
 
+from checkpointing import TrainingCheckpoint, CHECKPOINT_DIR
+from run_log import ThroughputMonitor, TimedBatches, default_log_path
+import progressive
+
 # Configuration
 IMG_SIZE = (224, 224)
 BATCH_SIZE = 32
@@ -43,10 +47,14 @@ CLASS_NAMES = [
     'Tomato___healthy'
 ]
 
-def create_data_generators():
+def create_data_generators(image_size=IMG_SIZE, batch_size=BATCH_SIZE):
     """
     Create data generators with augmentation for training
     """
+    return create_train_generator(image_size, batch_size), create_val_generator(image_size, batch_size)
+
+def create_train_generator(image_size=IMG_SIZE, batch_size=BATCH_SIZE):
+    """Augmented training batches at `image_size`"""
     # Training data augmentation
     train_datagen = ImageDataGenerator(
         rescale=1./255,
@@ -60,29 +68,27 @@ def create_data_generators():
         fill_mode='nearest'
     )
     
-    # Validation data (only rescaling)
-    val_datagen = ImageDataGenerator(rescale=1./255)
-    
-    # Create generators
-    train_generator = train_datagen.flow_from_directory(
+    return train_datagen.flow_from_directory(
         TRAIN_DIR,
-        target_size=IMG_SIZE,
-        batch_size=BATCH_SIZE,
+        target_size=image_size,
+        batch_size=batch_size,
         class_mode='categorical',
         shuffle=True
     )
+
+def create_val_generator(image_size=IMG_SIZE, batch_size=BATCH_SIZE):
+    """Validation batches (only rescaling)"""
+    val_datagen = ImageDataGenerator(rescale=1./255)
     
-    val_generator = val_datagen.flow_from_directory(
+    return val_datagen.flow_from_directory(
         VAL_DIR,
-        target_size=IMG_SIZE,
-        batch_size=BATCH_SIZE,
+        target_size=image_size,
+        batch_size=batch_size,
         class_mode='categorical',
         shuffle=False
     )
-    
-    return train_generator, val_generator
 
-def build_model(num_classes):
+def build_model(num_classes, head_units=(512, 256), dropout=(0.5, 0.3), image_size=IMG_SIZE):
     """
     Build ResNet50 model with transfer learning
     """
@@ -94,7 +100,7 @@ def build_model(num_classes):
     base_model = ResNet50(
         weights='imagenet',
         include_top=False,
-        input_shape=(*IMG_SIZE, 3)
+        input_shape=(*image_size, 3)
     )
     
     # Freeze base model layers initially
@@ -105,10 +111,10 @@ def build_model(num_classes):
     
     # Add custom classification head
     x = GlobalAveragePooling2D(name='global_avg_pool')(base_model.output)
-    x = Dense(512, activation='relu', name='fc1')(x)
-    x = Dropout(0.5, name='dropout1')(x)
-    x = Dense(256, activation='relu', name='fc2')(x)
-    x = Dropout(0.3, name='dropout2')(x)
+    x = Dense(head_units[0], activation='relu', name='fc1')(x)
+    x = Dropout(dropout[0], name='dropout1')(x)
+    x = Dense(head_units[1], activation='relu', name='fc2')(x)
+    x = Dropout(dropout[1], name='dropout2')(x)
     output = Dense(num_classes, activation='softmax', name='predictions')(x)
     
     # Create final model
@@ -116,38 +122,38 @@ def build_model(num_classes):
     
     print(f"✅ Added custom classification head")
     print(f"   • Global Average Pooling")
-    print(f"   • Dense(512) + Dropout(0.5)")
-    print(f"   • Dense(256) + Dropout(0.3)")
+    print(f"   • Dense({head_units[0]}) + Dropout({dropout[0]})")
+    print(f"   • Dense({head_units[1]}) + Dropout({dropout[1]})")
     print(f"   • Dense({num_classes}) [Softmax]")
     print("="*60 + "\n")
     
     return model
 
-def compile_model(model):
+def compile_model(model, learning_rate=LEARNING_RATE):
     """
     Compile the model with optimizer and loss function
     """
     model.compile(
-        optimizer=keras.optimizers.Adam(learning_rate=LEARNING_RATE),
+        optimizer=keras.optimizers.Adam(learning_rate=learning_rate),
         loss='categorical_crossentropy',
         metrics=['accuracy', keras.metrics.TopKCategoricalAccuracy(k=3, name='top_3_accuracy')]
     )
     
     print("✅ Model compiled")
-    print(f"   Optimizer: Adam (lr={LEARNING_RATE})")
+    print(f"   Optimizer: Adam (lr={learning_rate})")
     print(f"   Loss: Categorical Crossentropy")
     print(f"   Metrics: Accuracy, Top-3 Accuracy\n")
     
     return model
 
-def create_callbacks():
+def create_callbacks(save_path=MODEL_SAVE_PATH):
     """
     Create training callbacks
     """
     callbacks = [
         # Save best model
         ModelCheckpoint(
-            MODEL_SAVE_PATH,
+            save_path,
             monitor='val_accuracy',
             save_best_only=True,
             mode='max',
@@ -249,6 +255,20 @@ def main():
     """
     Main training pipeline
     """
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Train ResNet50 tomato disease model')
+    parser.add_argument('--resume', action='store_true', help='Resume from the latest checkpoint')
+    parser.add_argument('--checkpoint-dir', type=str, default=CHECKPOINT_DIR, help='Training state checkpoint directory')
+    parser.add_argument('--checkpoint-every', type=int, default=1, help='Save training state every N epochs (default: 1)')
+    parser.add_argument('--run-log', type=str, default=default_log_path('train'), help='Throughput/metrics JSONL run log')
+    parser.add_argument('--progressive', action='store_true',
+                        help='Progressive resizing: early epochs at 128/160 with larger batches, the rest at 224')
+    parser.add_argument('--schedule', type=str,
+                        help="Progressive schedule as size:epochs, e.g. '128:15,160:15,224:20' (default: from --epochs)")
+    
+    args = parser.parse_args()
+    
     print("\n" + "🍅"*30)
     print("TOMATO LEAF DISEASE DETECTION - MODEL TRAINING")
     print("🍅"*30 + "\n")
@@ -259,7 +279,12 @@ def main():
     print(f"  • Epochs: {EPOCHS}")
     print(f"  • Learning Rate: {LEARNING_RATE}")
     print(f"  • Number of Classes: {len(CLASS_NAMES)}")
-    print(f"  • Model Save Path: {MODEL_SAVE_PATH}\n")
+    print(f"  • Model Save Path: {MODEL_SAVE_PATH}")
+    schedule = None
+    if args.progressive or args.schedule:
+        schedule = progressive.parse_schedule(args.schedule) if args.schedule else progressive.default_schedule(EPOCHS)
+        print(f"  • Progressive Resizing: {' → '.join(f'{size}px x{n}' for size, n in schedule)}")
+    print()
     
     # Check if dataset exists
     if not os.path.exists(TRAIN_DIR):
@@ -303,8 +328,8 @@ def main():
     print(f"   Classes found: {len(train_generator.class_indices)}")
     print(f"   Class mapping: {train_generator.class_indices}\n")
     
-    # Build model
-    model = build_model(num_classes=len(CLASS_NAMES))
+    # Build model (variable input size when the resolution changes between phases)
+    model = build_model(num_classes=len(CLASS_NAMES), image_size=(None, None) if schedule else IMG_SIZE)
     
     # Compile model
     model = compile_model(model)
@@ -318,21 +343,63 @@ def main():
     # Create callbacks
     callbacks = create_callbacks()
     
+    # Full training state checkpoints (must run after the callbacks it tracks)
+    checkpoint = TrainingCheckpoint(
+        args.checkpoint_dir,
+        data=None if schedule else train_generator,  # phases attach their own iterators
+        every_n_epochs=args.checkpoint_every,
+        tracked_callbacks=callbacks
+    )
+    initial_epoch = checkpoint.restore(model) if args.resume else 0
+    callbacks.append(checkpoint)
+    print(f"✅ Training state checkpoints: {args.checkpoint_dir} (every {args.checkpoint_every} epoch(s))")
+    
+    # Throughput instrumentation
+    timed_train = TimedBatches(train_generator)
+    monitor = ThroughputMonitor(
+        args.run_log,
+        batch_size=BATCH_SIZE,
+        data=timed_train,
+        config={
+            'script': 'train.py',
+            'model': 'ResNet50',
+            'img_size': list(IMG_SIZE),
+            'batch_size': BATCH_SIZE,
+            'epochs': EPOCHS,
+            'learning_rate': LEARNING_RATE,
+            'progressive': schedule,
+        }
+    )
+    callbacks.append(monitor)
+    print(f"✅ Run log: {args.run_log}\n")
+    
     # Train model (transfer learning phase)
     print("🚀 Starting Training (Transfer Learning Phase)...")
     print("="*60)
-    history = model.fit(
-        train_generator,
-        validation_data=val_generator,
-        epochs=EPOCHS,
-        callbacks=callbacks,
-        verbose=1
-    )
+    if schedule:
+        phases = progressive.fit_progressive(
+            model, schedule, create_train_generator, val_generator, callbacks,
+            base_batch_size=BATCH_SIZE,
+            initial_epoch=initial_epoch,
+            monitor=monitor,
+            checkpoint=checkpoint,
+        )
+        progressive.print_phase_report(phases)
+    else:
+        history = model.fit(
+            timed_train,
+            validation_data=val_generator,
+            epochs=EPOCHS,
+            initial_epoch=initial_epoch,
+            callbacks=callbacks,
+            verbose=1
+        )
     
     print("\n✅ Transfer learning phase completed!")
     
-    # Plot training history
-    plot_training_history(history)
+    # Plot training history (one fit per phase with progressive resizing; see the run log)
+    if not schedule:
+        plot_training_history(history)
     
     # Optional: Fine-tuning phase (uncomment if you want to fine-tune)
     # print("\n🔧 Starting Fine-tuning Phase...")
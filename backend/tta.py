@@ -0,0 +1,58 @@
+"""
+Test-Time Augmentation
+Builds flipped and slightly zoomed views of one image that all share a size,
+so the model scores them in a single batched call; the class probabilities
+are then averaged.
+"""
+
+from PIL import Image
+
+# Shortest edge the HF processor resizes to before its 224 center crop
+BASE_SIZE = 256
+CROP_FRACTION = 0.9
+ALL_VIEWS = ('identity', 'hflip', 'vflip', 'zoom_tl', 'zoom_tr', 'zoom_bl', 'zoom_br')
+VIEWS = ('identity', 'hflip', 'vflip', 'zoom_tl', 'zoom_br')
+
+
+def base_image(image, size=BASE_SIZE):
+    """Resize so the shortest edge is `size`; views are cut from this, not the full upload"""
+    width, height = image.size
+    scale = size / min(width, height)
+    return image.resize((max(size, round(width * scale)), max(size, round(height * scale))), Image.BICUBIC)
+
+
+def _zoom(image, corner, fraction):
+    width, height = image.size
+    crop_w, crop_h = int(width * fraction), int(height * fraction)
+    left = 0 if corner in ('tl', 'bl') else width - crop_w
+    top = 0 if corner in ('tl', 'tr') else height - crop_h
+    return image.crop((left, top, left + crop_w, top + crop_h)).resize((width, height), Image.BICUBIC)
+
+
+def make_view(image, view, crop_fraction=CROP_FRACTION):
+    if view == 'identity':
+        return image
+    if view == 'hflip':
+        return image.transpose(Image.FLIP_LEFT_RIGHT)
+    if view == 'vflip':
+        return image.transpose(Image.FLIP_TOP_BOTTOM)
+    if view.startswith('zoom_'):
+        return _zoom(image, view[5:], crop_fraction)
+    raise ValueError(f"Unknown TTA view: {view}")
+
+
+def make_views(image, views=VIEWS, crop_fraction=CROP_FRACTION):
+    """Same-size PIL views of `image` (RGB), one per entry in `views`"""
+    base = base_image(image)
+    return [make_view(base, view, crop_fraction) for view in views]
+
+
+def parse_views(text):
+    """'identity,hflip,zoom_tl' -> tuple, validated (at least one view)"""
+    views = tuple(v.strip() for v in text.split(',') if v.strip())
+    if not views:
+        raise ValueError(f"No TTA views given (choose from {', '.join(ALL_VIEWS)})")
+    for view in views:
+        if view not in ALL_VIEWS:
+            raise ValueError(f"Unknown TTA view: {view} (choose from {', '.join(ALL_VIEWS)})")
+    return views
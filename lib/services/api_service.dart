@@ -1,5 +1,6 @@
 import 'dart:convert';
 import 'dart:io';
+import 'package:flutter/foundation.dart';
 import 'package:http/http.dart' as http;
 import '../models/prediction_result.dart';
 
@@ -27,9 +28,19 @@ class ApiService {
       final streamedResponse = await request.send();
       final response = await http.Response.fromStream(streamedResponse);
 
+      // Server-side stage timings, to match a slow upload with the server logs
+      debugPrint(
+        'predict ${response.statusCode} '
+        'request-id=${response.headers['x-request-id']} '
+        'server-timing=${response.headers['server-timing']}',
+      );
+
       if (response.statusCode == 200) {
         final jsonData = json.decode(response.body);
         return PredictionResult.fromJson(jsonData);
+      } else if (response.statusCode == 422) {
+        // Rejected by the server's leaf check before running the model
+        throw Exception(json.decode(response.body)['error']);
       } else {
         throw Exception('Failed to predict disease: ${response.statusCode}');
       }